@@ -0,0 +1,174 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+"""Engine report: how the streets of the matching engine differ from those of the seed engine.
+
+Both engines negotiate the streets of each network from the same AngleTable, with HICN
+and ICN at every threshold, and the report compares their output:
+
+    streets       streets mapped by each engine
+    identical     share of the streets of the seed engine mapped with the very same
+                  segments by the matching engine
+    segments      share of the segments lying on those identical streets
+    joints        of the pairs of segments that either engine joins at an intersection
+                  (i.e., puts on the same street), the share both engines join
+    longest       segments of the longest street of each engine
+    seconds       negotiation time of each engine
+
+Networks are pairs of node/edge CSV files given with --csv, which default to the city
+in data/ (Ji-Parana, Brazil), and the synthetic generators of benchmarks/pipeline.py.
+
+    python benchmarks/engines.py [--csv nodes.csv edges.csv] [--generators organic grid] \\
+        [--sizes 1e5] [--min-angle 120 150] [--output report.json]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+# benchmarking the working tree, rather than whichever copy of the library is installed
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from pipeline import GENERATORS, generate
+
+from street_continuity.file import read_csv
+from street_continuity.mapper import __negotiate_streets__
+from street_continuity.matching import __match_streets__
+from street_continuity.table import AngleTable
+
+CITY = (ROOT / "data" / "test-nodes.csv", ROOT / "data" / "test-edges.csv")
+
+
+def _owners(streets: list, edges: int) -> tuple:
+    """The street of each segment, and the number of segments of each street."""
+    sizes = np.fromiter((len(merges) + 1 for _, merges in streets), np.int64, len(streets))
+    segments = np.fromiter(
+        (eid for seed, merges in streets for eid in (seed, *(merge[0] for merge in merges))),
+        np.int64,
+        int(sizes.sum()),
+    )
+    owners = np.full(edges, -1, dtype=np.int64)
+    owners[segments] = np.repeat(np.arange(len(streets)), sizes)
+    return owners, sizes
+
+
+def _adjacent_pairs(table: AngleTable) -> tuple:
+    """Every pair of segments meeting at an intersection, each pair listed once."""
+    degrees = np.diff(table.offsets)
+    owners = np.repeat(np.arange(len(degrees), dtype=np.int64), degrees**2)
+    local = np.arange(table.pair_offsets[-1], dtype=np.int64) - table.pair_offsets[owners]
+    rows = table.offsets[owners] + local // degrees[owners]
+    columns = table.offsets[owners] + local % degrees[owners]
+    kept = rows < columns
+    return table.edges[rows[kept]].astype(np.int64), table.edges[columns[kept]].astype(np.int64)
+
+
+def compare(table: AngleTable, labels: list, min_angle: float) -> dict:
+    """Negotiate the streets with both engines and measure how they differ."""
+    start = time.perf_counter()
+    seed = __negotiate_streets__(table, labels, min_angle)
+    seed_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    matching = __match_streets__(table, labels, min_angle)
+    matching_seconds = time.perf_counter() - start
+
+    m = len(labels)
+    seed_owners, seed_sizes = _owners(seed, m)
+    matching_owners, matching_sizes = _owners(matching, m)
+
+    # a street is identical when all its segments share a street of the same size in the other engine
+    held = np.flatnonzero(seed_owners >= 0)
+    order = held[np.argsort(seed_owners[held], kind="stable")]
+    starts = np.concatenate(([0], np.cumsum(seed_sizes)[:-1]))
+    others = matching_owners[order]
+    same = np.minimum.reduceat(others, starts) == np.maximum.reduceat(others, starts)
+    identical = same & (matching_sizes[np.maximum.reduceat(others, starts)] == seed_sizes)
+
+    left, right = _adjacent_pairs(table)
+    seed_joints = seed_owners[left] == seed_owners[right]
+    matching_joints = matching_owners[left] == matching_owners[right]
+    either = seed_joints | matching_joints
+
+    return {
+        "streets": [len(seed), len(matching)],
+        "identical": float(identical.mean()) if len(seed) else 1.0,
+        "segments": float(seed_sizes[identical].sum() / max(m, 1)),
+        "joints": float((seed_joints & matching_joints).sum() / max(either.sum(), 1)),
+        "longest": [int(seed_sizes.max(initial=0)), int(matching_sizes.max(initial=0))],
+        "seconds": [seed_seconds, matching_seconds],
+    }
+
+
+def report(name: str, directory: Path, nodes: str, edges: str, min_angles: list) -> list:
+    """Compare the engines on a network, with HICN and ICN at every threshold."""
+    primal = read_csv(nodes, edges, str(directory), True, compact=True)
+    table = AngleTable().build_table(primal)
+    cases = []
+    for method in ("hicn", "icn"):
+        labels = primal.labels.tolist() if method == "hicn" else [0] * len(primal.edge_ids)
+        for min_angle in min_angles:
+            case = {"network": name, "edges": len(primal.edge_ids), "method": method}
+            case["min_angle"] = min_angle
+            case.update(compare(table, labels, min_angle))
+            cases.append(case)
+            print(
+                f"{name:<16} {method:<4} {min_angle:>5g}  "
+                f"streets {case['streets'][0]:>7,} / {case['streets'][1]:<7,} "
+                f"identical {case['identical']:>6.1%}  segments {case['segments']:>6.1%}  "
+                f"joints {case['joints']:>6.1%}  "
+                f"longest {case['longest'][0]:>5} / {case['longest'][1]:<5} "
+                f"seconds {case['seconds'][0]:.3f} / {case['seconds'][1]:.3f}"
+            )
+    return cases
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--csv",
+        nargs=2,
+        action="append",
+        metavar=("NODES", "EDGES"),
+        help="node and edge CSV files of a city, without header (default: the city in data/)",
+    )
+    parser.add_argument(
+        "--generators", nargs="*", choices=sorted(GENERATORS), default=list(GENERATORS)
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", default=["1e5"], help="edges per synthetic network (default: 1e5)"
+    )
+    parser.add_argument(
+        "--min-angle", nargs="+", type=float, default=[120.0], help="thresholds (default: 120)"
+    )
+    parser.add_argument("--output", help="path of the JSON report (default: print only)")
+    args = parser.parse_args(argv)
+
+    print("network          method angle  seed / matching")
+    cases = []
+    for nodes, edges in args.csv or [CITY]:
+        nodes, edges = Path(nodes).resolve(), Path(edges).resolve()
+        name = "ji-parana" if (nodes, edges) == CITY else nodes.stem
+        cases += report(name, nodes.parent, nodes.name, str(edges), args.min_angle)
+    for generator in args.generators:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                generate(generator, int(float(size)), Path(directory))
+                name = f"{generator}-{size}"
+                cases += report(name, Path(directory), "nodes.csv", "edges.csv", args.min_angle)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"cases": cases}, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
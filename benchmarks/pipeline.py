@@ -0,0 +1,376 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+"""Pipeline benchmark: each stage of a CSV-to-GraphML run on synthetic street networks.
+
+Four deterministic generators lay out networks of a requested number of edges:
+"grid" (a regular lattice of blocks), "radial" (rings crossed by spokes),
+"organic" (a jittered lattice with missing blocks and diagonal shortcuts) and
+"motorway" (long, gently curving motorways over a sparse grid of connectors).
+Each network is written as a pair of CSV files, and every case runs in a fresh
+interpreter, which times the stages below and records the peak resident memory
+reached at the end of each of them:
+
+    ingest        read_csv(compact=True)
+    adjacency     AngleTable().build_table
+    negotiation   merging segments into streets (HICN, 120 degrees)
+    assembly      building the dual nodes of the streets
+    linking       building the dual edges
+    graphml       write_graphml
+    binary        write_binary
+
+Results are written as JSON and, when a baseline is given, compared with it; a
+stage that got slower (or more memory-hungry) than the tolerance allows is
+reported, and the command exits with status 1.
+
+    python benchmarks/pipeline.py [--generators grid radial] [--sizes 1e3 1e4 1e5] \\
+        [--repeat 3] [--output results.json] [--baseline benchmarks/baseline.json]
+
+Sizes go up to 1e7 edges, which takes several minutes and a few GB of memory per case.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+# benchmarking the working tree, rather than whichever copy of the library is installed
+sys.path.insert(0, str(ROOT))
+RESULTS_VERSION = 1
+STAGES = ("ingest", "adjacency", "negotiation", "assembly", "linking", "graphml", "binary")
+DEFAULT_SIZES = ("1e3", "1e4", "1e5")
+
+# about 100 meters between neighboring intersections, around an arbitrary origin
+ORIGIN = (-11.92, -62.0)
+SPACING = 0.0009
+
+
+def _lattice(rows: int, columns: int) -> tuple:
+    """Nodes of a rows x columns lattice, with its horizontal and vertical edges."""
+    index = np.arange(rows * columns).reshape(rows, columns)
+    horizontal = np.column_stack([index[:, :-1].ravel(), index[:, 1:].ravel()])
+    vertical = np.column_stack([index[:-1, :].ravel(), index[1:, :].ravel()])
+    row, column = np.divmod(np.arange(rows * columns), columns)
+    return row.astype(float), column.astype(float), horizontal, vertical
+
+
+def _grid(edges: int, rng: np.random.Generator) -> dict:
+    """A regular lattice; every fifth row and column is a primary avenue, the rest are residential."""
+    side = max(2, round((edges / 2) ** 0.5) + 1)
+    row, column, horizontal, vertical = _lattice(side, side)
+    names = np.concatenate([horizontal[:, 0] // side, side + vertical[:, 0] % side])
+    lines = np.concatenate([horizontal[:, 0] // side, vertical[:, 0] % side])
+    return {
+        "latitude": row,
+        "longitude": column,
+        "edges": np.concatenate([horizontal, vertical]),
+        "names": names,
+        "labels": np.where(lines % 5 == 0, 1, 0),
+        "label_table": ["residential", "primary"],
+    }
+
+
+def _radial(edges: int, rng: np.random.Generator) -> dict:
+    """Concentric rings (secondary) crossed by spokes (primary) leaving the center."""
+    rings = spokes = max(3, round((edges / 2) ** 0.5))
+    ring, spoke = np.divmod(np.arange(rings * spokes), spokes)
+    radius = ring + 1.0
+    angle = 2 * np.pi * spoke / spokes
+    index = np.arange(rings * spokes).reshape(rings, spokes)
+    around = np.column_stack([index.ravel(), np.roll(index, -1, axis=1).ravel()])
+    outward = np.column_stack([index[:-1, :].ravel(), index[1:, :].ravel()])
+    return {
+        "latitude": radius * np.sin(angle),
+        "longitude": radius * np.cos(angle),
+        "edges": np.concatenate([around, outward]),
+        "names": np.concatenate([around[:, 0] // spokes, rings + outward[:, 0] % spokes]),
+        "labels": np.concatenate([np.zeros(len(around), int), np.ones(len(outward), int)]),
+        "label_table": ["secondary", "primary"],
+    }
+
+
+def _organic(edges: int, rng: np.random.Generator) -> dict:
+    """A jittered lattice missing some blocks, with diagonal shortcuts and streets of random types."""
+    side = max(2, round((edges / 2.1) ** 0.5) + 1)
+    row, column, horizontal, vertical = _lattice(side, side)
+    row += rng.normal(0, 0.2, len(row))
+    column += rng.normal(0, 0.2, len(column))
+    lattice = np.concatenate([horizontal, vertical])
+    lines = np.concatenate([horizontal[:, 0] // side, side + vertical[:, 0] % side])
+    kept = rng.random(len(lattice)) > 0.12
+
+    # shortcuts across a fifth of the blocks, each one a street of its own
+    corner = rng.choice((side - 1) * side, size=(side - 1) ** 2 // 5, replace=False)
+    corner = corner[corner % side < side - 1]
+    diagonal = np.column_stack([corner, corner + side + 1])
+
+    line_labels = rng.choice(4, size=2 * side, p=[0.7, 0.15, 0.1, 0.05])
+    return {
+        "latitude": row,
+        "longitude": column,
+        "edges": np.concatenate([lattice[kept], diagonal]),
+        "names": np.concatenate([lines[kept], 2 * side + np.arange(len(diagonal))]),
+        "labels": np.concatenate([line_labels[lines[kept]], np.zeros(len(diagonal), int)]),
+        "label_table": ["residential", "tertiary", "secondary", "primary"],
+    }
+
+
+def _motorway(edges: int, rng: np.random.Generator) -> dict:
+    """Long, gently curving motorways, tied every 50 nodes by trunk connectors running across them."""
+    lanes = max(1, round(edges**0.5 / 10))
+    length = max(2, round(edges / (lanes * 1.02)))
+    lane, position = np.divmod(np.arange(lanes * length), length)
+    latitude = lane * 25.0 + 3 * np.sin(position / 200 + lane) + rng.normal(0, 0.02, len(lane))
+    index = np.arange(lanes * length).reshape(lanes, length)
+    along = np.column_stack([index[:, :-1].ravel(), index[:, 1:].ravel()])
+    across = np.column_stack([index[:-1, ::50].ravel(), index[1:, ::50].ravel()])
+    return {
+        "latitude": latitude,
+        "longitude": position.astype(float),
+        "edges": np.concatenate([along, across]),
+        "names": np.concatenate([along[:, 0] // length, lanes + across[:, 0] % length]),
+        "labels": np.concatenate([np.zeros(len(along), int), np.ones(len(across), int)]),
+        "label_table": ["motorway", "trunk"],
+    }
+
+
+GENERATORS = {"grid": _grid, "radial": _radial, "organic": _organic, "motorway": _motorway}
+
+
+def generate(generator: str, edges: int, directory: Path) -> tuple:
+    """
+    Write the network of a generator as nodes.csv and edges.csv, always the same for the same generator and size.
+    :return: tuple with the number of nodes and of edges written
+    """
+
+    from street_continuity.util import great_circle
+
+    rng = np.random.default_rng([sorted(GENERATORS).index(generator), edges])
+    network = GENERATORS[generator](edges, rng)
+    latitude = ORIGIN[0] + network["latitude"] * SPACING
+    longitude = ORIGIN[1] + network["longitude"] * SPACING
+    source, target = network["edges"].T
+    length = great_circle(latitude[source], longitude[source], latitude[target], longitude[target])
+    labels = np.asarray(network["label_table"])[network["labels"]]
+
+    with open(directory / "nodes.csv", "w") as stream:
+        rows = zip(latitude.tolist(), longitude.tolist())
+        stream.writelines(f"{i},{lat:.7f},{lon:.7f}\n" for i, (lat, lon) in enumerate(rows))
+    with open(directory / "edges.csv", "w") as stream:
+        rows = zip(source.tolist(), target.tolist(), length.tolist(), network["names"].tolist())
+        stream.writelines(
+            f"{i},{u},{v},{d:.2f},{name},{label}\n"
+            for i, ((u, v, d, name), label) in enumerate(zip(rows, labels.tolist()))
+        )
+
+    return len(latitude), len(source)
+
+
+def _peak_memory() -> float:
+    """Peak resident memory of this process so far, in megabytes."""
+    import resource
+
+    # unlike ru_maxrss, the high-water mark of /proc does not carry over that of the parent process
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_case(directory: Path) -> dict:
+    """Run every stage on the network written to a directory, in this process."""
+    from street_continuity.file import read_csv, write_binary, write_graphml
+    from street_continuity.graph import DualGraph
+    from street_continuity.mapper import (
+        __assemble_street__,
+        __link_streets__,
+        __negotiate_streets__,
+    )
+    from street_continuity.table import AngleTable
+
+    seconds, peak = {}, {}
+
+    def stage(name, function):
+        start = time.perf_counter()
+        result = function()
+        seconds[name] = time.perf_counter() - start
+        peak[name] = _peak_memory()
+        return result
+
+    primal = stage(
+        "ingest", lambda: read_csv("nodes.csv", "edges.csv", str(directory), True, compact=True)
+    )
+    table = stage("adjacency", lambda: AngleTable().build_table(primal))
+    labels = primal.labels.tolist()
+    streets = stage("negotiation", lambda: __negotiate_streets__(table, labels, 120.0))
+
+    def assemble():
+        node_ids = primal.node_ids.tolist()
+        dual = DualGraph()
+        for did, (seed, merges) in enumerate(streets):
+            dual.node_dictionary[did] = __assemble_street__(
+                did, seed, merges, primal.edge, node_ids
+            )
+        return dual
+
+    dual = stage("assembly", assemble)
+    stage("linking", lambda: __link_streets__(dual))
+    stage("graphml", lambda: write_graphml(dual, "dual.graphml", str(directory)))
+    stage("binary", lambda: write_binary(dual, "dual.bin", str(directory)))
+
+    return {
+        "primal_nodes": len(primal.node_ids),
+        "primal_edges": len(primal.edge_ids),
+        "dual_nodes": len(dual.node_dictionary),
+        "dual_edges": len(dual.edge_dictionary),
+        "seconds": seconds,
+        "peak_mb": peak,
+    }
+
+
+def measure(generator: str, edges: int, repeat: int) -> dict:
+    """Generate a network and run its stages `repeat` times, each in a fresh interpreter."""
+    with tempfile.TemporaryDirectory() as directory:
+        generate(generator, edges, Path(directory))
+        runs = []
+        for _ in range(repeat):
+            result = subprocess.run(
+                [sys.executable, __file__, "--run-case", directory],
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            runs.append(json.loads(result.stdout))
+
+    case = {
+        key: runs[0][key] for key in ("primal_nodes", "primal_edges", "dual_nodes", "dual_edges")
+    }
+    case["generator"], case["edges"] = generator, edges
+    case["seconds"] = {s: statistics.median(run["seconds"][s] for run in runs) for s in STAGES}
+    case["peak_mb"] = {s: max(run["peak_mb"][s] for run in runs) for s in STAGES}
+    return case
+
+
+def compare(results: dict, baseline: dict, tolerance: float, floor: float) -> list:
+    """
+    List the stages slower than their baseline by more than `tolerance` (a fraction) and `floor` (in seconds), or
+    whose peak memory grew by more than `tolerance`, for the cases present in both result sets.
+    """
+
+    reference = {(c["generator"], c["edges"]): c for c in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        old = reference.get((case["generator"], case["edges"]))
+        if old is None:
+            continue
+        for stage in STAGES:
+            before, after = old["seconds"][stage], case["seconds"][stage]
+            if after > before * (1 + tolerance) and after - before > floor:
+                regressions.append((case, stage, "seconds", before, after))
+            before, after = old["peak_mb"][stage], case["peak_mb"][stage]
+            if after > before * (1 + tolerance):
+                regressions.append((case, stage, "peak_mb", before, after))
+    return regressions
+
+
+def _report(case: dict, baseline: dict | None) -> None:
+    old = None
+    if baseline is not None:
+        old = {(c["generator"], c["edges"]): c for c in baseline["cases"]}.get(
+            (case["generator"], case["edges"])
+        )
+    print(
+        f"{case['generator']} {case['edges']:,} edges: {case['primal_nodes']:,} primal nodes -> "
+        f"{case['dual_nodes']:,} streets / {case['dual_edges']:,} intersections"
+    )
+    for stage in STAGES:
+        line = f"  {stage:<12} {case['seconds'][stage]:>9.3f}s {case['peak_mb'][stage]:>8.0f}MB"
+        if old is not None:
+            ratio = case["seconds"][stage] / max(old["seconds"][stage], 1e-9)
+            line += f"   x{ratio:.2f} vs baseline"
+        print(line)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--generators", nargs="+", choices=sorted(GENERATORS), default=list(GENERATORS)
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=list(DEFAULT_SIZES),
+        help="edges per network (default: 1e3 1e4 1e5)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="runs per case, the median is kept (default: 1)"
+    )
+    parser.add_argument("--output", help="path of the JSON results (default: print only)")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown as a fraction (default: 0.25)",
+    )
+    parser.add_argument(
+        "--floor",
+        type=float,
+        default=0.05,
+        help="slowdowns below this many seconds are ignored (default: 0.05)",
+    )
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case(Path(args.run_case))))
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    from street_continuity import __version__
+
+    results = {
+        "version": RESULTS_VERSION,
+        "library": __version__,
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "cases": [],
+    }
+    for generator in args.generators:
+        for size in args.sizes:
+            case = measure(generator, int(float(size)), args.repeat)
+            results["cases"].append(case)
+            _report(case, baseline)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance, args.floor)
+    for case, stage, measure_name, before, after in regressions:
+        print(
+            f"REGRESSION {case['generator']} {case['edges']:,} {stage} {measure_name}: "
+            f"{before:.3f} -> {after:.3f}"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+"""Startup benchmark: the cost of importing StreetContinuity and of a small CSV run.
+
+Each measurement runs in a fresh interpreter, and the median of several runs is
+reported, along with the heavy modules each command ended up importing. The
+"eager" rows import OSMnx next to the library, which is what every process paid
+before OSMnx was imported lazily.
+
+    python benchmarks/startup.py [--repeat 7]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "data"
+HEAVY_MODULES = ("osmnx", "networkx", "geopandas", "shapely", "pandas")
+
+# prints which heavy modules were imported by the time the interpreter exits
+REPORT = (
+    "import atexit, sys; atexit.register(lambda: print('loaded:', ' '.join("
+    f"m for m in {HEAVY_MODULES!r} if m in sys.modules) or '-', file=sys.stderr))"
+)
+
+
+def _commands(output: Path) -> dict:
+    csv_run = (
+        "from street_continuity.__main__ import main; main(['--nodes', 'test-nodes.csv', "
+        f"'--edges', 'test-edges.csv', '--data-dir', {str(DATA_DIR)!r}, "
+        f"'--output', {str(output)!r}])"
+    )
+    return {
+        "python": "pass",
+        "import street_continuity": "import street_continuity",
+        "import street_continuity (eager osmnx)": "import osmnx, street_continuity",
+        "csv run": csv_run,
+        "csv run (eager osmnx)": "import osmnx; " + csv_run,
+    }
+
+
+def _measure(code: str, repeat: int) -> tuple:
+    timings, loaded = [], ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", f"{REPORT}; {code}"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+        loaded = result.stderr.strip().splitlines()[-1].removeprefix("loaded: ")
+    return statistics.median(timings), loaded
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=7, help="runs per command (default: 7)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        commands = _commands(Path(directory) / "dual.graphml")
+        print(f"{'command':<40} {'median':>9}  heavy modules loaded")
+        for name, code in commands.items():
+            median, loaded = _measure(code, args.repeat)
+            print(f"{name:<40} {median * 1000:>7.0f}ms  {loaded}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -34,7 +34,7 @@ Example
 -------
     >>> import osmnx as ox
     >>> from street_continuity.file import from_osmnx, write_graphml, write_supplementary
-    >>> from street_continuity.mapper import dual_mapper
+    >>> from street_continuity.mapper import dual_edges, dual_mapper, dual_sweep
     >>>
     >>> oxg = ox.graph_from_point((-22.012282, -47.890821), dist=5000)
     >>> primal = from_osmnx(oxg=oxg, use_label=True)   # use_label=True -> HICN, False -> ICN
@@ -49,15 +49,37 @@ Copyright 2019, Gabriel Spadon.
     gabriel@spadon.com.br
 """
 
+from street_continuity.cache import load_cached, read_cache, write_cache
+from street_continuity.centrality import Betweenness, betweenness_centrality
+from street_continuity.compact import (
+    CompactDualGraph,
+    CompactPrimalGraph,
+    to_compact,
+    to_compact_dual,
+)
 from street_continuity.file import (
     from_osmnx,
+    read_binary,
     read_csv,
     read_graphml,
+    read_osm,
+    write_binary,
     write_graphml,
     write_supplementary,
 )
 from street_continuity.graph import DualGraph, PrimalGraph
-from street_continuity.mapper import dual_mapper
+from street_continuity.incremental import DualGraphChanges, IncrementalMapper
+from street_continuity.index import (
+    SpatialIndex,
+    StreetIndex,
+    clip,
+    spatial_index,
+    street_index,
+)
+from street_continuity.mapper import dual_edges, dual_mapper, dual_sweep
+from street_continuity.stats import Stats, profile
+from street_continuity.table import AngleTable
+from street_continuity.topology import TopologicalDistances, topological_distances
 from street_continuity.util import compute_angle, compute_distance
 
 __version__ = "0.2.0"
@@ -67,12 +89,38 @@ __license__ = "GPL-3.0-or-later"
 __all__ = [
     "PrimalGraph",
     "DualGraph",
+    "AngleTable",
+    "CompactPrimalGraph",
+    "CompactDualGraph",
+    "to_compact",
+    "to_compact_dual",
     "from_osmnx",
     "read_csv",
     "read_graphml",
+    "read_osm",
+    "write_cache",
+    "read_cache",
+    "load_cached",
     "dual_mapper",
+    "dual_edges",
+    "topological_distances",
+    "TopologicalDistances",
+    "betweenness_centrality",
+    "Betweenness",
+    "street_index",
+    "StreetIndex",
+    "spatial_index",
+    "SpatialIndex",
+    "clip",
+    "dual_sweep",
+    "IncrementalMapper",
+    "DualGraphChanges",
+    "Stats",
+    "profile",
     "write_graphml",
     "write_supplementary",
+    "write_binary",
+    "read_binary",
     "compute_angle",
     "compute_distance",
     "__version__",
@@ -24,20 +24,69 @@ Examples
 
     # Convert a GraphML file previously saved with OSMnx:
     python -m street_continuity --graphml city.graphml --output dual.graphml
+
+    # Stream a local OpenStreetMap extract, without OSMnx:
+    python -m street_continuity --osm region-latest.osm.bz2 --output dual.graphml
+
+    # Same, keeping a binary copy of the parsed network for the next runs:
+    python -m street_continuity --graphml city.graphml --cache-dir .sc-cache --output dual.graphml
+
+    # Map only the streets of a district, cutting it out of the cached city each time:
+    python -m street_continuity --graphml city.graphml --cache-dir .sc-cache \\
+        --clip=-22.03,-47.91,-22.00,-47.87 --output district.graphml
+
+    # Also save a binary copy of the dual graph, to be reloaded with read_binary:
+    python -m street_continuity --graphml city.graphml --output dual.graphml --binary dual.bin
+
+    # Rank the streets by betweenness, estimated from 500 sampled streets, saved in every output:
+    python -m street_continuity --graphml city.graphml --output dual.graphml --betweenness 500
+
+    # Time each stage of the run and count the work of the negotiation, as JSON:
+    python -m street_continuity --graphml city.graphml --output dual.graphml --profile profile.json
+
+    # Sweep several thresholds with both algorithms, writing dual-icn-90.graphml and so on:
+    python -m street_continuity --graphml city.graphml --method icn hicn \\
+        --min-angle 90 120 150 --output dual.graphml
+
+    # Map every city listed in a manifest, four at a time, with a CSV summary of the run:
+    python -m street_continuity --batch cities.csv --jobs 4 --summary summary.csv
+
+A batch manifest is a CSV file with a header row, or a JSON-lines file (.jsonl), whose
+columns are the options of a single run: a source (graphml, osm, nodes and edges,
+place or point), the outputs (output, supplementary, binary) and optionally method,
+min_angle, data_dir, has_header, dist, network_type and a name for the summary. Several
+methods or angles are separated by spaces. Relative paths are taken from the folder of
+the manifest, and columns left out fall back to the options of the batch command.
+
+    name,osm,method,min_angle,output
+    porto-velho,osm/porto-velho.osm.bz2,hicn,120,dual/porto-velho.graphml
+    ji-parana,osm/ji-parana.osm.bz2,icn hicn,120,dual/ji-parana.graphml
 """
 
 import argparse
+import csv
+import json
+import multiprocessing
 import sys
+import time
+from contextlib import nullcontext
+from multiprocessing.connection import wait
 from pathlib import Path
 
 from street_continuity import __version__
+from street_continuity.cache import load_cached
+from street_continuity.centrality import betweenness_centrality
 from street_continuity.file import (
     read_csv,
     read_graphml,
+    read_osm,
+    write_binary,
     write_graphml,
     write_supplementary,
 )
-from street_continuity.mapper import dual_mapper
+from street_continuity.index import clip
+from street_continuity.mapper import dual_sweep
+from street_continuity.stats import profile
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -54,7 +103,14 @@ def build_parser() -> argparse.ArgumentParser:
         "--point", help="'lat,lon' centre point to download around (use with --dist)."
     )
     source.add_argument("--graphml", help="Path to a GraphML file saved with OSMnx.")
+    source.add_argument(
+        "--osm", help="Path to an OpenStreetMap XML extract (.osm, .osm.gz, .osm.bz2)."
+    )
     source.add_argument("--nodes", help="Node CSV file (use with --edges); {id, lat, lon}.")
+    source.add_argument(
+        "--batch",
+        help="Manifest (CSV or JSON lines) of networks to map, one per row, with their options.",
+    )
 
     parser.add_argument("--edges", help="Edge CSV file; {id, source, target, length, name, label}.")
     parser.add_argument(
@@ -76,38 +132,180 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--method",
         choices=("icn", "hicn"),
-        default="hicn",
-        help="Continuity algorithm: 'icn' ignores road class, 'hicn' respects it (default: hicn).",
+        nargs="+",
+        default=["hicn"],
+        help="Continuity algorithm: 'icn' ignores road class, 'hicn' respects it (default: hicn). "
+        "Several methods may be given to map each of them.",
     )
     parser.add_argument(
         "--min-angle",
         type=float,
-        default=120.0,
+        nargs="+",
+        default=[120.0],
         help="Minimum continuity angle in degrees between consecutive segments, "
-        "where 180 is perfectly straight (default: 120).",
+        "where 180 is perfectly straight (default: 120). Several angles may be given to map each "
+        "of them; with more than one method or angle, outputs are suffixed with -METHOD-ANGLE.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for HICN, which negotiates each road class in parallel; with --batch, "
+        "the number of manifest entries mapped at once (default: 1).",
+    )
+    parser.add_argument(
+        "--tiles",
+        type=int,
+        default=1,
+        help="Split the network into about this many spatial tiles, mapped by the --jobs workers "
+        "and stitched at their boundaries (default: 1, no tiling).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("seed", "matching"),
+        default="seed",
+        help="How streets are negotiated: 'seed' grows them one at a time from the edges in input "
+        "order; 'matching' pairs the segments at every intersection on its own and joins the pairs "
+        "(default: seed).",
     )
     parser.add_argument(
         "--has-header", action="store_true", help="Skip the first row of each CSV file."
     )
-    parser.add_argument("--output", required=True, help="Output GraphML path for the dual graph.")
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for a binary cache of the loaded network and its angles, so repeated runs "
+        "on the same --graphml or CSV input skip parsing; entries are rebuilt when the input changes.",
+    )
+    parser.add_argument(
+        "--clip",
+        metavar="REGION",
+        help="Map only the part of the network inside a region: 'south,west,north,east' for a box, "
+        "'lat,lon,meters' for a circle, or the path of a GeoJSON polygon; the clip is taken after "
+        "loading, so a --cache-dir entry of the whole network serves every region. Write "
+        "--clip=REGION when it starts with a minus sign.",
+    )
+    parser.add_argument(
+        "--output", help="Output GraphML path for the dual graph (required, except with --batch)."
+    )
     parser.add_argument("--supplementary", help="Optional path for the supplementary text file.")
+    parser.add_argument(
+        "--binary",
+        help="Optional path for a binary copy of the dual graph, which read_binary memory-maps.",
+    )
+    parser.add_argument(
+        "--betweenness",
+        type=int,
+        nargs="?",
+        const=0,
+        metavar="SAMPLES",
+        help="Compute the betweenness of each street and save it as the 'betweenness' attribute of "
+        "every output; exact without SAMPLES, otherwise estimated from that many sampled streets.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        metavar="PATH",
+        help="Time each stage and count the work of the negotiation, saving the statistics as JSON at "
+        "PATH, or printing them to stderr when no path is given.",
+    )
+    parser.add_argument(
+        "--summary", help="With --batch, also save the summary table as a CSV file at this path."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="With --batch, map every entry, even those whose outputs are newer than their inputs.",
+    )
+    parser.add_argument(
+        "--max-download-age",
+        type=float,
+        metavar="HOURS",
+        help="With --batch, skip entries downloaded from OpenStreetMap (place or point) whose outputs "
+        "are younger than this many hours; without it, those entries are always downloaded again.",
+    )
     return parser
 
 
+def _sources(args: argparse.Namespace) -> list[Path]:
+    """List the local files a network is read from; downloaded networks have none."""
+    if args.nodes:
+        return [Path(args.data_dir) / args.nodes, Path(args.data_dir) / args.edges]
+    if args.graphml:
+        return [Path(args.graphml)]
+    if args.osm:
+        return [Path(args.osm)]
+    return []
+
+
 def _load_primal(args: argparse.Namespace, use_label: bool):
-    """Build a PrimalGraph from whichever source the user selected."""
+    """Build a PrimalGraph from whichever source the user selected, with its AngleTable when cached."""
     if args.nodes:
         if not args.edges:
             raise SystemExit("--nodes requires --edges.")
-        return read_csv(args.nodes, args.edges, args.data_dir, use_label, args.has_header)
+        options = {"reader": "csv", "use_label": use_label, "has_header": args.has_header}
 
-    if args.graphml:
-        return read_graphml(args.graphml, use_label)
+        def loader(compact=False):
+            return read_csv(
+                args.nodes, args.edges, args.data_dir, use_label, args.has_header, compact=compact
+            )
+
+    elif args.graphml:
+        options = {"reader": "graphml", "use_label": use_label}
+
+        def loader(compact=False):
+            return read_graphml(args.graphml, use_label, compact=compact)
+
+    elif args.osm:
+        options = {"reader": "osm", "use_label": use_label}
+
+        def loader(compact=False):
+            return read_osm(args.osm, use_label, compact=compact)
+
+    else:
+        # remaining sources require OSMnx network access, which keeps its own cache
+        return _download_primal(args, use_label), None
+
+    if args.cache_dir:
+        return load_cached(args.cache_dir, _sources(args), lambda: loader(compact=True), options)
+    return loader(), None
+
+
+def _clip_region(value: str) -> dict:
+    """Read a --clip value as the keyword arguments of clip, from numbers or a GeoJSON polygon."""
+    try:
+        numbers = [float(v) for v in value.split(",")]
+    except ValueError:
+        numbers = None
+    if numbers is not None:
+        if len(numbers) == 4:
+            return {"bbox": tuple(numbers)}
+        if len(numbers) == 3:
+            return {"circle": tuple(numbers)}
+        raise SystemExit(
+            "--clip takes 'south,west,north,east', 'lat,lon,meters' or a GeoJSON path."
+        )
 
-    # remaining sources require OSMnx network access
-    import osmnx as ox
+    try:
+        geometry = json.loads(Path(value).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise SystemExit(f"--clip could not read a GeoJSON polygon from {value}: {exc}") from exc
+    # a collection or a feature holds its polygon as the geometry of its first feature
+    if geometry.get("type") == "FeatureCollection":
+        geometry = (geometry.get("features") or [{}])[0]
+    if geometry.get("type") == "Feature":
+        geometry = geometry.get("geometry") or {}
+    if geometry.get("type") != "Polygon":
+        raise SystemExit(f"--clip expects a GeoJSON Polygon in {value}.")
+    # GeoJSON lists (longitude, latitude) positions, and the exterior ring comes first
+    return {"polygon": [(lat, lon) for lon, lat, *_ in geometry["coordinates"][0]]}
 
-    from street_continuity.file import from_osmnx
+
+def _download_primal(args: argparse.Namespace, use_label: bool):
+    """Build a PrimalGraph from a place or point downloaded from OpenStreetMap."""
+    from street_continuity.file import __import_osmnx__, from_osmnx
+
+    ox = __import_osmnx__()
 
     if args.place:
         oxg = ox.graph_from_place(args.place, network_type=args.network_type)
@@ -121,33 +319,355 @@ def _load_primal(args: argparse.Namespace, use_label: bool):
     return from_osmnx(oxg, use_label)
 
 
+def _suffixed(path: Path, method: str, min_angle: float, sweep: bool) -> Path:
+    """Name the output of one configuration of a sweep, e.g. dual.graphml -> dual-icn-120.graphml."""
+    if not sweep:
+        return path
+    return path.with_name(f"{path.stem}-{method}-{min_angle:g}{path.suffix}")
+
+
+def _configurations(args: argparse.Namespace) -> tuple[list, list, bool]:
+    """Distinct methods and angles of a run, and whether they make a sweep."""
+    methods = list(dict.fromkeys(args.method))
+    min_angles = list(dict.fromkeys(args.min_angle))
+    return methods, min_angles, len(methods) * len(min_angles) > 1
+
+
+def _outputs(args: argparse.Namespace) -> list[Path]:
+    """List every file a run writes."""
+    methods, min_angles, sweep = _configurations(args)
+    outputs = []
+    for method in methods:
+        for min_angle in min_angles:
+            for path in (args.output, args.supplementary, args.binary):
+                if path:
+                    outputs.append(_suffixed(Path(path), method, min_angle, sweep))
+    return outputs
+
+
+def _map_network(args: argparse.Namespace) -> list[dict]:
+    """Load, map and write the network of one run, returning the counts of each configuration."""
+    methods, min_angles, sweep = _configurations(args)
+
+    # labels are loaded whenever HICN is requested; ICN runs then ignore them
+    use_label = "hicn" in methods
+    primal, angle_table = _load_primal(args, use_label)
+    if args.clip:
+        # the angles of a cached network cover all of it, so the clipped part recomputes its own
+        primal, angle_table = clip(primal, **_clip_region(args.clip)), None
+    duals = dual_sweep(
+        primal,
+        min_angles,
+        methods,
+        jobs=args.jobs,
+        tiles=args.tiles,
+        angle_table=angle_table,
+        engine=args.engine,
+    )
+
+    rows = []
+    for (method, min_angle), dual in duals.items():
+        output = _suffixed(Path(args.output), method, min_angle, sweep)
+        if output.parent != Path(""):
+            output.parent.mkdir(parents=True, exist_ok=True)
+        directory = str(output.parent) if str(output.parent) else "."
+        if args.betweenness is not None:
+            # sampled streets are drawn with a fixed seed, so that repeated runs agree
+            betweenness_centrality(dual, samples=args.betweenness or None, jobs=args.jobs, seed=0)
+        write_graphml(dual, filename=output.name, directory=directory)
+
+        if args.supplementary:
+            supp = _suffixed(Path(args.supplementary), method, min_angle, sweep)
+            if str(supp.parent):
+                supp.parent.mkdir(parents=True, exist_ok=True)
+            write_supplementary(dual, filename=supp.name, directory=str(supp.parent) or ".")
+
+        if args.binary:
+            binary = _suffixed(Path(args.binary), method, min_angle, sweep)
+            write_binary(dual, filename=binary.name, directory=str(binary.parent) or ".")
+
+        rows.append(
+            {
+                "method": method,
+                "min_angle": min_angle,
+                "primal_nodes": len(primal.node_dictionary),
+                "primal_edges": len(primal.edge_dictionary),
+                "dual_nodes": len(dual.node_dictionary),
+                "dual_edges": len(dual.edge_dictionary),
+                "output": str(output),
+            }
+        )
+    return rows
+
+
+# manifest columns holding paths, which are taken relative to the folder of the manifest
+_MANIFEST_PATHS = ("graphml", "osm", "data_dir", "output", "supplementary", "binary")
+_MANIFEST_COLUMNS = (
+    "name",
+    "place",
+    "point",
+    "nodes",
+    "edges",
+    "has_header",
+    "dist",
+    "network_type",
+    "method",
+    "min_angle",
+    *_MANIFEST_PATHS,
+)
+_SUMMARY_COLUMNS = (
+    "name",
+    "status",
+    "method",
+    "min_angle",
+    "primal_nodes",
+    "primal_edges",
+    "dual_nodes",
+    "dual_edges",
+    "seconds",
+    "peak_mb",
+)
+
+
+def _read_manifest(path: Path) -> list[dict]:
+    """Read the rows of a batch manifest, as CSV with a header or as JSON lines, skipping blank ones."""
+    with open(path, newline="", encoding="utf-8") as stream:
+        if path.suffix.lower() in (".jsonl", ".ndjson", ".json"):
+            rows = [json.loads(line) for line in stream if line.strip()]
+        else:
+            rows = list(csv.DictReader(stream))
+
+    entries = []
+    for row in rows:
+        entry = {
+            str(key).strip().replace("-", "_"): value
+            for key, value in row.items()
+            if key is not None and value not in (None, "", [])
+        }
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def _entry_arguments(entry: dict, args: argparse.Namespace, folder: Path, line: int):
+    """Turn a manifest entry into the options of a single run, on top of those of the batch command."""
+    unknown = sorted(set(entry) - set(_MANIFEST_COLUMNS))
+    if unknown:
+        raise ValueError(f"unknown manifest columns: {', '.join(unknown)}")
+
+    argv = []
+    for key, value in entry.items():
+        if key in ("name", "has_header"):
+            continue
+        if key in _MANIFEST_PATHS:
+            value = folder / Path(str(value)).expanduser()
+        if key in ("method", "min_angle"):
+            values = value.split() if isinstance(value, str) else value
+            argv += [f"--{key.replace('_', '-')}", *map(str, values)]
+        else:
+            argv += [f"--{key.replace('_', '-')}", str(value)]
+
+    parser = build_parser()
+    parser.set_defaults(
+        data_dir=str(folder),
+        method=args.method,
+        min_angle=args.min_angle,
+        tiles=args.tiles,
+        engine=args.engine,
+        dist=args.dist,
+        network_type=args.network_type,
+        has_header=args.has_header,
+        cache_dir=args.cache_dir,
+        betweenness=args.betweenness,
+        clip=args.clip,
+    )
+    try:
+        entry_args = parser.parse_args(argv)
+    except SystemExit:
+        raise ValueError("invalid manifest entry (see the message above)") from None
+    if not entry_args.output:
+        raise ValueError("the output column is required")
+    if entry_args.nodes and not entry_args.edges:
+        raise ValueError("the nodes column requires the edges column")
+    if "has_header" in entry:
+        flag = entry["has_header"]
+        entry_args.has_header = str(flag).strip().lower() in ("1", "true", "yes", "y")
+
+    entry_args.line = line
+    entry_args.name = str(entry.get("name") or Path(entry_args.output).stem or f"line {line}")
+    return entry_args
+
+
+def _is_up_to_date(args: argparse.Namespace, max_download_age: float | None = None) -> bool:
+    """
+    Tell whether every output of a run exists and is newer than every input. Downloaded networks have no input
+    file to compare with, so their outputs only count as up to date while younger than `max_download_age` hours.
+    """
+    try:
+        oldest = min(output.stat().st_mtime_ns for output in _outputs(args))
+        newest = max((source.stat().st_mtime_ns for source in _sources(args)), default=0)
+    except OSError:
+        return False
+    if args.place or args.point:
+        return max_download_age is not None and time.time_ns() - oldest <= max_download_age * 3.6e12
+    return oldest >= newest
+
+
+def _input_size(args: argparse.Namespace) -> int:
+    """Total size of the input files of a run, used to start the largest networks first."""
+    return sum(source.stat().st_size for source in _sources(args) if source.exists())
+
+
+def _peak_memory() -> float | None:
+    """Peak resident memory of the current process in megabytes, where the platform reports it."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _run_entry(args: argparse.Namespace, connection) -> None:
+    """Map one manifest entry in a worker process and send back its summary rows."""
+    start = time.perf_counter()
+    try:
+        rows, error = _map_network(args), None
+    except (Exception, SystemExit) as exc:  # noqa: BLE001 - reported in the summary
+        rows, error = [], f"{type(exc).__name__}: {exc}"
+    connection.send((rows, error, time.perf_counter() - start, _peak_memory()))
+    connection.close()
+
+
+def _run_batch(entries: list, jobs: int):
+    """
+    Map manifest entries with up to `jobs` worker processes, largest inputs first, yielding each entry as it
+    finishes with its summary rows, error, wall time and peak memory. Every entry runs in a process of its own, so
+    its peak memory is its own, and an entry that crashes its worker (e.g. out of memory) fails alone.
+    """
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    pending = sorted(entries, key=_input_size, reverse=True)
+    running = {}
+    while pending or running:
+        while pending and len(running) < max(jobs, 1):
+            entry = pending.pop(0)
+            reader, writer = context.Pipe(duplex=False)
+            process = context.Process(target=_run_entry, args=(entry, writer), daemon=True)
+            process.start()
+            writer.close()
+            running[process.sentinel] = (entry, process, reader)
+
+        for sentinel in wait(list(running)):
+            entry, process, reader = running.pop(sentinel)
+            try:
+                rows, error, seconds, peak = reader.recv()
+            except EOFError:
+                process.join()
+                error = f"worker exited with code {process.exitcode}"
+                rows, seconds, peak = [], None, None
+            process.join()
+            reader.close()
+            yield entry, rows, error, seconds, peak
+
+
+def _print_table(rows: list[dict], stream) -> None:
+    """Print summary rows as an aligned plain-text table."""
+    cells = [[str(row.get(column, "")) for column in _SUMMARY_COLUMNS] for row in rows]
+    widths = [
+        max(len(column), *(len(line[i]) for line in cells))
+        for i, column in enumerate(_SUMMARY_COLUMNS)
+    ]
+    for line in [list(_SUMMARY_COLUMNS), *cells]:
+        print(
+            "  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip(), file=stream
+        )
+
+
+def _batch(args: argparse.Namespace) -> int:
+    """Map every entry of a batch manifest, continuing past failures, and report a summary table."""
+    manifest = Path(args.batch)
+    folder = manifest.resolve().parent
+
+    summary, entries = [], []
+    for line, entry in enumerate(_read_manifest(manifest), start=1):
+        try:
+            entry_args = _entry_arguments(entry, args, folder, line)
+        except ValueError as exc:
+            print(f"Entry {line}: {exc}", file=sys.stderr)
+            summary.append(
+                {"line": line, "name": entry.get("name", f"line {line}"), "status": "invalid"}
+            )
+            continue
+        # entries run side by side, so each one negotiates its road classes in a single process
+        entry_args.jobs = 1
+        if not args.force and _is_up_to_date(entry_args, args.max_download_age):
+            summary.append({"line": line, "name": entry_args.name, "status": "up to date"})
+        else:
+            entries.append(entry_args)
+
+    for done, (entry, rows, error, seconds, peak) in enumerate(_run_batch(entries, args.jobs), 1):
+        measures = {
+            "line": entry.line,
+            "name": entry.name,
+            "seconds": "" if seconds is None else f"{seconds:.2f}",
+            "peak_mb": "" if peak is None else f"{peak:.0f}",
+        }
+        if error:
+            summary.append({**measures, "status": "failed"})
+            print(f"[{done}/{len(entries)}] {entry.name}: {error}", file=sys.stderr)
+        else:
+            summary.extend(
+                {**measures, **row, "min_angle": f"{row['min_angle']:g}", "status": "mapped"}
+                for row in rows
+            )
+            print(
+                f"[{done}/{len(entries)}] {entry.name}: mapped in {seconds:.2f} s", file=sys.stderr
+            )
+        sys.stderr.flush()
+
+    # entries finish in any order, the summary follows the manifest
+    summary.sort(key=lambda row: row["line"])
+    _print_table(summary, sys.stdout)
+    if args.summary:
+        with open(args.summary, "w", newline="", encoding="utf-8") as stream:
+            writer = csv.DictWriter(stream, _SUMMARY_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(summary)
+
+    return 1 if any(row["status"] in ("failed", "invalid") for row in summary) else 0
+
+
 def main(argv: list[str] | None = None) -> int:
     """Entry point for ``python -m street_continuity`` and the console script."""
-    args = build_parser().parse_args(argv)
-    use_label = args.method == "hicn"
-
-    primal = _load_primal(args, use_label)
-    dual = dual_mapper(primal, min_angle=args.min_angle)
-
-    output = Path(args.output)
-    if output.parent != Path(""):
-        output.parent.mkdir(parents=True, exist_ok=True)
-    directory = str(output.parent) if str(output.parent) else "."
-    write_graphml(dual, filename=output.name, directory=directory)
-
-    if args.supplementary:
-        supp = Path(args.supplementary)
-        if str(supp.parent):
-            supp.parent.mkdir(parents=True, exist_ok=True)
-        write_supplementary(dual, filename=supp.name, directory=str(supp.parent) or ".")
-
-    print(
-        f"{args.method.upper()}: {len(primal.node_dictionary)} primal nodes / "
-        f"{len(primal.edge_dictionary)} primal edges -> "
-        f"{len(dual.node_dictionary)} dual nodes / {len(dual.edge_dictionary)} dual edges",
-        file=sys.stderr,
-    )
-    print(f"Wrote {output}")
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.batch:
+        if args.profile:
+            parser.error("--profile cannot be combined with --batch")
+        return _batch(args)
+    if not args.output:
+        parser.error("the following arguments are required: --output")
+
+    _, _, sweep = _configurations(args)
+    with profile() if args.profile else nullcontext() as stats:
+        rows = _map_network(args)
+
+    for row in rows:
+        print(
+            f"{row['method'].upper()}: {row['primal_nodes']} primal nodes / "
+            f"{row['primal_edges']} primal edges -> "
+            f"{row['dual_nodes']} dual nodes / {row['dual_edges']} dual edges"
+            + (f" (min angle {row['min_angle']:g})" if sweep else ""),
+            file=sys.stderr,
+        )
+        print(f"Wrote {row['output']}")
+
+    if args.profile == "-":
+        print(stats.to_json(), file=sys.stderr)
+    elif args.profile:
+        Path(args.profile).write_text(stats.to_json() + "\n")
     return 0
 
 
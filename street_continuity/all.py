@@ -9,14 +9,40 @@
 """
 
 from street_continuity import (  # noqa: F401
+    AngleTable,
+    Betweenness,
+    CompactDualGraph,
+    CompactPrimalGraph,
     DualGraph,
+    DualGraphChanges,
+    IncrementalMapper,
     PrimalGraph,
+    SpatialIndex,
+    Stats,
+    StreetIndex,
+    TopologicalDistances,
+    betweenness_centrality,
+    clip,
     compute_angle,
     compute_distance,
+    dual_edges,
     dual_mapper,
+    dual_sweep,
     from_osmnx,
+    load_cached,
+    profile,
+    read_binary,
+    read_cache,
     read_csv,
     read_graphml,
+    read_osm,
+    spatial_index,
+    street_index,
+    to_compact,
+    to_compact_dual,
+    topological_distances,
+    write_binary,
+    write_cache,
     write_graphml,
     write_supplementary,
 )
@@ -24,12 +50,38 @@ from street_continuity import (  # noqa: F401
 __all__ = [
     "PrimalGraph",
     "DualGraph",
+    "AngleTable",
+    "CompactPrimalGraph",
+    "CompactDualGraph",
+    "to_compact",
+    "to_compact_dual",
     "from_osmnx",
     "read_csv",
     "read_graphml",
+    "read_osm",
+    "write_cache",
+    "read_cache",
+    "load_cached",
     "dual_mapper",
+    "dual_edges",
+    "topological_distances",
+    "TopologicalDistances",
+    "betweenness_centrality",
+    "Betweenness",
+    "street_index",
+    "StreetIndex",
+    "spatial_index",
+    "SpatialIndex",
+    "clip",
+    "dual_sweep",
+    "IncrementalMapper",
+    "DualGraphChanges",
+    "Stats",
+    "profile",
     "write_graphml",
     "write_supplementary",
+    "write_binary",
+    "read_binary",
     "compute_angle",
     "compute_distance",
 ]
@@ -0,0 +1,226 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from street_continuity.compact import CompactPrimalGraph, to_compact
+from street_continuity.graph import PrimalGraph
+from street_continuity.table import AngleTable
+
+# version of the layout of a cache entry, entries of any other version are rebuilt
+CACHE_VERSION = 1
+
+# arrays of a CompactPrimalGraph and of an AngleTable, each one kept in its own .npy file
+__graph_arrays__ = (
+    "node_ids",
+    "coordinates",
+    "edge_ids",
+    "sources",
+    "targets",
+    "lengths",
+    "names",
+    "labels",
+    "offsets",
+    "neighbors",
+    "edges",
+)
+__table_arrays__ = ("edge_slots", "pair_offsets", "angles")
+
+
+def __fingerprint__(sources) -> list:
+    """
+    This method describes the current state of the source files of a network by their path, size and modification
+    time, which is enough to tell that a file changed without reading it.
+    :return: list of dictionaries, one per source file
+    """
+
+    fingerprint = []
+    for source in sources:
+        status = Path(source).stat()
+        fingerprint.append(
+            {
+                "path": str(Path(source).resolve()),
+                "size": status.st_size,
+                "mtime": status.st_mtime_ns,
+            }
+        )
+
+    return fingerprint
+
+
+def write_cache(
+    primal_graph: PrimalGraph | CompactPrimalGraph,
+    directory: str,
+    angle_table: AngleTable | None = None,
+    sources=(),
+):
+    """
+    This method saves a primal graph as a bundle of .npy files, one per array of its CompactPrimalGraph form, along
+    with a manifest.json file holding the street name and label tables. The bundle is written to a temporary
+    directory that is renamed into place at the end (see __swap__), so a cache entry is never seen half-written.
+    :param primal_graph: a street network mapped to a PrimalGraph or CompactPrimalGraph object
+    :param directory: path of the bundle (a directory)
+    :param angle_table: if informed, the AngleTable of the primal graph is saved as well
+    :param sources: paths of the files the primal graph was read from, whose state is recorded for invalidation
+    :return: Path of the bundle
+    """
+
+    if not isinstance(primal_graph, CompactPrimalGraph):
+        primal_graph = to_compact(primal_graph)
+
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{directory.name}-", dir=directory.parent))
+    try:
+        for name in __graph_arrays__:
+            np.save(staging / f"{name}.npy", getattr(primal_graph, name), allow_pickle=False)
+        if angle_table is not None:
+            for name in __table_arrays__:
+                np.save(staging / f"{name}.npy", getattr(angle_table, name), allow_pickle=False)
+
+        manifest = {
+            "version": CACHE_VERSION,
+            "sources": __fingerprint__(sources),
+            "has_angles": angle_table is not None,
+            "name_table": primal_graph.name_table,
+            "label_table": primal_graph.label_table,
+        }
+        (staging / "manifest.json").write_text(json.dumps(manifest))
+
+        __swap__(staging, directory)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    return directory
+
+
+def __swap__(staging: Path, directory: Path):
+    """
+    This method moves a complete bundle into place with a rename, which readers see all at once. A directory can
+    only be renamed over a missing (or empty) one, so a previous entry is first renamed aside, under a unique name,
+    and deleted after the swap. Several writers may store the same entry at once (e.g., batch runs sharing a cache):
+    when another writer's bundle takes the place first, that bundle, built from the same sources, is kept.
+    :param staging: path of the complete bundle
+    :param directory: path of the entry
+    :return: None
+    """
+
+    try:
+        os.replace(staging, directory)
+        return
+    except OSError:
+        pass
+
+    retired = staging.with_name(f"{staging.name}-retired")
+    try:
+        os.replace(directory, retired)
+    except OSError:
+        pass
+    try:
+        os.replace(staging, directory)
+    except OSError:
+        # another writer won the race (or the previous entry could not be moved), so this bundle is dropped
+        shutil.rmtree(staging, ignore_errors=True)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def read_cache(directory: str, mmap: bool = False):
+    """
+    This method loads a primal graph saved by write_cache, as a CompactPrimalGraph.
+    :param directory: path of the bundle (a directory)
+    :param mmap: if true, the arrays are memory-mapped (read-only) instead of read into memory
+    :return: tuple with the CompactPrimalGraph and its AngleTable, or None when the bundle holds no angles
+    """
+
+    directory = Path(directory)
+    manifest = json.loads((directory / "manifest.json").read_text())
+    if manifest.get("version") != CACHE_VERSION:
+        raise ValueError(f"Unsupported cache version in {directory}: {manifest.get('version')!r}")
+
+    def load(name):
+        return np.load(
+            directory / f"{name}.npy", mmap_mode="r" if mmap else None, allow_pickle=False
+        )
+
+    compact_graph = CompactPrimalGraph()
+    for name in __graph_arrays__:
+        setattr(compact_graph, name, load(name))
+    compact_graph.name_table = manifest["name_table"]
+    compact_graph.label_table = manifest["label_table"]
+
+    angle_table = None
+    if manifest["has_angles"]:
+        angle_table = AngleTable().restore_table(
+            compact_graph, *(load(name) for name in __table_arrays__)
+        )
+
+    return compact_graph, angle_table
+
+
+def is_fresh(directory: str, sources=()) -> bool:
+    """
+    This method tells whether a bundle exists and was written from the current state of the given source files.
+    :param directory: path of the bundle (a directory)
+    :param sources: paths of the files the primal graph was read from
+    :return: bool
+    """
+
+    try:
+        manifest = json.loads((Path(directory) / "manifest.json").read_text())
+        return manifest.get("version") == CACHE_VERSION and manifest["sources"] == __fingerprint__(
+            sources
+        )
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def load_cached(cache_dir: str, sources, loader, options: dict | None = None, mmap: bool = False):
+    """
+    This method returns the primal graph read from the given source files, loading it from the cache whenever the
+    cache holds an entry written from the current state of those files. Otherwise, the primal graph is read with the
+    given loader and saved to the cache, along with its AngleTable. Entries are keyed by the source paths and by
+    the reading options, so the same files read with different options are kept apart.
+    :param cache_dir: directory of the cache
+    :param sources: paths of the files the primal graph is read from
+    :param loader: function without arguments that reads the primal graph from the source files
+    :param options: reading options that change the resulting primal graph (e.g., use_label)
+    :param mmap: if true, the arrays of a cached entry are memory-mapped instead of read into memory
+    :return: tuple with the CompactPrimalGraph and its AngleTable
+    """
+
+    key = json.dumps(
+        {"sources": [str(Path(source).resolve()) for source in sources], "options": options or {}},
+        sort_keys=True,
+    )
+    directory = Path(cache_dir) / hashlib.sha256(key.encode()).hexdigest()[:24]
+
+    compact_graph = angle_table = None
+    if is_fresh(directory, sources):
+        try:
+            compact_graph, angle_table = read_cache(directory, mmap)
+        except (OSError, ValueError, KeyError):
+            # the entry was being replaced by another writer, so the sources are read again
+            compact_graph = None
+        if angle_table is not None:
+            return compact_graph, angle_table
+    if compact_graph is None:
+        compact_graph = loader()
+        if not isinstance(compact_graph, CompactPrimalGraph):
+            compact_graph = to_compact(compact_graph)
+
+    angle_table = AngleTable().build_table(compact_graph)
+    write_cache(compact_graph, directory, angle_table, sources)
+
+    return compact_graph, angle_table
@@ -0,0 +1,735 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+
+
+from collections.abc import Mapping
+from itertools import chain
+
+import numpy as np
+
+from street_continuity.graph import DualGraph, PrimalGraph
+from street_continuity.stats import timed
+
+
+def __index_dtype__(size: int):
+    """
+    This method picks the narrowest integer type able to hold dense indices up to the given size.
+    :return: numpy dtype
+    """
+
+    return np.int32 if size < np.iinfo(np.int32).max else np.int64
+
+
+def __factorize__(values) -> tuple:
+    """
+    This method encodes a sequence of hashable values as integer codes into a table of unique values.
+    :return: tuple with the array of codes and the list of unique values, in order of appearance
+    """
+
+    table = {}
+    codes = np.fromiter((table.setdefault(value, len(table)) for value in values), np.int64)
+    return codes.astype(__index_dtype__(len(table))), list(table)
+
+
+def __lookup__(ids: np.ndarray, sorter: np.ndarray, values) -> np.ndarray:
+    """
+    This method maps original ids into dense indices by binary search over the sorted ids.
+    :param ids: array of original ids, whose position is the dense index
+    :param sorter: permutation that sorts the original ids, or None when they are already sorted
+    :param values: array of original ids to be mapped
+    :return: array of dense indices
+    """
+
+    values = np.asarray(values)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(ids) == 0:
+        raise KeyError(values[0].item())
+
+    position = np.minimum(np.searchsorted(ids, values, sorter=sorter), len(ids) - 1)
+    dense = position if sorter is None else sorter[position]
+    missing = ids[dense] != values
+    if np.any(missing):
+        raise KeyError(values[np.argmax(missing)].item())
+
+    return dense
+
+
+class CompactPrimalGraph:
+    """
+    This class gathers the same information as a PrimalGraph, but keeps it in flat arrays instead of Python objects.
+    Nodes and edges are remapped to dense integer indices, edge attributes are stored as parallel arrays and the
+    adjacency list is stored in CSR form (offsets, neighbors and edge ids), following the same order as PrimalGraph.
+    """
+
+    def __init__(self):
+        self.node_ids = np.zeros(0, dtype=np.int64)  # [array] original id of each node;
+        self.coordinates = np.zeros((0, 2), dtype=np.float64)  # [array] (lat, lon) of each node;
+        self.edge_ids = np.zeros(0, dtype=np.int64)  # [array] original id of each edge;
+        self.sources = np.zeros(0, dtype=np.int32)  # [array] dense source node of each edge;
+        self.targets = np.zeros(0, dtype=np.int32)  # [array] dense target node of each edge;
+        self.lengths = np.zeros(0, dtype=np.float64)  # [array] length (in meters) of each edge;
+        self.names = np.zeros(0, dtype=np.int32)  # [array] code of the street name of each edge;
+        self.labels = np.zeros(0, dtype=np.int32)  # [array] code of the street label of each edge;
+        self.name_table = []  # [list] street name of each name code;
+        self.label_table = []  # [list] street label of each label code;
+        self.offsets = np.zeros(1, dtype=np.int64)  # [array] slots of node i, offsets[i]:[i + 1];
+        self.neighbors = np.zeros(0, dtype=np.int32)  # [array] node reached through each slot;
+        self.edges = np.zeros(0, dtype=np.int32)  # [array] edge stored in each adjacency slot; and,
+        self.index = None  # [SpatialIndex] index of the nodes by location, built by spatial_index.
+        self.__node_sorter = None
+        self.__edge_sorter = None
+
+    def set_nodes(self, node_ids, coordinates, dtype=np.float64):
+        """
+        This method sets the nodes of the graph.
+        :param node_ids: sequence of original node ids (integers or strings)
+        :param coordinates: sequence of (latitude, longitude) pairs, one per node
+        :param dtype: floating-point type of the coordinates (numpy.float64 or numpy.float32)
+        """
+
+        self.node_ids = np.asarray(node_ids)
+        self.coordinates = np.asarray(coordinates, dtype=dtype).reshape(-1, 2)
+        self.index = None
+        self.__node_sorter = None
+
+    def set_edges(self, edge_ids, sources, targets, lengths, names, labels):
+        """
+        This method sets the edges of the graph, whose source and target are given as original node ids.
+        The nodes must be set beforehand, as the endpoints are remapped into dense indices.
+        :param edge_ids: sequence of original edge ids (integers or strings)
+        :param sources: sequence with the original id of the source node of each edge
+        :param targets: sequence with the original id of the target node of each edge
+        :param lengths: sequence with the street length (in meters) of each edge
+        :param names: sequence with the street name of each edge
+        :param labels: sequence with the street label of each edge
+        """
+
+        self.edge_ids = np.asarray(edge_ids)
+        dtype = __index_dtype__(len(self.node_ids))
+        self.sources = self.node_indices(sources).astype(dtype)
+        self.targets = self.node_indices(targets).astype(dtype)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.names, self.name_table = __factorize__(names)
+        self.labels, self.label_table = __factorize__(labels)
+        self.index = None
+        self.__edge_sorter = None
+
+    @timed("build_graph")
+    def build_graph(self):
+        """
+        This method creates the CSR adjacency list of the CompactPrimalGraph using the arrays of edges.
+        Each node lists its neighbors in the order they first appear among the edges, and a pair of nodes linked by
+        parallel edges keeps the last of them, exactly as in the dictionary-based PrimalGraph.
+        :return: CompactPrimalGraph
+        """
+
+        n, m = len(self.node_ids), len(self.edge_ids)
+        dtype = __index_dtype__(max(n, m))
+
+        # every edge is seen from both endpoints, the outgoing link first and the incoming link next
+        owners = np.stack((self.sources, self.targets), axis=1).ravel().astype(np.int64)
+        others = np.stack((self.targets, self.sources), axis=1).ravel().astype(np.int64)
+        sequence = np.arange(2 * m, dtype=np.int64)
+
+        # collapsing repeated pairs, keeping the first position and the last edge of each pair
+        order = np.lexsort((sequence, others, owners))
+        owners, others, sequence = owners[order], others[order], sequence[order]
+        starts = np.ones(len(order), dtype=bool)
+        starts[1:] = (owners[1:] != owners[:-1]) | (others[1:] != others[:-1])
+        first = np.flatnonzero(starts)
+        last = np.append(first[1:] - 1, len(order) - 1)[: len(first)]
+
+        # ordering the slots of each node by the first appearance of the pair
+        slots = np.lexsort((sequence[first], owners[first]))
+        self.neighbors = others[first][slots].astype(dtype)
+        self.edges = (sequence[last][slots] // 2).astype(dtype)
+        degrees = np.bincount(owners[first], minlength=n)
+        self.offsets = np.concatenate(([0], np.cumsum(degrees))).astype(np.int64)
+
+        return self
+
+    def edge(self, index: int) -> PrimalGraph.Edge:
+        """
+        This method materializes the edge at a dense index as a PrimalGraph.Edge.
+        :param index: dense index of the edge
+        :return: PrimalGraph.Edge
+        """
+
+        return PrimalGraph.Edge(
+            self.edge_ids[index].item(),
+            self.node_ids[self.sources[index]].item(),
+            self.node_ids[self.targets[index]].item(),
+            float(self.lengths[index]),
+            self.name_table[self.names[index]],
+            self.label_table[self.labels[index]],
+        )
+
+    def node_index(self, nid) -> int:
+        """
+        This method returns the dense index of an original node id.
+        :return: int
+        """
+
+        return int(self.node_indices([nid])[0])
+
+    def node_indices(self, node_ids) -> np.ndarray:
+        """
+        This method returns the dense indices of a sequence of original node ids.
+        :return: array of dense indices
+        """
+
+        return __lookup__(self.node_ids, self.__node_order(), node_ids)
+
+    def edge_index(self, eid) -> int:
+        """
+        This method returns the dense index of an original edge id.
+        :return: int
+        """
+
+        if self.__edge_sorter is None:
+            self.__edge_sorter = np.argsort(self.edge_ids, kind="stable")
+        return int(__lookup__(self.edge_ids, self.__edge_sorter, [eid])[0])
+
+    def spatial_index(self):
+        """
+        This method returns the spatial index of the nodes of the CompactPrimalGraph, along with the edges incident to
+        each node (see SpatialIndex), which is built on the first call and used to clip the graph to a region.
+        :return: SpatialIndex
+        """
+
+        if self.index is None:
+            from street_continuity.index import spatial_index
+
+            self.index = spatial_index(self)
+        return self.index
+
+    @property
+    def node_dictionary(self) -> Mapping:
+        """Read-only view mapping each original node id to its (latitude, longitude)."""
+        return _NodeView(self)
+
+    @property
+    def edge_dictionary(self) -> Mapping:
+        """Read-only view mapping each original edge id to a PrimalGraph.Edge."""
+        return _EdgeView(self)
+
+    def to_primal(self) -> PrimalGraph:
+        """
+        This method converts the CompactPrimalGraph back into a dictionary-based PrimalGraph.
+        :return: PrimalGraph
+        """
+
+        node_ids = self.node_ids.tolist()
+        edge_ids = self.edge_ids.tolist()
+
+        primal_graph = PrimalGraph()
+        primal_graph.set_nodes(dict(zip(node_ids, map(tuple, self.coordinates.tolist()))))
+        # the edges are built column by column, instead of one at a time
+        edges = map(
+            PrimalGraph.Edge,
+            edge_ids,
+            map(node_ids.__getitem__, self.sources.tolist()),
+            map(node_ids.__getitem__, self.targets.tolist()),
+            self.lengths.tolist(),
+            map(self.name_table.__getitem__, self.names.tolist()),
+            map(self.label_table.__getitem__, self.labels.tolist()),
+        )
+        primal_graph.set_edges(dict(zip(edge_ids, edges)))
+
+        return primal_graph.build_graph()
+
+    def nbytes(self) -> int:
+        """
+        This method returns the number of bytes held by the arrays of the graph.
+        :return: int
+        """
+
+        return sum(
+            array.nbytes
+            for array in (
+                self.node_ids,
+                self.coordinates,
+                self.edge_ids,
+                self.sources,
+                self.targets,
+                self.lengths,
+                self.names,
+                self.labels,
+                self.offsets,
+                self.neighbors,
+                self.edges,
+            )
+        )
+
+    def __node_order(self) -> np.ndarray:
+        if self.__node_sorter is None:
+            self.__node_sorter = np.argsort(self.node_ids, kind="stable")
+        return self.__node_sorter
+
+
+class _NodeView(Mapping):
+    """Read-only mapping from original node ids to coordinates of a CompactPrimalGraph."""
+
+    def __init__(self, graph: CompactPrimalGraph):
+        self._graph = graph
+
+    def __getitem__(self, nid):
+        return tuple(self._graph.coordinates[self._graph.node_index(nid)].tolist())
+
+    def __iter__(self):
+        return iter(self._graph.node_ids.tolist())
+
+    def __len__(self):
+        return len(self._graph.node_ids)
+
+
+class _EdgeView(Mapping):
+    """Read-only mapping from original edge ids to PrimalGraph.Edge objects of a CompactPrimalGraph."""
+
+    def __init__(self, graph: CompactPrimalGraph):
+        self._graph = graph
+
+    def __getitem__(self, eid):
+        return self._graph.edge(self._graph.edge_index(eid))
+
+    def __iter__(self):
+        return iter(self._graph.edge_ids.tolist())
+
+    def __len__(self):
+        return len(self._graph.edge_ids)
+
+
+def to_compact(primal_graph: PrimalGraph, dtype=np.float64) -> CompactPrimalGraph:
+    """
+    This method converts a dictionary-based PrimalGraph into a CompactPrimalGraph.
+    :param primal_graph: a street network mapped to a PrimalGraph object
+    :param dtype: floating-point type of the coordinates (numpy.float64 or numpy.float32)
+    :return: CompactPrimalGraph
+    """
+
+    edges = primal_graph.edge_dictionary.values()
+
+    compact_graph = CompactPrimalGraph()
+    compact_graph.set_nodes(
+        list(primal_graph.node_dictionary),
+        list(primal_graph.node_dictionary.values()),
+        dtype=dtype,
+    )
+    compact_graph.set_edges(
+        list(primal_graph.edge_dictionary),
+        [edge.source for edge in edges],
+        [edge.target for edge in edges],
+        [edge.length for edge in edges],
+        [edge.name for edge in edges],
+        [edge.label for edge in edges],
+    )
+
+    return compact_graph.build_graph()
+
+
+def __table__(values: list) -> np.ndarray:
+    """
+    This method stores a table of unique values (integers or strings) as an array.
+    :return: numpy array
+    """
+
+    table = np.asarray(values) if values else np.zeros(0, dtype=np.int64)
+    if table.dtype.kind not in "iuU":
+        raise TypeError(
+            f"Only integer and string values can be stored in arrays, got {table.dtype}"
+        )
+
+    return table
+
+
+class CompactDualGraph:
+    """
+    This class gathers the same information as a DualGraph, but keeps it in flat arrays instead of Python objects, so
+    it can be saved to and memory-mapped from a binary file (see file.write_binary and file.read_binary).
+    Dual nodes are stored at dense indices, and their lists of names, primal nodes and primal edges are stored as
+    pairs of offset and value arrays. Primal node ids, primal edge ids, names and labels are stored once, in tables
+    of unique values, and DualGraph.Node objects are only materialized when accessed.
+    """
+
+    def __init__(self):
+        self.dids = np.zeros(0, dtype=np.int64)  # [array] original id of each dual node;
+        self.sources = np.zeros(0, dtype=np.int32)  # [array] code of each source node;
+        self.targets = np.zeros(0, dtype=np.int32)  # [array] code of each target node;
+        self.src_edges = np.zeros(0, dtype=np.int32)  # [array] code of each first edge;
+        self.tgt_edges = np.zeros(0, dtype=np.int32)  # [array] code of each last edge;
+        self.lengths = np.zeros(0, dtype=np.float64)  # [array] cumulative length of each dual node;
+        self.labels = np.zeros(0, dtype=np.int32)  # [array] code of the label of each dual node;
+        self.name_offsets = np.zeros(1, dtype=np.int64)  # [array] names of node i, [i]:[i + 1];
+        self.names = np.zeros(0, dtype=np.int32)  # [array] code of each street name;
+        self.node_offsets = np.zeros(1, dtype=np.int64)  # [array] nodes of node i, [i]:[i + 1];
+        self.nodes = np.zeros(0, dtype=np.int32)  # [array] code of each primal node;
+        self.edge_offsets = np.zeros(1, dtype=np.int64)  # [array] edges of node i, [i]:[i + 1];
+        self.edges = np.zeros((0, 2), dtype=np.int32)  # [array] node codes of each edge;
+        self.link_ids = np.zeros(0, dtype=np.int64)  # [array] original id of each dual edge;
+        self.links = np.zeros((0, 2), dtype=np.int32)  # [array] dense nodes of each dual edge;
+        self.offsets = np.zeros(1, dtype=np.int64)  # [array] slots of node i, offsets[i]:[i + 1];
+        self.neighbors = np.zeros(0, dtype=np.int32)  # [array] node reached through each slot;
+        self.slot_links = np.zeros(0, dtype=np.int32)  # [array] dual edge stored in each slot;
+        self.node_table = np.zeros(0, dtype=np.int64)  # [array] original id of each node code;
+        self.edge_table = np.zeros(0, dtype=np.int64)  # [array] original id of each edge code;
+        self.name_table = np.zeros(0, dtype=str)  # [array] street name of each name code; and,
+        self.label_table = np.zeros(0, dtype=str)  # [array] street label of each label code.
+        self.node_attributes = {}  # extra attributes of the dual nodes, by name, as arrays aligned with dids
+        self.index = None  # index of the streets by node, edge and location (see street_index)
+        self.__node_sorter = None
+        self.__link_sorter = None
+
+    def build_graph(self):
+        """
+        This method creates the CSR adjacency list of the CompactDualGraph using the arrays of dual edges.
+        Each dual node lists its neighbors in the order of the dual edges, exactly as in DualGraph.build_graph.
+        :return: CompactDualGraph
+        """
+
+        n, k = len(self.dids), len(self.links)
+        dtype = __index_dtype__(max(n, k))
+
+        # every dual edge is seen from both of its nodes, the outgoing link first and the incoming link next
+        owners = self.links.astype(np.int64).ravel()
+        others = self.links[:, ::-1].astype(np.int64).ravel()
+        order = np.argsort(owners, kind="stable")
+        self.neighbors = others[order].astype(dtype)
+        self.slot_links = (order // 2).astype(dtype)
+        degrees = np.bincount(owners, minlength=n)
+        self.offsets = np.concatenate(([0], np.cumsum(degrees))).astype(np.int64)
+
+        return self
+
+    def node(self, index: int) -> DualGraph.Node:
+        """
+        This method materializes the dual node at a dense index as a DualGraph.Node.
+        :param index: dense index of the dual node
+        :return: DualGraph.Node
+        """
+
+        names = self.names[self.name_offsets[index] : self.name_offsets[index + 1]]
+        nodes = self.nodes[self.node_offsets[index] : self.node_offsets[index + 1]]
+        edges = self.edges[self.edge_offsets[index] : self.edge_offsets[index + 1]]
+
+        return __dual_node__(
+            self.dids[index].item(),
+            self.edge_table[self.src_edges[index]].item(),
+            self.edge_table[self.tgt_edges[index]].item(),
+            self.node_table[self.sources[index]].item(),
+            self.node_table[self.targets[index]].item(),
+            float(self.lengths[index]),
+            self.label_table[self.labels[index]].item(),
+            self.name_table[names].tolist(),
+            self.node_table[nodes].tolist(),
+            list(map(tuple, self.node_table[edges].tolist())),
+        )
+
+    def node_index(self, did) -> int:
+        """
+        This method returns the dense index of an original dual node id.
+        :return: int
+        """
+
+        if self.__node_sorter is None:
+            self.__node_sorter = __sorter__(self.dids)
+        return int(__lookup__(self.dids, self.__node_sorter, [did])[0])
+
+    def link_index(self, eid) -> int:
+        """
+        This method returns the dense index of an original dual edge id.
+        :return: int
+        """
+
+        if self.__link_sorter is None:
+            self.__link_sorter = __sorter__(self.link_ids)
+        return int(__lookup__(self.link_ids, self.__link_sorter, [eid])[0])
+
+    @property
+    def node_dictionary(self) -> Mapping:
+        """Read-only view mapping each original dual node id to a DualGraph.Node."""
+        return _DualNodeView(self)
+
+    @property
+    def edge_dictionary(self) -> Mapping:
+        """Read-only view mapping each original dual edge id to the pair of dual node ids it links."""
+        return _DualEdgeView(self)
+
+    @property
+    def graph(self) -> Mapping:
+        """Read-only view mapping each original dual node id to its adjacency, as in DualGraph.graph."""
+        return _DualAdjacencyView(self)
+
+    def street_index(self, primal_graph=None):
+        """
+        This method returns the index of the streets by primal node, primal edge and location (see StreetIndex),
+        built on the first call from the arrays of the graph and the given primal graph, which is required for
+        lookups by primal edge id and location.
+        :param primal_graph: the PrimalGraph or CompactPrimalGraph the dual graph was mapped from
+        :return: StreetIndex
+        """
+
+        if self.index is None or (primal_graph is not None and self.index.coordinates is None):
+            from street_continuity.index import street_index
+
+            self.index = street_index(self, primal_graph)
+        return self.index
+
+    def to_dual(self) -> DualGraph:
+        """
+        This method converts the CompactDualGraph back into a dictionary-based DualGraph.
+        :return: DualGraph
+        """
+
+        dids = self.dids.tolist()
+        node_table = self.node_table.tolist()
+        edge_table = self.edge_table.tolist()
+        name_table = self.name_table.tolist()
+        label_table = self.label_table.tolist()
+
+        # the lists of every dual node are decoded at once, and then sliced node by node
+        names = list(map(name_table.__getitem__, self.names.tolist()))
+        nodes = list(map(node_table.__getitem__, self.nodes.tolist()))
+        edges = [(node_table[u], node_table[v]) for u, v in self.edges.tolist()]
+        name_offsets = self.name_offsets.tolist()
+        node_offsets = self.node_offsets.tolist()
+        edge_offsets = self.edge_offsets.tolist()
+
+        dual_graph = DualGraph()
+        dual_graph.set_nodes(
+            {
+                did: __dual_node__(
+                    did,
+                    edge_table[src_edge],
+                    edge_table[tgt_edge],
+                    node_table[source],
+                    node_table[target],
+                    length,
+                    label_table[label],
+                    names[name_offsets[index] : name_offsets[index + 1]],
+                    nodes[node_offsets[index] : node_offsets[index + 1]],
+                    edges[edge_offsets[index] : edge_offsets[index + 1]],
+                )
+                for index, (did, src_edge, tgt_edge, source, target, length, label) in enumerate(
+                    zip(
+                        dids,
+                        self.src_edges.tolist(),
+                        self.tgt_edges.tolist(),
+                        self.sources.tolist(),
+                        self.targets.tolist(),
+                        self.lengths.tolist(),
+                        self.labels.tolist(),
+                    )
+                )
+            }
+        )
+        dual_graph.set_edges(
+            {
+                eid: (dids[source], dids[target])
+                for eid, (source, target) in zip(self.link_ids.tolist(), self.links.tolist())
+            }
+        )
+        dual_graph.node_attributes = {
+            name: dict(zip(dids, np.asarray(values).tolist()))
+            for name, values in self.node_attributes.items()
+        }
+
+        return dual_graph
+
+    def arrays(self) -> dict:
+        """
+        This method returns the arrays of the graph by name, in the order they are saved.
+        :return: dictionary of numpy arrays
+        """
+
+        return {name: getattr(self, name) for name in __dual_arrays__}
+
+    def nbytes(self) -> int:
+        """
+        This method returns the number of bytes held by the arrays of the graph.
+        :return: int
+        """
+
+        return sum(array.nbytes for array in self.arrays().values())
+
+
+# arrays of a CompactDualGraph, in the order they are saved by file.write_binary
+__dual_arrays__ = (
+    "dids",
+    "sources",
+    "targets",
+    "src_edges",
+    "tgt_edges",
+    "lengths",
+    "labels",
+    "name_offsets",
+    "names",
+    "node_offsets",
+    "nodes",
+    "edge_offsets",
+    "edges",
+    "link_ids",
+    "links",
+    "offsets",
+    "neighbors",
+    "slot_links",
+    "node_table",
+    "edge_table",
+    "name_table",
+    "label_table",
+)
+
+
+def __sorter__(ids: np.ndarray):
+    """
+    This method returns the permutation that sorts the given ids, or None when they are already sorted, as the
+    ids of dual nodes and dual edges usually are.
+    :return: numpy array or None
+    """
+
+    if len(ids) < 2 or bool(np.all(ids[1:] > ids[:-1])):
+        return None
+    return np.argsort(ids, kind="stable")
+
+
+def __dual_node__(did, src_edge, tgt_edge, source, target, length, label, names, nodes, edges):
+    """
+    This method assembles a DualGraph.Node from its attributes, as dual_mapper would have left it.
+    :return: DualGraph.Node
+    """
+
+    dual_node = DualGraph.Node(did, PrimalGraph.Edge(src_edge, source, target, length, None, label))
+    dual_node.tgt_edge = tgt_edge
+    dual_node.names = names
+    dual_node.nodes = nodes
+    dual_node.edges = edges
+
+    return dual_node
+
+
+class _DualNodeView(Mapping):
+    """Read-only mapping from original dual node ids to DualGraph.Node objects of a CompactDualGraph."""
+
+    def __init__(self, graph: CompactDualGraph):
+        self._graph = graph
+
+    def __getitem__(self, did):
+        return self._graph.node(self._graph.node_index(did))
+
+    def __iter__(self):
+        return iter(self._graph.dids.tolist())
+
+    def __len__(self):
+        return len(self._graph.dids)
+
+
+class _DualEdgeView(Mapping):
+    """Read-only mapping from original dual edge ids to pairs of dual node ids of a CompactDualGraph."""
+
+    def __init__(self, graph: CompactDualGraph):
+        self._graph = graph
+
+    def __getitem__(self, eid):
+        source, target = self._graph.links[self._graph.link_index(eid)].tolist()
+        return self._graph.dids[source].item(), self._graph.dids[target].item()
+
+    def __iter__(self):
+        return iter(self._graph.link_ids.tolist())
+
+    def __len__(self):
+        return len(self._graph.link_ids)
+
+
+class _DualAdjacencyView(Mapping):
+    """Read-only mapping from original dual node ids to their neighbors and dual edges of a CompactDualGraph."""
+
+    def __init__(self, graph: CompactDualGraph):
+        self._graph = graph
+
+    def __getitem__(self, did):
+        graph = self._graph
+        index = graph.node_index(did)
+        slots = slice(graph.offsets[index], graph.offsets[index + 1])
+        if slots.start == slots.stop:
+            raise KeyError(did)
+        neighbors = graph.dids[graph.neighbors[slots]].tolist()
+        return dict(zip(neighbors, graph.link_ids[graph.slot_links[slots]].tolist()))
+
+    def __iter__(self):
+        degrees = np.diff(self._graph.offsets)
+        return iter(self._graph.dids[degrees > 0].tolist())
+
+    def __len__(self):
+        return int(np.count_nonzero(np.diff(self._graph.offsets)))
+
+
+def to_compact_dual(dual_graph: DualGraph) -> CompactDualGraph:
+    """
+    This method converts a dictionary-based DualGraph into a CompactDualGraph.
+    :param dual_graph: a DualGraph mapped from a PrimalGraph
+    :return: CompactDualGraph
+    """
+
+    dual_nodes = list(dual_graph.node_dictionary.values())
+    n = len(dual_nodes)
+
+    # primal nodes and primal edges are encoded through tables shared by all dual nodes
+    primal_nodes, primal_edges, names = {}, {}, {}
+
+    def encode(values, table):
+        return np.fromiter((table.setdefault(value, len(table)) for value in values), np.int64)
+
+    def offsets(sizes):
+        return np.concatenate(([0], np.cumsum(np.fromiter(sizes, np.int64, n)))).astype(np.int64)
+
+    compact_graph = CompactDualGraph()
+    compact_graph.dids = np.fromiter(dual_graph.node_dictionary, np.int64, n)
+    sources = encode((node.source for node in dual_nodes), primal_nodes)
+    targets = encode((node.target for node in dual_nodes), primal_nodes)
+    node_lists = [node.nodes for node in dual_nodes]
+    edge_lists = [node.edges for node in dual_nodes]
+    name_lists = [node.names for node in dual_nodes]
+    nodes = encode(chain.from_iterable(node_lists), primal_nodes)
+    edges = encode(chain.from_iterable(chain.from_iterable(edge_lists)), primal_nodes)
+    src_edges = encode((node.src_edge for node in dual_nodes), primal_edges)
+    tgt_edges = encode((node.tgt_edge for node in dual_nodes), primal_edges)
+    compact_graph.lengths = np.fromiter((node.length for node in dual_nodes), np.float64, n)
+    compact_graph.labels, labels = __factorize__(node.label for node in dual_nodes)
+    compact_graph.names = encode(chain.from_iterable(name_lists), names)
+    compact_graph.name_offsets = offsets(map(len, name_lists))
+    compact_graph.node_offsets = offsets(map(len, node_lists))
+    compact_graph.edge_offsets = offsets(map(len, edge_lists))
+
+    # narrowing the codes of primal nodes and primal edges to the size of their tables
+    node_dtype = __index_dtype__(len(primal_nodes))
+    compact_graph.sources = sources.astype(node_dtype)
+    compact_graph.targets = targets.astype(node_dtype)
+    compact_graph.nodes = nodes.astype(node_dtype)
+    compact_graph.edges = edges.astype(node_dtype).reshape(-1, 2)
+    edge_dtype = __index_dtype__(len(primal_edges))
+    compact_graph.src_edges = src_edges.astype(edge_dtype)
+    compact_graph.tgt_edges = tgt_edges.astype(edge_dtype)
+    compact_graph.names = compact_graph.names.astype(__index_dtype__(len(names)))
+
+    compact_graph.node_table = __table__(list(primal_nodes))
+    compact_graph.edge_table = __table__(list(primal_edges))
+    compact_graph.name_table = __table__(list(names))
+    compact_graph.label_table = __table__(labels)
+
+    # dual edges link dense indices of dual nodes
+    index = {did: position for position, did in enumerate(compact_graph.dids.tolist())}
+    links = dual_graph.edge_dictionary
+    compact_graph.link_ids = np.fromiter(links, np.int64, len(links))
+    endpoints = map(index.__getitem__, chain.from_iterable(links.values()))
+    compact_graph.links = np.fromiter(endpoints, __index_dtype__(n)).reshape(-1, 2)
+
+    # node attributes become arrays aligned with the dual nodes, missing values being NaN
+    compact_graph.node_attributes = {
+        name: np.array([values.get(did, np.nan) for did in dual_graph.node_dictionary])
+        for name, values in dual_graph.node_attributes.items()
+    }
+
+    return compact_graph.build_graph()
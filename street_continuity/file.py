@@ -6,38 +6,64 @@
 # Verified on February 1th, 2019.
 
 
+import bz2
 import csv
+import gc
+import gzip
+import json
+import lzma
+from array import array
+from contextlib import contextmanager
+from itertools import compress, islice, repeat
 from pathlib import Path
+from typing import TYPE_CHECKING
+from xml.etree.ElementTree import iterparse
 
-import networkx as nx
-import osmnx as ox  # Required for read_graphml function
+import numpy as np
 
+from street_continuity.compact import (
+    CompactDualGraph,
+    CompactPrimalGraph,
+    __dual_arrays__,
+    to_compact_dual,
+)
 from street_continuity.graph import DualGraph, PrimalGraph
-from street_continuity.util import compute_distance
+from street_continuity.stats import timed
+from street_continuity.util import compute_distances, great_circle
 
+if TYPE_CHECKING:
+    # NetworkX and OSMnx are imported by the functions that use them, so reading CSV files does not load them
+    import networkx as nx
 
+# signature of the binary DualGraph format, followed by the size (in bytes) of its JSON header
+__binary_magic__ = b"SCDUAL\x00\x01"
+# arrays of the binary DualGraph format start at multiples of this many bytes
+__binary_alignment__ = 64
+
+
+@timed("read_csv")
 def read_csv(
     nodes_filename: str,
     edges_filename: str,
     directory: str,
     use_label: bool,
     has_header: bool = False,
+    compact: bool = False,
 ):
     """
     Method for creating a primal graph through two CSV files, one describing the nodes and another the edges.
     Nodes should be organized as {index, latitude, longitude} and edges as {index, source, target, length, name, label}.
+    Files ending in .gz, .bz2 or .xz are decompressed while they are read, and rows are parsed in chunks.
     :param nodes_filename: nodes filename
     :param edges_filename: edges filename
     :param directory: full path of the files directory
     :param use_label: if true, it maps streets' type as labels (required for the HICN algorithm)
                       otherwise, streets' type is standardized as "unclassified" (required for the ICN algorithm)
     :param has_header: if true, it skips the first line when reading the files
-    :return: PrimalGraph
+    :param compact: if true, it returns a CompactPrimalGraph instead of a PrimalGraph
+    :return: PrimalGraph or CompactPrimalGraph
     """
 
-    # creating an empty primal graph
-    primal_graph = PrimalGraph()
-
     # Validate file paths exist before opening
     nodes_path = Path(directory) / nodes_filename
     edges_path = Path(directory) / edges_filename
@@ -46,35 +72,58 @@ def read_csv(
     if not edges_path.exists():
         raise FileNotFoundError(f"Edges file not found: {edges_path}")
 
+    # millions of acyclic objects are allocated at once, so the garbage collector is paused
+    with __paused_gc__():
+        if compact:
+            return __read_compact_csv__(nodes_path, edges_path, use_label, has_header)
+        return __read_primal_csv__(nodes_path, edges_path, use_label, has_header)
+
+
+def __read_primal_csv__(nodes_path: Path, edges_path: Path, use_label: bool, has_header: bool):
+    """
+    This method reads the CSV files of read_csv into a PrimalGraph, a chunk of rows at a time.
+    :return: PrimalGraph
+    """
+
+    # creating an empty primal graph
+    primal_graph = PrimalGraph()
+
     node_dictionary = {}
-    with open(nodes_path) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=",", quotechar='"')
-        for nid, latitude, longitude in csv_reader:
-            if not has_header:
-                node_dictionary[nid] = [float(latitude), float(longitude)]
-            has_header = False
+    for nids, latitudes, longitudes in __read_columns__(nodes_path, 3, has_header):
+        coordinates = zip(map(float, latitudes), map(float, longitudes))
+        node_dictionary.update(zip(nids, map(list, coordinates)))
 
     # updating the dictionary of nodes
     primal_graph.node_dictionary = node_dictionary
 
-    edge_dictionary = {}
-    with open(edges_path) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=",", quotechar='"')
+    # the coordinates of every node, so that the endpoints of a whole chunk of edges are looked up at once
+    node_index = {nid: index for index, nid in enumerate(node_dictionary)}
+    coordinates = np.array(list(node_dictionary.values()), dtype=np.float64).reshape(-1, 2)
 
-        for eid, source, target, length, name, label in csv_reader:
-            if not has_header:
-                if (
-                    compute_distance(node_dictionary[source], node_dictionary[target]) > 0.0
-                ):  # sanity check: self-loops are not allowed
-                    edge_dictionary[eid] = primal_graph.Edge(
-                        eid,
-                        source,
-                        target,
-                        float(length),
-                        name,
-                        label if use_label else "unclassified",
-                    )
-            has_header = False
+    edge_dictionary = {}
+    # [INFO] as in previous versions, only the header of the nodes file is skipped
+    for eids, sources, targets, lengths, names, labels in __read_columns__(edges_path, 6, False):
+        # sanity check: self-loops are not allowed
+        source_index = np.fromiter(map(node_index.__getitem__, sources), np.int64, len(eids))
+        target_index = np.fromiter(map(node_index.__getitem__, targets), np.int64, len(eids))
+        distances = compute_distances(coordinates[source_index], coordinates[target_index])
+        keep = (distances > 0.0).tolist()
+
+        kept_eids = list(compress(eids, keep))
+        edge_dictionary.update(
+            zip(
+                kept_eids,
+                map(
+                    primal_graph.Edge,
+                    kept_eids,
+                    compress(sources, keep),
+                    compress(targets, keep),
+                    map(float, compress(lengths, keep)),
+                    compress(names, keep),
+                    compress(labels, keep) if use_label else repeat("unclassified"),
+                ),
+            )
+        )
 
     # updating the dictionary of edges
     primal_graph.edge_dictionary = edge_dictionary
@@ -83,88 +132,509 @@ def read_csv(
     return primal_graph.build_graph()
 
 
-def read_graphml(graphml_file: str, use_label: bool):
+def __import_osmnx__():
+    """
+    This method imports OSMnx when it is first needed, so that the rest of the library neither requires it nor pays
+    for its import time (which includes GeoPandas and Shapely).
+    :return: osmnx module
+    """
+
+    try:
+        import osmnx
+    except ImportError as error:
+        raise ImportError(
+            "OSMnx is required to read GraphML files and download networks, "
+            "install it with: pip install 'StreetContinuity[osm]'"
+        ) from error
+
+    return osmnx
+
+
+@contextmanager
+def __paused_gc__():
+    """
+    This method pauses the cyclic garbage collector, which would otherwise run a collection every few thousand
+    allocations while a large file is loaded, even though none of the allocated objects can form a cycle.
+    :return: None
+    """
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def __open_text__(path: Path, mode: str = "r", encoding: str | None = None):
+    """
+    This method opens a text file, (de)compressing it on the fly when it ends with .gz, .bz2 or .xz.
+    :return: file object
+    """
+
+    opener = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}.get(path.suffix.lower())
+    if opener is None:
+        return open(path, mode, encoding=encoding)
+    if opener is gzip.open and mode == "w":
+        # the default level of zlib, about four times faster than the default of gzip for a slightly larger file
+        return gzip.open(path, "wt", encoding=encoding, compresslevel=6)
+    return opener(path, mode + "t", encoding=encoding)
+
+
+def __read_columns__(path: Path, width: int, has_header: bool, chunk_size: int = 100_000):
+    """
+    This method streams a CSV file in chunks of rows, each one transposed into columns.
+    :param path: path of a plain or compressed CSV file
+    :param width: number of fields of every row
+    :param has_header: if true, it skips the first line of the file
+    :param chunk_size: maximum number of rows of each chunk
+    :return: generator of tuples with one tuple of strings per column
+    """
+
+    with __open_text__(path) as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=",", quotechar='"')
+        if has_header:
+            next(csv_reader, None)
+        while rows := list(islice(csv_reader, chunk_size)):
+            if any(len(row) != width for row in rows):
+                row = next(row for row in rows if len(row) != width)
+                raise ValueError(f"Expected {width} fields in {path.name}, got {len(row)}: {row}")
+            yield tuple(zip(*rows))
+
+
+def __read_compact_csv__(nodes_path: Path, edges_path: Path, use_label: bool, has_header: bool):
+    """
+    This method reads the same CSV files as read_csv into the columns of a CompactPrimalGraph.
+    :return: CompactPrimalGraph
+    """
+
+    node_ids, latitudes, longitudes = [], [], []
+    for columns in __read_columns__(nodes_path, 3, has_header):
+        for column, values in zip((node_ids, latitudes, longitudes), columns):
+            column.extend(values)
+
+    # a repeated node id keeps its last coordinates, as in a dictionary
+    last = dict(zip(node_ids, range(len(node_ids))))
+    coordinates = np.stack(
+        (
+            np.fromiter(map(float, latitudes), np.float64, len(latitudes)),
+            np.fromiter(map(float, longitudes), np.float64, len(longitudes)),
+        ),
+        axis=1,
+    )
+
+    compact_graph = CompactPrimalGraph()
+    compact_graph.set_nodes(list(last), coordinates[list(last.values())])
+
+    columns = ([], [], [], [], [], [])
+    for chunk in __read_columns__(edges_path, 6, False):
+        for column, values in zip(columns, chunk):
+            column.extend(values)
+    edge_ids, sources, targets, lengths, names, labels = (np.asarray(c) for c in columns)
+    # sanity check: self-loops are not allowed
+    source_index = compact_graph.node_indices(sources)
+    target_index = compact_graph.node_indices(targets)
+    keep = (
+        compute_distances(
+            compact_graph.coordinates[source_index], compact_graph.coordinates[target_index]
+        )
+        > 0.0
+    )
+
+    # a repeated edge id keeps its last occurrence at the position of its first one, as in a dictionary
+    kept = dict(zip(edge_ids[keep].tolist(), np.flatnonzero(keep).tolist()))
+    first = dict(zip(reversed(edge_ids[keep].tolist()), reversed(np.flatnonzero(keep).tolist())))
+    rows = np.asarray([kept[eid] for eid in sorted(kept, key=first.__getitem__)], dtype=np.int64)
+
+    compact_graph.set_edges(
+        edge_ids[rows],
+        sources[rows],
+        targets[rows],
+        lengths[rows].astype(float),
+        names[rows].tolist(),
+        labels[rows].tolist() if use_label else ["unclassified"] * len(rows),
+    )
+
+    return compact_graph.build_graph()
+
+
+@timed("read_graphml")
+def read_graphml(graphml_file: str, use_label: bool, compact: bool = False):
     """
     This method loads a GraphML file into an OSMnx MultiDiGraph and uses method "from_osmnx" to create a PrimalGraph.
     :param graphml_file: a graph that was saved using the save_graphml() osmnx function
     :param use_label: if true, it maps streets' type as labels (required for the HICN algorithm)
                       otherwise, streets' type is standardized as "unclassified" (required for the ICN algorithm)
-    :return: PrimalGraph
+    :param compact: if true, it returns a CompactPrimalGraph instead of a PrimalGraph
+    :return: PrimalGraph or CompactPrimalGraph
     """
 
     # the full path should be informed through "graphml_file" parameter
+    ox = __import_osmnx__()
     oxg = ox.load_graphml(graphml_file)
 
-    return from_osmnx(oxg, use_label)
+    return from_osmnx(oxg, use_label, compact)
 
 
-def from_osmnx(oxg: nx.MultiDiGraph, use_label: bool):
+@timed("from_osmnx")
+def from_osmnx(oxg: "nx.MultiDiGraph", use_label: bool, compact: bool = False):
     """
     The method transforms an OSMnx MultiDiGraph into a PrimalGraph object
     :param oxg: an OSMnx MultiDiGraph
     :param use_label: if true, it maps streets' type as labels (required for the HICN algorithm)
                       otherwise, streets' type is standardized as "unclassified" (required for the ICN algorithm)
-    :return: PrimalGraph
+    :param compact: if true, it returns a CompactPrimalGraph instead of a PrimalGraph
+    :return: PrimalGraph or CompactPrimalGraph
     """
 
-    # creating an empty primal graph
-    primal_graph = PrimalGraph()
-
-    # converting a MultiDiGraph into a simple Graph
-    oxg = nx.Graph(oxg)
+    if not oxg.is_multigraph():
+        import networkx as nx
 
-    # removing self-loops from the resulting graph
-    oxg.remove_edges_from(nx.selfloop_edges(oxg))
+        # simple graphs merge the attributes of both directions, so they are still converted as before
+        oxg = nx.Graph(oxg)
 
     # latitude (y-axis) and longitude (x-axis)
     node_dictionary = {nid: (data["y"], data["x"]) for nid, data in oxg.nodes(data=True)}
-
-    # updating the dictionary of nodes
+    position = {nid: index for index, nid in enumerate(node_dictionary)}
+
+    # the edges are read straight from the adjacency of the MultiDiGraph, as nx.Graph(oxg) would have kept them
+    sources, targets, names, labels, lengths, first = __read_osmnx_edges__(oxg, position)
+
+    # the edges are listed from the first to the last node, in the order each one was met from its first endpoint
+    order = np.argsort(np.asarray(first, dtype=np.int64), kind="stable").tolist()
+    sources = list(map(sources.__getitem__, order))
+    targets = list(map(targets.__getitem__, order))
+    names = list(map(names.__getitem__, order))
+    labels = list(map(labels.__getitem__, order)) if use_label else ["unclassified"] * len(order)
+    lengths = list(map(lengths.__getitem__, order))
+
+    # prefer the network length OSMnx provides, which follows the street geometry;
+    # fall back to the straight-line distance between the segment endpoints
+    missing = [index for index, length in enumerate(lengths) if length is None]
+    if missing:
+        coordinates = np.array(list(node_dictionary.values()), dtype=np.float64).reshape(-1, 2)
+        ends = np.array([[position[sources[i]], position[targets[i]]] for i in missing])
+        distances = compute_distances(coordinates[ends[:, 0]], coordinates[ends[:, 1]])
+        for index, distance in zip(missing, distances.tolist()):
+            lengths[index] = distance
+    lengths = list(map(float, lengths))
+
+    eids = range(len(sources))
+    if compact:
+        compact_graph = CompactPrimalGraph()
+        compact_graph.set_nodes(list(node_dictionary), list(node_dictionary.values()))
+        compact_graph.set_edges(list(eids), sources, targets, lengths, names, labels)
+        return compact_graph.build_graph()
+
+    # creating the PrimalGraph, with edges built column by column instead of one at a time
+    primal_graph = PrimalGraph()
     primal_graph.node_dictionary = node_dictionary
+    edges = map(PrimalGraph.Edge, eids, sources, targets, lengths, names, labels)
+    primal_graph.edge_dictionary = dict(zip(eids, edges))
 
-    eid = 0
-    edge_dictionary = {}
-    for source, target, data in oxg.edges(data=True):
-        name = data.get("name", "unknown")  # unknown is the default value for streets' name
-        label = data.get(
-            "highway", "unclassified"
-        )  # unclassified is the default value for streets' type
-
-        # OSMnx can return a list for name/highway when simplification merges ways;
-        # keep the first value so the street retains a usable name and road class
-        if isinstance(name, list):
-            name = name[0] if name else "unknown"
-        if isinstance(label, list):
-            label = label[0] if label else "unclassified"
-
-        # prefer the network length OSMnx provides, which follows the street geometry;
-        # fall back to the straight-line distance between the segment endpoints
-        length = data.get("length")
-        if length is None:
-            length = compute_distance(node_dictionary[source], node_dictionary[target])
-
-        # creating a new PrimalEdge with information from the current edge
-        edge = primal_graph.Edge(
-            eid, source, target, float(length), name, label if use_label else "unclassified"
+    # building and returning the resulting PrimalGraph
+    return primal_graph.build_graph()
+
+
+def __read_osmnx_edges__(oxg: "nx.MultiDiGraph", position: dict) -> tuple:
+    """
+    This method reads the edges of an OSMnx graph as nx.Graph(oxg) would keep them, without building that copy. A
+    pair of nodes is read from the successors of whichever node comes first among the nodes linked in that direction,
+    the attributes of its parallel edges are merged in order (the last value of each attribute wins), the opposite
+    direction is dropped and so are self-loops.
+    :param oxg: an OSMnx MultiDiGraph (or an undirected simple Graph)
+    :param position: dictionary mapping each node id to its position among the nodes of the graph
+    :return: tuple with the lists of sources, targets, names, labels and lengths (None when missing) of the edges,
+             and the position of the first endpoint of each edge; edges are listed in the order they were read
+    """
+
+    multigraph = oxg.is_multigraph()
+    adjacency = oxg.adj
+
+    sources, targets, names, labels, lengths, first = [], [], [], [], [], []
+    for u, neighbors in adjacency.items():
+        u_position = position[u]
+        for v, keys in neighbors.items():
+            v_position = position[v]
+            if v_position > u_position:
+                sources.append(u)
+                targets.append(v)
+                first.append(u_position)
+            elif v_position < u_position and u not in adjacency[v]:
+                sources.append(v)
+                targets.append(u)
+                first.append(v_position)
+            else:
+                # self-loops, and pairs that were read from the other endpoint
+                continue
+
+            # unknown is the default value for streets' name and unclassified for streets' type
+            name, label, length = "unknown", "unclassified", None
+            for data in keys.values() if multigraph else (keys,):
+                name = data.get("name", name)
+                label = data.get("highway", label)
+                length = data.get("length", length)
+
+            # OSMnx can return a list for name/highway when simplification merges ways;
+            # keep the first value so the street retains a usable name and road class
+            if isinstance(name, list):
+                name = name[0] if name else "unknown"
+            if isinstance(label, list):
+                label = label[0] if label else "unclassified"
+
+            names.append(name)
+            labels.append(label)
+            lengths.append(length)
+
+    return sources, targets, names, labels, lengths, first
+
+
+@timed("read_osm")
+def read_osm(osm_file: str, use_label: bool, compact: bool = False, highways=None):
+    """
+    This method streams an OpenStreetMap XML file (.osm, optionally compressed as .gz, .bz2 or .xz) into a PrimalGraph,
+    without OSMnx. The file is parsed twice with an incremental parser, first for the ways tagged as highways and
+    next for the coordinates of the nodes they use, so memory grows with the street network rather than with the file.
+    Ways are split at every node shared with another way (or visited twice by the same way), and each segment becomes
+    an edge whose length (in meters) is the great-circle length along all of its nodes, rounded to two decimals.
+    Nodes are expected ahead of ways, as in files from the OSM API, Geofabrik or osmium; segments through nodes that
+    are missing from the file are dropped, as are closed segments (self-loops) and repeated pairs of nodes.
+    :param osm_file: path of the OpenStreetMap XML file
+    :param use_label: if true, it maps streets' type as labels (required for the HICN algorithm)
+                      otherwise, streets' type is standardized as "unclassified" (required for the ICN algorithm)
+    :param compact: if true, it returns a CompactPrimalGraph instead of a PrimalGraph
+    :param highways: if informed, only ways whose highway tag is among these values are read (e.g., {"primary"})
+    :return: PrimalGraph or CompactPrimalGraph
+    """
+
+    osm_path = Path(osm_file)
+    if not osm_path.exists():
+        raise FileNotFoundError(f"OSM file not found: {osm_path}")
+    highways = None if highways is None else set(highways)
+
+    with __paused_gc__():
+        # first pass: the nodes of every highway, with the name and type of the way they belong to
+        refs, way_starts, way_names, way_labels, names, labels = __read_osm_ways__(
+            osm_path, highways
         )
+        needed = np.unique(refs)
+
+        # second pass: the coordinates of the nodes used by the highways
+        node_ids, coordinates = __read_osm_nodes__(osm_path, needed)
+
+    # dense index of the node at each position of the ways (or -1 when the node is missing from the file)
+    position = np.minimum(np.searchsorted(node_ids, refs), max(len(node_ids) - 1, 0))
+    present = node_ids[position] == refs if len(node_ids) else np.zeros(len(refs), dtype=bool)
+    position[~present] = -1
+
+    # hops link consecutive nodes of the same way, and are usable when both nodes are known
+    way_start = np.zeros(len(refs), dtype=bool)
+    way_start[way_starts] = True
+    hop_valid = present[:-1] & present[1:] & ~way_start[1:]
+
+    # ways break at their ends, at shared nodes and around unusable hops
+    _, inverse, counts = np.unique(refs, return_inverse=True, return_counts=True)
+    breaks = way_start | (counts[inverse] > 1)
+    breaks[way_starts - 1] = True  # the last node of every way, as ways are laid end to end
+    breaks[-1:] = True
+    breaks[:-1] |= ~hop_valid
+    breaks[1:] |= ~hop_valid
+    breaks = np.flatnonzero(breaks)
+
+    # each pair of consecutive breaks delimits a segment, kept when its first hop is usable
+    starts, ends = breaks[:-1], breaks[1:]
+    kept = hop_valid[starts]
+    starts, ends = starts[kept], ends[kept]
+
+    # segment lengths are sums of the great-circle distances of their hops, computed at once
+    hop_lengths = np.zeros(max(len(refs) - 1, 0), dtype=np.float64)
+    hops = np.flatnonzero(hop_valid)
+    hop_lengths[hops] = great_circle(
+        coordinates[position[hops], 0],
+        coordinates[position[hops], 1],
+        coordinates[position[hops + 1], 0],
+        coordinates[position[hops + 1], 1],
+    )
+    lengths = np.round(np.add.reduceat(hop_lengths, starts), 2) if len(starts) else hop_lengths[:0]
+
+    # dropping self-loops and repeated pairs of nodes, keeping the first segment of each pair
+    sources, targets = refs[starts], refs[ends]
+    pairs = np.stack((np.minimum(sources, targets), np.maximum(sources, targets)), axis=1)
+    _, first = np.unique(pairs, axis=0, return_index=True)
+    first = np.sort(first)
+    first = first[sources[first] != targets[first]]
+    sources, targets, lengths, starts = (
+        sources[first],
+        targets[first],
+        lengths[first],
+        starts[first],
+    )
 
-        # storing the new edge in the edge dictionary
-        edge_dictionary[eid] = edge
-        eid += 1
+    # the way of each segment gives its name and type
+    ways = np.searchsorted(way_starts, starts, side="right") - 1
+    segment_names = [names[code] for code in way_names[ways].tolist()]
+    segment_labels = (
+        [labels[code] for code in way_labels[ways].tolist()]
+        if use_label
+        else ["unclassified"] * len(ways)
+    )
 
-    # updating the dictionary of edges
-    primal_graph.edge_dictionary = edge_dictionary
+    # the graph holds the nodes at the ends of segments, in the order of their ids
+    endpoints = np.unique(np.concatenate((sources, targets)))
+    endpoint_coordinates = coordinates[np.searchsorted(node_ids, endpoints)]
+
+    eids = range(len(sources))
+    if compact:
+        compact_graph = CompactPrimalGraph()
+        compact_graph.set_nodes(endpoints, endpoint_coordinates)
+        compact_graph.set_edges(
+            np.arange(len(sources)), sources, targets, lengths, segment_names, segment_labels
+        )
+        return compact_graph.build_graph()
+
+    primal_graph = PrimalGraph()
+    primal_graph.node_dictionary = dict(
+        zip(endpoints.tolist(), map(tuple, endpoint_coordinates.tolist()))
+    )
+    edges = map(
+        PrimalGraph.Edge,
+        eids,
+        sources.tolist(),
+        targets.tolist(),
+        lengths.tolist(),
+        segment_names,
+        segment_labels,
+    )
+    primal_graph.edge_dictionary = dict(zip(eids, edges))
 
-    # building and returning the resulting PrimalGraph
     return primal_graph.build_graph()
 
 
+def __open_binary__(path: Path):
+    """
+    This method opens a file for reading bytes, decompressing it on the fly when it ends with .gz, .bz2 or .xz.
+    :return: file object
+    """
+
+    opener = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}.get(path.suffix.lower(), open)
+    return opener(path, "rb")
+
+
+def __iterate_osm__(path: Path):
+    """
+    This method yields the top-level elements of an OpenStreetMap XML file (nodes, ways and relations) one at a time,
+    discarding each one once the next is requested, so the parsed tree never grows.
+    :return: generator of Element objects
+    """
+
+    with __open_binary__(path) as stream:
+        context = iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        depth = 0
+        for event, element in context:
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 0:
+                yield element
+                root.clear()
+
+
+def __read_osm_ways__(path: Path, highways: set | None) -> tuple:
+    """
+    This method reads the ways tagged as highways of an OpenStreetMap XML file (areas excluded).
+    :return: tuple with the node ids of all ways laid end to end, the position where each way starts, the name and
+             type codes of each way, and the tables of names and types
+    """
+
+    refs, way_starts = array("q"), array("q")
+    way_names, way_labels = array("q"), array("q")
+    names, labels = {}, {}
+
+    for element in __iterate_osm__(path):
+        if element.tag != "way":
+            continue
+
+        tags = {child.get("k"): child.get("v") for child in element.iter("tag")}
+        highway = tags.get("highway")
+        if highway is None or tags.get("area") == "yes":
+            continue
+        if highways is not None and highway not in highways:
+            continue
+
+        nodes = [int(child.get("ref")) for child in element.iter("nd")]
+        if len(nodes) < 2:
+            continue
+
+        way_starts.append(len(refs))
+        refs.extend(nodes)
+        # unknown is the default value for streets' name
+        way_names.append(names.setdefault(tags.get("name", "unknown"), len(names)))
+        way_labels.append(labels.setdefault(highway, len(labels)))
+
+    return (
+        np.frombuffer(refs, dtype=np.int64),
+        np.frombuffer(way_starts, dtype=np.int64),
+        np.frombuffer(way_names, dtype=np.int64),
+        np.frombuffer(way_labels, dtype=np.int64),
+        list(names),
+        list(labels),
+    )
+
+
+def __read_osm_nodes__(path: Path, needed: np.ndarray, chunk_size: int = 1_000_000) -> tuple:
+    """
+    This method reads the coordinates of the given nodes of an OpenStreetMap XML file, a chunk of nodes at a time, and
+    stops at the first way, as nodes come ahead of ways.
+    :param path: path of the OpenStreetMap XML file
+    :param needed: sorted array of the ids of the nodes to be read
+    :param chunk_size: number of nodes read before the ones that are not needed are discarded
+    :return: tuple with the sorted array of node ids and the array of their (latitude, longitude)
+    """
+
+    kept_ids, kept_coordinates = [np.zeros(0, dtype=np.int64)], [np.zeros((0, 2))]
+    ids, latitudes, longitudes = array("q"), array("d"), array("d")
+
+    def flush():
+        chunk = np.array(ids, dtype=np.int64)
+        position = np.minimum(np.searchsorted(needed, chunk), max(len(needed) - 1, 0))
+        keep = needed[position] == chunk if len(needed) else np.zeros(len(chunk), dtype=bool)
+        kept_ids.append(chunk[keep])
+        kept_coordinates.append(
+            np.stack((np.array(latitudes)[keep], np.array(longitudes)[keep]), axis=1)
+        )
+        del ids[:], latitudes[:], longitudes[:]
+
+    for element in __iterate_osm__(path):
+        if element.tag != "node":
+            if element.tag in ("way", "relation"):
+                break
+            continue
+
+        ids.append(int(element.get("id")))
+        latitudes.append(float(element.get("lat")))
+        longitudes.append(float(element.get("lon")))
+        if len(ids) >= chunk_size:
+            flush()
+    flush()
+
+    node_ids = np.concatenate(kept_ids)
+    coordinates = np.concatenate(kept_coordinates)
+    order = np.argsort(node_ids, kind="stable")
+
+    return node_ids[order], coordinates[order]
+
+
+@timed("write_supplementary")
 def write_supplementary(
     graph: DualGraph, filename: str = "supplementary.txt", directory: str = "."
 ):
     """
     This method saves a supplementary file with all the information of DualNodes within the DualGraph.
-    Each line of the file refers to a DualNode and is organized as: index, length, label, names, and list of nodes.
+    Each line of the file refers to a DualNode and is organized as: index, length, label, names, and list of nodes,
+    followed by the value of each node attribute (e.g., betweenness), if any, in the order they were added.
     :param graph: a DualGraph object
     :param filename: name and extension of the output file
     :param directory: full path to save the supplementary file
@@ -176,25 +646,239 @@ def write_supplementary(
     directory_path.mkdir(parents=True, exist_ok=True)
     filepath = directory_path / filename
 
+    attributes = __node_attributes__(graph)
+
     # will overwrite the file if it exists
     with open(filepath, "w+") as supplementary_file:
         for nid, data in graph.node_dictionary.items():
+            extra = "".join(f", {values.get(nid, '')}" for _, values in attributes)
             supplementary_file.write(
-                f"{nid}, {data.length:f}, {data.label}, {data.names}, {data.nodes}\n"
+                f"{nid}, {data.length:f}, {data.label}, {data.names}, {data.nodes}{extra}\n"
             )
 
     return
 
 
-def write_graphml(graph: DualGraph, filename: str = "file.graphml", directory: str = "."):
+@timed("write_graphml")
+def write_graphml(
+    graph: DualGraph,
+    filename: str = "file.graphml",
+    directory: str = ".",
+    return_networkx: bool = False,
+):
     """
-    This method writes a DualGraph into a GraphML file using OSMnx and NetworkX libraries.
-    :param graph: a DualGraph mapped from a PrimalGraph
+    This method writes a DualGraph into a GraphML file, streaming one dual node at a time, and compresses it on the
+    fly when the filename ends with .gz, .bz2 or .xz. The file holds the same keys, attribute types and layout that
+    NetworkX would write, but the DualGraph is never copied into a NetworkX Graph, unless requested. Node attributes
+    (e.g., betweenness) are written after the attributes of the streets.
+    :param graph: a DualGraph mapped from a PrimalGraph (or a CompactDualGraph)
     :param filename: name of the output file
     :param directory: full path to save the file
+    :param return_networkx: if true, the DualGraph is also converted into a NetworkX Graph, which is returned
+    :return: Path of the file, or NetworkX Graph when return_networkx is true
+    """
+
+    # assembling the output file path and creating the directory when missing
+    directory_path = Path(directory)
+    directory_path.mkdir(parents=True, exist_ok=True)
+    filepath = directory_path / filename
+
+    # GraphML requires all keys ahead of the graph, so the attribute types are gathered in a first pass
+    attributes = __node_attributes__(graph)
+    keys = __graphml_keys__(graph, attributes)
+
+    with __open_text__(filepath, "w", encoding="utf-8") as graphml_file:
+        write = graphml_file.write
+        write("<?xml version='1.0' encoding='utf-8'?>\n" + __graphml_root__ + "\n")
+        # keys are listed from the last to the first one, as in files written by NetworkX
+        for (name, scope, xml_type), key in reversed(keys.items()):
+            write(f'  <key id="{key}" for="{scope}" attr.name="{name}" attr.type="{xml_type}" />\n')
+
+        if not graph.node_dictionary and not graph.edge_dictionary:
+            write('  <graph edgedefault="undirected" />\n')
+        else:
+            write('  <graph edgedefault="undirected">\n')
+            __write_graphml_elements__(write, graph, keys, attributes)
+            write("  </graph>\n")
+        write("</graphml>\n")
+
+    return __to_networkx__(graph, attributes) if return_networkx else filepath
+
+
+# opening tag of the root element of a GraphML file
+__graphml_root__ = (
+    '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+    'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">'
+)
+# attributes of each dual node, in the order they are written
+__graphml_node_attributes__ = (
+    "names",
+    "nodes",
+    "edges",
+    "source",
+    "target",
+    "length",
+    "src_edge",
+    "tgt_edge",
+)
+# GraphML type of each Python type, as chosen by NetworkX
+__graphml_types__ = {bool: "boolean", int: "long", float: "double", str: "string"}
+# characters escaped within attribute values, besides &, < and >
+__graphml_entities__ = {'"': "&quot;", "\r": "&#13;", "\n": "&#10;", "\t": "&#09;"}
+
+
+def __node_attributes__(graph: DualGraph | CompactDualGraph) -> list:
+    """
+    This method lists the node attributes of a dual graph, each one as a dictionary mapping dual node ids to values.
+    :return: list of (attribute name, dictionary) pairs
+    """
+
+    attributes = graph.node_attributes.items()
+    if isinstance(graph, CompactDualGraph):
+        dids = graph.dids.tolist()
+        attributes = [
+            (name, dict(zip(dids, np.asarray(values).tolist()))) for name, values in attributes
+        ]
+
+    for name, _ in attributes:
+        if name in __graphml_node_attributes__:
+            raise ValueError(f"Node attribute {name!r} clashes with an attribute of the streets.")
+
+    return list(attributes)
+
+
+def __escape__(text: str, entities: dict | None = None) -> str:
+    """
+    This method escapes &, < and > within a piece of XML text, along with the given entities, as
+    xml.sax.saxutils.escape does (which is not imported, as it pulls in urllib and http modules at startup).
+    :return: str
+    """
+
+    text = text.replace("&", "&amp;").replace(">", "&gt;").replace("<", "&lt;")
+    for character, entity in (entities or {}).items():
+        text = text.replace(character, entity)
+
+    return text
+
+
+def __write_graphml_elements__(write, graph: DualGraph, keys: dict, attributes: list):
+    """
+    This method writes the node and edge elements of a DualGraph, one at a time, through the given write function.
+    :param write: function that writes a string to the GraphML file
+    :param graph: a DualGraph mapped from a PrimalGraph (or a CompactDualGraph)
+    :param keys: dictionary mapping (attribute name, scope, GraphML type) to key ids
+    :param attributes: node attributes of the DualGraph, see __node_attributes__
+    """
+
+    names = __graphml_node_attributes__ + tuple(name for name, _ in attributes)
+    node_keys = [{} for _ in names]
+    for (name, scope, xml_type), key in keys.items():
+        if scope == "node":
+            node_keys[names.index(name)][xml_type] = key
+    attribute_keys = node_keys[len(__graphml_node_attributes__) :]
+
+    # creating nodes to store the streets of the PrimalGraph
+    for nid, data in graph.node_dictionary.items():
+        values = (
+            str(data.names),
+            str(data.nodes),
+            str(data.edges),
+            data.source,
+            data.target,
+            data.length,
+            data.src_edge,
+            data.tgt_edge,
+        )
+        lines = [f"    <node id={__graphml_attribute__(nid)}>\n"]
+        for value, keys_by_type in zip(values, node_keys):
+            key = keys_by_type[__graphml_type__(value)]
+            lines.append(f'      <data key="{key}">{__escape__(str(value))}</data>\n')
+        # node attributes are only written for the nodes holding a value
+        for (_, attribute), keys_by_type in zip(attributes, attribute_keys):
+            if nid in attribute:
+                value = attribute[nid]
+                key = keys_by_type[__graphml_type__(value)]
+                lines.append(f'      <data key="{key}">{__escape__(str(value))}</data>\n')
+        lines.append("    </node>\n")
+        write("".join(lines))
+
+    # creating edges that connect nodes whenever we have two edges (PrimalEdge) crossings each other
+    for eid, (source, target) in graph.edge_dictionary.items():
+        key = keys["eid", "edge", __graphml_type__(eid)]
+        write(
+            f"    <edge source={__graphml_attribute__(source)} "
+            f"target={__graphml_attribute__(target)}>\n"
+            f'      <data key="{key}">{__escape__(str(eid))}</data>\n'
+            "    </edge>\n"
+        )
+
+
+def __graphml_type__(value) -> str:
+    """
+    This method returns the GraphML type of an attribute value, following NetworkX.
+    :return: str
+    """
+
+    xml_type = __graphml_types__.get(type(value))
+    if xml_type is None:
+        if isinstance(value, np.floating):
+            return "float"
+        if isinstance(value, np.integer):
+            return "int"
+        raise TypeError(f"GraphML does not support type {type(value)} as data values.")
+
+    return xml_type
+
+
+def __graphml_attribute__(value) -> str:
+    """
+    This method quotes a value of an XML attribute.
+    :return: str
+    """
+
+    return '"' + __escape__(str(value), __graphml_entities__) + '"'
+
+
+def __graphml_keys__(graph: DualGraph, attributes: list) -> dict:
+    """
+    This method numbers the GraphML keys of a DualGraph in the order NetworkX would discover them, that is, attribute
+    by attribute along the nodes and then along the edges, with a key for each type an attribute takes. Only nodes
+    with a new combination of types are looked at closely, so the pass keeps no state per node.
+    :return: dictionary mapping (attribute name, scope, GraphML type) to key ids
+    """
+
+    keys, signatures = {}, set()
+    for nid, data in graph.node_dictionary.items():
+        values = (data.source, data.target, data.length, data.src_edge, data.tgt_edge)
+        extra = [(name, attribute[nid]) for name, attribute in attributes if nid in attribute]
+        signature = (*map(type, values), *((name, type(value)) for name, value in extra))
+        if signature in signatures:
+            continue
+        signatures.add(signature)
+
+        # names, nodes and edges are always written as strings
+        types = ("string", "string", "string", *map(__graphml_type__, values))
+        for name, xml_type in zip(__graphml_node_attributes__, types):
+            keys.setdefault((name, "node", xml_type), f"d{len(keys)}")
+        for name, value in extra:
+            keys.setdefault((name, "node", __graphml_type__(value)), f"d{len(keys)}")
+
+    for xml_type in dict.fromkeys(map(__graphml_type__, graph.edge_dictionary)):
+        keys.setdefault(("eid", "edge", xml_type), f"d{len(keys)}")
+
+    return keys
+
+
+def __to_networkx__(graph: DualGraph, attributes: list) -> "nx.Graph":
+    """
+    This method converts a DualGraph into a NetworkX Graph, whose lists of attributes are stored as strings.
     :return: NetworkX Graph
     """
 
+    import networkx as nx
+
     nxg = nx.Graph()
 
     # creating nodes to store the streets of the PrimalGraph
@@ -210,6 +894,9 @@ def write_graphml(graph: DualGraph, filename: str = "file.graphml", directory: s
         nxg.nodes[nid]["length"] = data.length
         nxg.nodes[nid]["src_edge"] = data.src_edge
         nxg.nodes[nid]["tgt_edge"] = data.tgt_edge
+        for name, attribute in attributes:
+            if nid in attribute:
+                nxg.nodes[nid][name] = attribute[nid]
 
     # creating edges that connect nodes whenever we have two edges (PrimalEdge) crossings each other
     for eid, (source, target) in graph.edge_dictionary.items():
@@ -218,18 +905,111 @@ def write_graphml(graph: DualGraph, filename: str = "file.graphml", directory: s
         # same happens to this case in here
         nxg.edges[(source, target)]["eid"] = eid
 
+    return nxg
+
+
+@timed("write_binary")
+def write_binary(
+    graph: DualGraph | CompactDualGraph, filename: str = "dual.bin", directory: str = "."
+):
+    """
+    This method writes a DualGraph into a binary file holding the arrays of its CompactDualGraph form, which
+    read_binary loads back or memory-maps. The file starts with a signature and a JSON header that lists the type,
+    shape and position of every array, and the raw arrays follow, each one aligned to 64 bytes. Node attributes
+    (e.g., betweenness) are saved as arrays of their own, listed apart in the header.
+    :param graph: a DualGraph mapped from a PrimalGraph, or its CompactDualGraph
+    :param filename: name of the output file
+    :param directory: full path to save the file
+    :return: Path of the file
+    """
+
+    if not isinstance(graph, CompactDualGraph):
+        with __paused_gc__():
+            graph = to_compact_dual(graph)
+
+    # laying the arrays out, relative to the end of the header, node attributes after the arrays of the graph
+    layouts, position = {"arrays": {}, "attributes": {}}, 0
+    arrays = {
+        "arrays": {name: np.ascontiguousarray(values) for name, values in graph.arrays().items()},
+        "attributes": {
+            name: np.ascontiguousarray(values) for name, values in graph.node_attributes.items()
+        },
+    }
+    for group, named_arrays in arrays.items():
+        for name, values in named_arrays.items():
+            position = -(-position // __binary_alignment__) * __binary_alignment__
+            layouts[group][name] = [values.dtype.str, list(values.shape), position]
+            position += values.nbytes
+    header = json.dumps({"version": 1, **layouts}).encode()
+
     # assembling the output file path and creating the directory when missing
     directory_path = Path(directory)
     directory_path.mkdir(parents=True, exist_ok=True)
     filepath = directory_path / filename
 
-    # writing the resulting graph to the informed file path
-    nx.write_graphml(
-        G=nxg,
-        path=filepath,
-        encoding="utf-8",
-        prettyprint=True,
-        infer_numeric_types=False,
-    )
+    start = __binary_data_start__(len(header))
+    with open(filepath, "wb") as binary_file:
+        binary_file.write(__binary_magic__)
+        binary_file.write(len(header).to_bytes(8, "little"))
+        binary_file.write(header)
+        for group, named_arrays in arrays.items():
+            for name, values in named_arrays.items():
+                binary_file.write(bytes(start + layouts[group][name][2] - binary_file.tell()))
+                values.tofile(binary_file)
 
-    return nxg
+    return filepath
+
+
+@timed("read_binary")
+def read_binary(filepath: str, mmap: bool = True) -> CompactDualGraph:
+    """
+    This method reads a DualGraph saved by write_binary. By default, the arrays are memory-mapped (read-only), so the
+    file opens at once whatever its size and only the dual nodes that are accessed are read from disk.
+    :param filepath: path of the binary file
+    :param mmap: if true, the arrays are memory-mapped instead of read into memory
+    :return: CompactDualGraph (see CompactDualGraph.to_dual for a DualGraph)
+    """
+
+    filepath = Path(filepath)
+    with open(filepath, "rb") as binary_file:
+        if binary_file.read(len(__binary_magic__)) != __binary_magic__:
+            raise ValueError(f"{filepath} is not a binary DualGraph file.")
+        size = int.from_bytes(binary_file.read(8), "little")
+        header = json.loads(binary_file.read(size))
+
+    if header.get("version") != 1:
+        raise ValueError(
+            f"Unsupported binary DualGraph version in {filepath}: {header.get('version')!r}"
+        )
+    if set(header["arrays"]) != set(__dual_arrays__):
+        raise ValueError(f"{filepath} does not hold the arrays of a DualGraph.")
+
+    if mmap:
+        buffer = np.memmap(filepath, dtype=np.uint8, mode="r")
+    else:
+        buffer = np.fromfile(filepath, dtype=np.uint8)
+    start = __binary_data_start__(size)
+
+    def load(dtype, shape, position):
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        return buffer[start + position : start + position + count].view(dtype).reshape(shape)
+
+    compact_graph = CompactDualGraph()
+    for name, layout in header["arrays"].items():
+        setattr(compact_graph, name, load(*layout))
+    # files written before node attributes were saved hold none
+    for name, layout in header.get("attributes", {}).items():
+        compact_graph.node_attributes[name] = load(*layout)
+
+    return compact_graph
+
+
+def __binary_data_start__(header_size: int) -> int:
+    """
+    This method returns the position of the first array of a binary DualGraph file, right after its header.
+    :return: int
+    """
+
+    end = len(__binary_magic__) + 8 + header_size
+    return -(-end // __binary_alignment__) * __binary_alignment__
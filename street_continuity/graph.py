@@ -6,6 +6,50 @@
 # Verified on February 1th, 2019.
 
 
+from collections.abc import Sequence
+from itertools import chain, islice, pairwise, repeat
+from operator import index as as_index
+
+from street_continuity.stats import timed
+
+
+class _View(Sequence):
+    """
+    Read-only view of a sequence kept by a dual node, which reflects the changes made to the node after it is read.
+    It is compared, printed and iterated as a list, and in-place changes fail, as they must be made through the node.
+    Items are read from the storage of the node, so reading the first or the last one takes constant time.
+    """
+
+    __slots__ = ("__item", "__iterate", "__size")
+
+    def __init__(self, iterate, size, item):
+        self.__iterate = iterate  # [callable] function returning an iterator over the items;
+        self.__size = size  # [callable] function returning the number of items; and,
+        self.__item = item  # [callable] function returning the item at a (negative) index.
+
+    def __iter__(self):
+        return self.__iterate()
+
+    def __len__(self) -> int:
+        return self.__size()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.__iterate())[index]
+        return self.__item(as_index(index))
+
+    def __eq__(self, other):
+        # views compare as the lists they replace, which are not equal to tuples
+        if not isinstance(other, (list, _View)):
+            return NotImplemented
+        return list(self.__iterate()) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(list(self.__iterate()))
+
+
 class PrimalGraph:
     """
     This class gathers information about the Primal Graph of a given city.
@@ -23,7 +67,7 @@ class PrimalGraph:
         def __init__(
             self, eid: int, source: str, target: str, length: float, name: str, label: str
         ):
-            self.mapped = False  # [boolean] whether the edge was mapped or not;
+            self.mapped = False  # [boolean] kept for compatibility, unused by dual_mapper;
             self.source = source  # [string] index of the source node;
             self.target = target  # [string] index of the target node;
             self.length = length  # [float] street length (in meters);
@@ -37,7 +81,9 @@ class PrimalGraph:
         self.node_dictionary = {}
         self.edge_dictionary = {}
         self.graph = {}
+        self.index = None  # spatial index of the nodes and their edges (see spatial_index)
 
+    @timed("build_graph")
     def build_graph(self):
         """
         This method creates the adjacency list of the PrimalGraph using the dictionary of edges.
@@ -60,11 +106,26 @@ class PrimalGraph:
 
         return self
 
+    def spatial_index(self):
+        """
+        This method returns the spatial index of the nodes of the PrimalGraph, along with the edges incident to each
+        node (see SpatialIndex), which is built on the first call and used to clip the graph to a region.
+        :return: SpatialIndex
+        """
+
+        if self.index is None:
+            from street_continuity.index import spatial_index
+
+            self.index = spatial_index(self)
+        return self.index
+
     def set_nodes(self, node_dictionary: dict):
         self.node_dictionary = node_dictionary
+        self.index = None
 
     def set_edges(self, edge_dictionary: dict):
         self.edge_dictionary = edge_dictionary
+        self.index = None
 
 
 class DualGraph:
@@ -79,8 +140,27 @@ class DualGraph:
         """
         Node is an inner class of DualGraph used to store information about nodes mapped from primal edges.
         Such information is iteratively updated every time a new PrimalEdge is merged into a DualNode.
+        The primal edges are kept as the path of primal nodes they follow, which grows at both ends in constant time,
+        the primal nodes as the keys of a dictionary, which tells whether a node is within the street in constant
+        time, and the names as runs of repeated names. The names, nodes and edges attributes are read-only views of
+        them, which are changed through the add_* methods, and assigning a list to any of them replaces what is stored.
         """
 
+        __slots__ = (
+            "__head",
+            "__names",
+            "__nodes",
+            "__pairs",
+            "__tail",
+            "did",
+            "label",
+            "length",
+            "source",
+            "src_edge",
+            "target",
+            "tgt_edge",
+        )
+
         def __init__(self, did: int, pge: PrimalGraph.Edge):
             self.src_edge = pge.eid  # [integer] index of the first (left-most) primal edge;
             self.tgt_edge = pge.eid  # [integer] index of the last (right-most) primal edge;
@@ -88,25 +168,174 @@ class DualGraph:
             self.target = pge.target  # [string] index of the target node of the last primal edge;
             self.length = pge.length  # [float] cumulative length of the whole dual node;
             self.label = pge.label  # [string] label of primal edges within the dual node;
-            self.names = [pge.name]  # [list] list with names of all primal edges;
-            self.nodes = [
-                pge.source,  # [list] list of all primal nodes within the dual node;
-                pge.target,
-            ]
-            self.edges = [
-                (
-                    pge.source,  # [list] list of pairs of edges part of the dual node; and,
-                    pge.target,
-                )
-            ]
+            self.__names = [pge.name, 1]  # [list] runs of names of primal edges, as name and count;
+            self.__nodes = dict.fromkeys((pge.source, pge.target))  # [dict] primal nodes within;
+            self.__head = []  # [list] path of primal nodes before the first edge, the nearest first;
+            self.__tail = [pge.source, pge.target]  # [list] path of primal nodes onward;
+            self.__pairs = False  # [boolean] whether head and tail hold pairs of nodes; and,
             self.did = did  # [integer] dual node index.
 
+        @property
+        def names(self) -> Sequence:
+            """View of the names of all primal edges, in the order they were merged."""
+            return _View(self.__iterate_names, lambda: sum(self.__names[1::2]), self.__name_at)
+
+        @names.setter
+        def names(self, names):
+            self.__names = []
+            for name in names:
+                self.add_name(name)
+
+        @property
+        def nodes(self) -> Sequence:
+            """View of all primal nodes within the dual node, in the order they were reached."""
+            return _View(lambda: iter(self.__nodes), lambda: len(self.__nodes), self.__node_at)
+
+        @nodes.setter
+        def nodes(self, nodes):
+            self.__nodes = dict.fromkeys(nodes)
+
+        @property
+        def edges(self) -> Sequence:
+            """View of the pairs of primal nodes of the primal edges within the dual node, from source to target."""
+            return _View(self.__iterate_edges, self.__count_edges, self.__edge_at)
+
+        @edges.setter
+        def edges(self, edges):
+            edges = list(map(tuple, edges))
+            if all(previous[-1] == edge[0] for previous, edge in pairwise(edges)):
+                self.__tail = [edges[0][0], *(edge[-1] for edge in edges)] if edges else []
+                self.__pairs = False
+            else:
+                self.__tail, self.__pairs = edges, True
+            self.__head = []
+
+        def __iterate_names(self):
+            runs = self.__names
+            return chain.from_iterable(map(repeat, runs[::2], runs[1::2]))
+
+        def __iterate_edges(self):
+            sequence = chain(reversed(self.__head), self.__tail)
+            return sequence if self.__pairs else pairwise(sequence)
+
+        def __count_edges(self) -> int:
+            count = len(self.__head) + len(self.__tail)
+            return count if self.__pairs else max(count - 1, 0)
+
+        def __name_at(self, index: int):
+            # the runs are walked from the nearest end, so the first and the last names are found at once
+            runs = self.__names
+            starts = range(0, len(runs), 2)
+            if index < 0:
+                starts, index = reversed(starts), -index - 1
+            for start in starts:
+                if index < runs[start + 1]:
+                    return runs[start]
+                index -= runs[start + 1]
+            raise IndexError("name index out of range")
+
+        def __node_at(self, index: int):
+            nodes = self.__nodes
+            if index < 0:
+                nodes, index = reversed(nodes), -index - 1
+            for node in islice(nodes, index, None):
+                return node
+            raise IndexError("node index out of range")
+
+        def __edge_at(self, index: int):
+            # the head holds the nearest items first, so the items of the street are found by position
+            head, tail = self.__head, self.__tail
+            count = self.__count_edges()
+            if index < 0:
+                index += count
+            if not 0 <= index < count:
+                raise IndexError("edge index out of range")
+
+            def item(position):
+                return head[-1 - position] if position < len(head) else tail[position - len(head)]
+
+            return item(index) if self.__pairs else (item(index), item(index + 1))
+
+        def add_name(self, name):
+            """
+            This method stores the name of a primal edge merged into the dual node.
+            :param name: street name of the primal edge
+            """
+
+            runs = self.__names
+            if runs and runs[-2] == name:
+                runs[-1] += 1
+            else:
+                runs += (name, 1)
+
+        def add_node(self, node):
+            """
+            This method stores a primal node within the dual node, unless it is already there.
+            :param node: index of the primal node
+            """
+
+            self.__nodes.setdefault(node)
+
+        def has_node(self, node) -> bool:
+            """
+            This method tells whether a primal node is within the dual node.
+            :param node: index of the primal node
+            :return: bool
+            """
+
+            return node in self.__nodes
+
+        def add_edge(self, source, target, is_upstream: bool = False):
+            """
+            This method stores a primal edge merged at one end of the dual node.
+            :param source: index of the source node of the primal edge
+            :param target: index of the target node of the primal edge
+            :param is_upstream: if true, the edge comes before the others; otherwise, it comes after them
+            """
+
+            if not self.__pairs:
+                head, tail = self.__head, self.__tail
+                if not tail:
+                    tail.append(target if is_upstream else source)
+                if is_upstream and (head[-1] if head else tail[0]) == target:
+                    head.append(source)
+                    return
+                if not is_upstream and tail[-1] == source:
+                    tail.append(target)
+                    return
+                # the edges no longer follow a path, so they are stored as pairs from now on
+                self.__head, self.__tail, self.__pairs = [], list(self.edges), True
+
+            (self.__head if is_upstream else self.__tail).append((source, target))
+
+        def key(self) -> tuple:
+            """
+            This method gathers all the attributes of the dual node, which are equal for dual nodes holding the same
+            street. Dual nodes themselves are compared and hashed by identity, as they change while streets grow.
+            :return: tuple
+            """
+
+            return (
+                self.src_edge,
+                self.tgt_edge,
+                self.source,
+                self.target,
+                self.length,
+                self.label,
+                list(self.names),
+                list(self.nodes),
+                list(self.edges),
+                self.did,
+            )
+
     # --- nested class --- #
 
     def __init__(self):
         self.edge_dictionary = {}  # the edges that connect the dual nodes
         self.node_dictionary = {}  # each item in this dictionary is a set of streets of greatest continuity
         self.graph = {}
+        self.node_attributes = {}  # extra attributes of the dual nodes, by name, mapping dual node ids to values
+        self.index = None  # index of the streets by node, edge and location (see street_index)
 
     def build_graph(self):
         """
@@ -130,6 +359,21 @@ class DualGraph:
 
         return self
 
+    def street_index(self, primal_graph=None):
+        """
+        This method returns the index of the streets by primal node, primal edge and location (see StreetIndex).
+        Dual graphs mapped by dual_mapper are indexed as they are mapped, and other ones on the first call, from
+        their dual nodes and the given primal graph, which is required for lookups by primal edge id and location.
+        :param primal_graph: the PrimalGraph or CompactPrimalGraph the dual graph was mapped from
+        :return: StreetIndex
+        """
+
+        if self.index is None or (primal_graph is not None and self.index.coordinates is None):
+            from street_continuity.index import street_index
+
+            self.index = street_index(self, primal_graph)
+        return self.index
+
     def set_nodes(self, node_dictionary: dict):
         self.node_dictionary = node_dictionary
 
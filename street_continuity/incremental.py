@@ -0,0 +1,456 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+
+
+import heapq
+import sys
+from bisect import insort
+
+from street_continuity.graph import DualGraph, PrimalGraph
+from street_continuity.mapper import (
+    __assemble_street__,
+    __link_streets__,
+    __merge_streets__,
+    __speculate_streets__,
+)
+from street_continuity.table import AngleTable
+
+# owner of the primal edges that do not belong to any street
+UNMAPPED = sys.maxsize
+
+
+class _MappingState:
+    """
+    This class tells which primal edges are mapped when a street starts growing in a sequential run: those owned by
+    streets grown from earlier seeds, together with the ones merged into the street itself so far.
+    """
+
+    def __init__(self, owners: list, seed: int):
+        self.owners = owners
+        self.seed = seed
+        self.merged = set()
+
+    def __getitem__(self, edge: int) -> int:
+        return int(self.owners[edge] < self.seed or edge in self.merged)
+
+    def __setitem__(self, edge: int, value):
+        self.merged.add(edge)
+
+
+class DualGraphChanges:
+    """
+    This class reports the outcome of an incremental update of a DualGraph, in terms of the ids of its nodes and edges.
+    """
+
+    def __init__(self):
+        self.created = []  # [list] ids of the new dual nodes;
+        self.deleted = []  # [list] ids of the dual nodes that no longer exist;
+        self.changed = []  # [list] ids of the dual nodes whose primal edges or attributes changed;
+        self.created_edges = []  # [list] ids of the new dual edges; and,
+        self.deleted_edges = []  # [list] ids of the dual edges that no longer exist.
+
+
+class IncrementalMapper:
+    """
+    This class keeps a DualGraph in sync with a dictionary-based PrimalGraph that receives small changes over time.
+    Each street is stored along with the primal edges whose mapping state it read while being negotiated. After a
+    change, only the streets around the changed intersections are negotiated again, and a street is only revisited
+    when an edge it read changes hands, so the work follows the size of the change instead of the size of the city.
+    The streets are always the same as the ones of dual_mapper over the updated primal graph, although dual node and
+    dual edge ids are kept stable: removed ids are not reused and new ones are appended.
+    """
+
+    def __init__(self, primal_graph: PrimalGraph, min_angle: float = 120.0, use_label: bool = True):
+        """
+        This method maps the primal graph for the first time, as dual_mapper would, and keeps what updates need.
+        :param primal_graph: a street network mapped to a PrimalGraph object, which is updated in place
+        :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
+        :param use_label: if true, continuity is only negotiated between streets of the same type (HICN)
+                          otherwise, streets' type is ignored and standardized as "unclassified" (ICN)
+        """
+
+        self.primal_graph = primal_graph
+        self.min_angle = min_angle
+        self.use_label = use_label
+        self.angle_table = AngleTable().build_table(primal_graph)
+        self.dual_graph = DualGraph()
+
+        # dense indices follow the order of the dictionary of edges, and removed edges leave a hole behind
+        self.__edges = list(primal_graph.edge_dictionary.values())
+        self.__labels = [edge.label if use_label else 0 for edge in self.__edges]
+        self.__incidence = {}
+        for index, edge in enumerate(self.__edges):
+            for node in dict.fromkeys((edge.source, edge.target)):
+                self.__incidence.setdefault(node, []).append(index)
+
+        self.__owners = [UNMAPPED] * len(self.__edges)  # seed of the street owning each edge
+        self.__streets = {}  # (merges, reads) of the street grown from each seed
+        self.__readers = {}  # seeds of the streets that read the mapping state of each edge
+        self.__dual_ids = {}  # dual node id of the street grown from each seed
+        for did, (seed, merges, reads) in enumerate(
+            __speculate_streets__(
+                self.angle_table, self.__labels, min_angle, range(len(self.__edges))
+            )
+        ):
+            self.__store(seed, merges, reads)
+            self.__dual_ids[seed] = did
+            self.dual_graph.node_dictionary[did] = self.__assemble(did, seed)
+        __link_streets__(self.dual_graph)
+
+        # indexing the dual graph, so that its edges can be updated locally
+        self.__members = {}  # dual nodes sharing each primal node
+        for did, dual_node in self.dual_graph.node_dictionary.items():
+            for primal_node in set(dual_node.nodes):
+                self.__members.setdefault(primal_node, set()).add(did)
+        self.__pairs = {pair: eid for eid, pair in self.dual_graph.edge_dictionary.items()}
+        self.__adjacent = {did: set() for did in self.dual_graph.node_dictionary}
+        for sid, tid in self.__pairs:
+            self.__adjacent[sid].add(tid)
+            self.__adjacent[tid].add(sid)
+        self.__next_node = len(self.dual_graph.node_dictionary)
+        self.__next_edge = len(self.dual_graph.edge_dictionary)
+
+    def update(
+        self,
+        added: list = (),
+        removed: list = (),
+        modified: list = (),
+        nodes: dict | None = None,
+    ) -> DualGraphChanges:
+        """
+        This method applies a change to the primal graph and updates the dual graph in place.
+        :param added: list of new PrimalGraph.Edge objects, whose ids must not be in use
+        :param removed: list of ids of the primal edges to be removed
+        :param modified: list of PrimalGraph.Edge objects replacing the existing edges with the same ids
+        :param nodes: coordinates of the new primal nodes used by the added or modified edges, or new coordinates of
+                      existing primal nodes, whose intersections and those of their neighbors are negotiated again
+        :return: DualGraphChanges
+        """
+
+        primal_graph = self.primal_graph
+        primal_graph.index = None
+        for edge in added:
+            if edge.eid in primal_graph.edge_dictionary:
+                raise ValueError(f"Primal edge {edge.eid!r} already exists; use modified instead.")
+        for edge in modified:
+            if edge.eid not in primal_graph.edge_dictionary:
+                raise KeyError(edge.eid)
+        for eid in removed:
+            if eid not in primal_graph.edge_dictionary:
+                raise KeyError(eid)
+        # a node that moves changes the angles at its own intersection and at those of its neighbors
+        moved = [
+            node
+            for node, point in (nodes or {}).items()
+            if node in primal_graph.node_dictionary
+            and tuple(point) != tuple(primal_graph.node_dictionary[node])
+        ]
+        primal_graph.node_dictionary.update(nodes or {})
+
+        # the intersections whose adjacency or angles change, and the streets that went through them
+        touched = dict.fromkeys(
+            node
+            for edge in (
+                *added,
+                *modified,
+                *(primal_graph.edge_dictionary[eid] for eid in removed),
+                *(primal_graph.edge_dictionary[edge.eid] for edge in modified),
+            )
+            for node in (edge.source, edge.target)
+        )
+        for node in moved:
+            touched.update(dict.fromkeys((node, *primal_graph.graph.get(node, ()))))
+        forced = {
+            self.__owners[index]
+            for node in touched
+            for index in self.__incidence.get(node, ())
+            if self.__owners[index] != UNMAPPED
+        }
+        queue = set(forced)
+
+        # updating the primal graph and the dense indices of its edges
+        table = self.angle_table
+        for eid in removed:
+            index = table.edge_index.pop(eid)
+            self.__detach(index)
+            self.__edges[index] = None
+            del primal_graph.edge_dictionary[eid]
+            queue.add(index)
+        for edge in modified:
+            index = table.edge_index[edge.eid]
+            self.__detach(index)
+            self.__edges[index] = edge
+            self.__labels[index] = edge.label if self.use_label else 0
+            self.__attach(index)
+            primal_graph.edge_dictionary[edge.eid] = edge
+        for edge in added:
+            index = len(self.__edges)
+            table.edge_index[edge.eid] = index
+            table.edge_ids.append(edge.eid)
+            self.__edges.append(edge)
+            self.__labels.append(edge.label if self.use_label else 0)
+            self.__owners.append(UNMAPPED)
+            self.__attach(index)
+            primal_graph.edge_dictionary[edge.eid] = edge
+
+        # rebuilding the adjacency of the touched intersections, as PrimalGraph.build_graph would
+        adjacencies, edge_nodes = {}, {}
+        for node in touched:
+            adjacency = {}
+            for index in self.__incidence.get(node, ()):
+                edge = self.__edges[index]
+                edge_nodes[edge.eid] = (edge.source, edge.target)
+                for source, target in ((edge.source, edge.target), (edge.target, edge.source)):
+                    if source == node:
+                        adjacency[target] = edge.eid
+                queue.add(index)
+            adjacencies[node] = adjacency
+            if adjacency:
+                primal_graph.graph[node] = adjacency
+            else:
+                primal_graph.graph.pop(node, None)
+        table.update_nodes(
+            adjacencies,
+            edge_nodes,
+            {node: primal_graph.node_dictionary[node] for node in adjacencies},
+        )
+
+        # reclaiming the space of the retired nodes of the table, whose dense indices are then renumbered
+        remap = table.compact()
+        if remap is not None:
+            remap = remap.tolist()
+            for merges, _ in self.__streets.values():
+                merges[:] = [(edge, remap[node], is_upstream) for edge, node, is_upstream in merges]
+
+        # negotiating the affected streets again, following the order of their seeds
+        return self.__update_dual_graph(self.__renegotiate(queue, forced))
+
+    def __attach(self, index: int):
+        """
+        This method adds a primal edge to the incidence lists of its endpoints, which are kept in dense order.
+        :return: None
+        """
+
+        edge = self.__edges[index]
+        for node in dict.fromkeys((edge.source, edge.target)):
+            insort(self.__incidence.setdefault(node, []), index)
+
+    def __detach(self, index: int):
+        """
+        This method removes a primal edge from the incidence lists of its endpoints.
+        :return: None
+        """
+
+        edge = self.__edges[index]
+        for node in dict.fromkeys((edge.source, edge.target)):
+            self.__incidence[node].remove(index)
+
+    def __store(self, seed: int, merges: list, reads: list):
+        """
+        This method records a street, taking ownership of its primal edges and registering it as reader of the
+        mapping state of the edges it read.
+        :return: None
+        """
+
+        for edge in (seed, *(edge for edge, _, _ in merges)):
+            self.__owners[edge] = seed
+        for edge, _ in reads:
+            self.__readers.setdefault(edge, set()).add(seed)
+        self.__streets[seed] = (merges, reads)
+
+    def __renegotiate(self, queue: set, forced: set) -> set:
+        """
+        This method visits the candidate seeds in ascending order, growing each street again whenever the primal
+        graph changed around it or an edge it read changed hands. The ownership of an edge only moves from a seed to
+        later ones, so every street is final once visited, and the outcome matches a sequential run.
+        :param queue: dense indices of the edges that may start a street or whose street may have changed
+        :param forced: seeds of the streets that must be grown again, as the primal graph changed around them
+        :return: set with the seeds of the streets that were grown again, created or dropped
+        """
+
+        owners, readers, streets = self.__owners, self.__readers, self.__streets
+        heap = sorted(queue)
+        queued = set(heap)
+        revisited = set()
+
+        def push(index):
+            if index not in queued:
+                queued.add(index)
+                heapq.heappush(heap, index)
+
+        def assign(edge, owner, seed):
+            # readers between the previous and the new owner now observe a different state
+            previous = owners[edge]
+            owners[edge] = owner
+            low, high = min(previous, owner), max(previous, owner)
+            for reader in readers.get(edge, ()):
+                if low < reader <= high:
+                    push(reader)
+            if previous not in (UNMAPPED, owner, seed):
+                push(previous)
+            if owner == UNMAPPED:
+                push(edge)
+
+        def drop(seed):
+            merges, reads = streets.pop(seed)
+            revisited.add(seed)
+            for edge, _ in reads:
+                readers[edge].discard(seed)
+            for edge in (seed, *(edge for edge, _, _ in merges)):
+                if owners[edge] == seed:
+                    assign(edge, UNMAPPED, seed)
+
+        while heap:
+            seed = heapq.heappop(heap)
+            queued.discard(seed)
+
+            # a removed edge, or one merged into an earlier street, does not start a street
+            if self.__edges[seed] is None or owners[seed] < seed:
+                if seed in streets:
+                    drop(seed)
+                continue
+
+            # a street whose surroundings did not change stays the same as long as what it read still holds
+            record = streets.get(seed)
+            if (
+                record is not None
+                and seed not in forced
+                and all((owners[edge] < seed) == state for edge, state in record[1])
+            ):
+                continue
+
+            reads = []
+            merges = __merge_streets__(
+                self.angle_table,
+                self.__labels,
+                _MappingState(owners, seed),
+                seed,
+                self.min_angle,
+                reads,
+            )
+            own = {seed, *(edge for edge, _, _ in merges)}
+            reads = [(edge, state) for edge, state in reads if not (state and edge in own)]
+
+            # handing over the primal edges that left or joined the street
+            revisited.add(seed)
+            if record is not None:
+                for edge, _ in record[1]:
+                    readers[edge].discard(seed)
+                for edge in (seed, *(edge for edge, _, _ in record[0])):
+                    if edge not in own and owners[edge] == seed:
+                        assign(edge, UNMAPPED, seed)
+            for edge in own:
+                if owners[edge] != seed:
+                    assign(edge, seed, seed)
+            self.__store(seed, merges, reads)
+
+        return revisited
+
+    def __assemble(self, did: int, seed: int) -> DualGraph.Node:
+        """
+        This method builds the dual node of the street grown from a seed.
+        :return: DualGraph.Node
+        """
+
+        return __assemble_street__(
+            did,
+            seed,
+            self.__streets[seed][0],
+            self.__edges.__getitem__,
+            self.angle_table.node_ids,
+            self.use_label,
+        )
+
+    def __update_dual_graph(self, revisited: set) -> DualGraphChanges:
+        """
+        This method brings the dual graph in line with the streets that were grown again, created or dropped.
+        :param revisited: seeds of the streets that were grown again, created or dropped
+        :return: DualGraphChanges
+        """
+
+        changes = DualGraphChanges()
+        node_dictionary = self.dual_graph.node_dictionary
+
+        # updating the dual nodes, keeping the ids of the streets that still exist
+        for seed in sorted(revisited):
+            did = self.__dual_ids.get(seed)
+            if seed not in self.__streets:
+                if did is not None:
+                    del self.__dual_ids[seed]
+                    self.__unlink(did, node_dictionary.pop(did))
+                    changes.deleted.append(did)
+                continue
+            if did is None:
+                did = self.__dual_ids[seed] = self.__next_node
+                self.__next_node += 1
+                node_dictionary[did] = self.__assemble(did, seed)
+                self.__link(did, node_dictionary[did])
+                changes.created.append(did)
+                continue
+            dual_node = self.__assemble(did, seed)
+            if dual_node.key() != node_dictionary[did].key():
+                self.__unlink(did, node_dictionary[did])
+                node_dictionary[did] = dual_node
+                self.__link(did, dual_node)
+                changes.changed.append(did)
+
+        # updating the dual edges around the dual nodes that were created, deleted or changed
+        for did in changes.deleted + changes.created + changes.changed:
+            self.__relink(did, changes)
+
+        # the index of the streets no longer holds, and is rebuilt on the next query
+        if changes.deleted or changes.created or changes.changed:
+            self.dual_graph.index = None
+
+        return changes
+
+    def __link(self, did: int, dual_node: DualGraph.Node):
+        for primal_node in set(dual_node.nodes):
+            self.__members.setdefault(primal_node, set()).add(did)
+
+    def __unlink(self, did: int, dual_node: DualGraph.Node):
+        for primal_node in set(dual_node.nodes):
+            self.__members[primal_node].discard(did)
+
+    def __relink(self, did: int, changes: DualGraphChanges):
+        """
+        This method compares the dual edges of a dual node with the primal nodes it now shares with other dual
+        nodes, adding and removing dual edges accordingly.
+        :return: None
+        """
+
+        dual_graph = self.dual_graph
+        dual_node = dual_graph.node_dictionary.get(did)
+        current = self.__adjacent.setdefault(did, set())
+        expected = set()
+        if dual_node is not None:
+            for primal_node in set(dual_node.nodes):
+                expected |= self.__members[primal_node]
+            expected.discard(did)
+
+        for other in current - expected:
+            pair = (did, other) if did < other else (other, did)
+            eid = self.__pairs.pop(pair)
+            del dual_graph.edge_dictionary[eid]
+            self.__adjacent[other].discard(did)
+            if pair[0] in dual_graph.graph:
+                del dual_graph.graph[pair[0]][pair[1]], dual_graph.graph[pair[1]][pair[0]]
+            changes.deleted_edges.append(eid)
+        for other in expected - current:
+            pair = (did, other) if did < other else (other, did)
+            eid = self.__pairs[pair] = self.__next_edge
+            self.__next_edge += 1
+            dual_graph.edge_dictionary[eid] = pair
+            self.__adjacent.setdefault(other, set()).add(did)
+            if dual_graph.graph:
+                dual_graph.graph.setdefault(pair[0], {})[pair[1]] = eid
+                dual_graph.graph.setdefault(pair[1], {})[pair[0]] = eid
+            changes.created_edges.append(eid)
+
+        if dual_node is None:
+            del self.__adjacent[did]
+        else:
+            self.__adjacent[did] = expected
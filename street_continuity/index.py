@@ -0,0 +1,557 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+
+
+from itertools import chain
+
+import numpy as np
+
+from street_continuity.compact import (
+    CompactDualGraph,
+    CompactPrimalGraph,
+    __index_dtype__,
+    __table__,
+)
+from street_continuity.graph import DualGraph, PrimalGraph
+from street_continuity.stats import timed
+from street_continuity.util import EARTH_RADIUS, great_circle
+
+
+class StreetIndex:
+    """
+    This class indexes the streets (dual nodes) of a dual graph by the primal nodes and primal edges (segments) they
+    hold, and by location. Each segment belongs to a single street, so the index is kept as flat arrays with one
+    entry per segment, and lookups are binary searches over sorted ids. Locations are indexed by a coordinate grid,
+    where each segment is listed in the cells its bounding box overlaps, so a bounding-box query only looks at the
+    segments of the cells it covers. The lookup structures are only built on the first query that needs them.
+    """
+
+    def __init__(self, streets, sources, targets, node_ids, edge_ids=None, coordinates=None):
+        self.streets = np.asarray(streets, dtype=np.int64)  # [array] dual node id of each segment;
+        self.sources = np.asarray(sources, dtype=np.int64)  # [array] its source primal node code;
+        self.targets = np.asarray(targets, dtype=np.int64)  # [array] its target primal node code;
+        self.node_ids = __id_array__(node_ids)  # [array] original id of each primal node code;
+        self.edge_ids = None  # [array] original id of each segment (primal edge), if known; and,
+        self.coordinates = None  # [array] (latitude, longitude) of each primal node code, if known.
+        if edge_ids is not None:
+            self.edge_ids = __id_array__(edge_ids)
+        if coordinates is not None:
+            self.coordinates = np.asarray(coordinates)
+        self.__node_sorter = None
+        self.__node_offsets = None
+        self.__node_streets = None
+        self.__edge_sorter = None
+        self.__pair_keys = None
+        self.__pair_sorter = None
+        self.__grid = None
+
+    def node_streets(self, nid) -> list:
+        """
+        This method returns the ids of the streets holding a primal node, i.e., the streets meeting at it.
+        :param nid: original id of the primal node
+        :return: sorted list of dual node ids, empty when the primal node is not in the dual graph
+        """
+
+        if self.__node_offsets is None:
+            self.__index_nodes()
+        code = __search__(self.node_ids, self.__node_sorter, nid)
+        if code < 0:
+            return []
+        start, stop = self.__node_offsets[code : code + 2].tolist()
+        return self.__node_streets[start:stop].tolist()
+
+    def edge_street(self, eid):
+        """
+        This method returns the id of the street holding a primal edge.
+        :param eid: original id of the primal edge
+        :return: dual node id, or None when the primal edge is not in the dual graph
+        """
+
+        return self.edge_streets([eid])[0]
+
+    def edge_streets(self, eids) -> list:
+        """
+        This method returns the id of the street holding each of many primal edges at once.
+        :param eids: sequence of original ids of primal edges
+        :return: list of dual node ids, with None for the primal edges that are not in the dual graph
+        """
+
+        if self.edge_ids is None:
+            raise ValueError(
+                "The ids of the primal edges are unknown; pass the primal graph to street_index."
+            )
+        if self.__edge_sorter is None:
+            self.__edge_sorter = np.argsort(self.edge_ids, kind="stable")
+
+        segments = __search__(self.edge_ids, self.__edge_sorter, eids)
+        streets = self.streets[segments].tolist()
+        return [
+            None if segment < 0 else street for segment, street in zip(segments.tolist(), streets)
+        ]
+
+    def segment_streets(self, source, target) -> list:
+        """
+        This method returns the ids of the streets holding a segment given by its primal nodes, in either direction.
+        There is more than one street only when parallel primal edges link the same pair of nodes.
+        :param source: original id of a primal node of the segment
+        :param target: original id of the other primal node of the segment
+        :return: sorted list of dual node ids
+        """
+
+        if self.__node_offsets is None:
+            self.__index_nodes()
+        codes = __search__(self.node_ids, self.__node_sorter, [source, target])
+        if np.any(codes < 0):
+            return []
+
+        if self.__pair_keys is None:
+            low = np.minimum(self.sources, self.targets)
+            high = np.maximum(self.sources, self.targets)
+            self.__pair_keys = low * len(self.node_ids) + high
+            self.__pair_sorter = np.argsort(self.__pair_keys, kind="stable")
+        key = codes.min() * len(self.node_ids) + codes.max()
+        start, stop = np.searchsorted(self.__pair_keys, [key, key + 1], sorter=self.__pair_sorter)
+        return sorted(set(self.streets[self.__pair_sorter[start:stop]].tolist()))
+
+    def bbox_streets(self, south: float, west: float, north: float, east: float) -> list:
+        """
+        This method returns the ids of the streets with a segment crossing a bounding box, only testing the
+        segments listed in the grid cells the box overlaps.
+        :param south: minimum latitude of the box
+        :param west: minimum longitude of the box
+        :param north: maximum latitude of the box
+        :param east: maximum longitude of the box
+        :return: sorted list of dual node ids
+        """
+
+        if self.coordinates is None:
+            raise ValueError(
+                "The coordinates of the primal nodes are unknown; pass the primal graph to street_index."
+            )
+        if self.__grid is None:
+            self.__grid = __grid__(self.coordinates, self.sources, self.targets)
+
+        # segments listed in the cells the box overlaps, tested against the box itself
+        segments = __candidates__(self.__grid, south, west, north, east)
+        start = self.coordinates[self.sources[segments]]
+        stop = self.coordinates[self.targets[segments]]
+        hits = __crosses__(start, stop, (south, west), (north, east))
+        return np.unique(self.streets[segments[hits]]).tolist()
+
+    def __index_nodes(self):
+        """
+        This method lists the streets of each primal node, as offsets and values ordered by primal node code.
+        :return: None
+        """
+
+        codes = np.concatenate([self.sources, self.targets])
+        streets = np.concatenate([self.streets, self.streets])
+        order = np.lexsort((streets, codes))
+        codes, streets = codes[order], streets[order]
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = (codes[1:] != codes[:-1]) | (streets[1:] != streets[:-1])
+
+        counts = np.bincount(codes[first], minlength=len(self.node_ids))
+        self.__node_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.__node_streets = streets[first]
+        self.__node_sorter = np.argsort(self.node_ids, kind="stable")
+
+
+def __id_array__(ids) -> np.ndarray:
+    """
+    This method stores a sequence of original ids as an array, as objects when they are neither integers nor strings.
+    :return: numpy array
+    """
+
+    if isinstance(ids, np.ndarray):
+        return ids
+    ids = list(ids)
+    try:
+        return __table__(ids)
+    except TypeError:
+        return np.fromiter(ids, dtype=object, count=len(ids))
+
+
+def __search__(ids: np.ndarray, sorter: np.ndarray, values) -> np.ndarray:
+    """
+    This method maps original ids into their positions by binary search over the sorted ids.
+    :return: array of positions (a single one for a scalar), with -1 for the ids that are missing
+    """
+
+    values = np.asarray(values, dtype=ids.dtype if ids.dtype == object else None)
+    if not len(ids):
+        return np.full(values.shape, -1, dtype=np.int64)
+    try:
+        position = np.minimum(np.searchsorted(ids, values, sorter=sorter), len(ids) - 1)
+    except TypeError:
+        # ids of another type than those of the index, e.g., strings looked up among integers
+        return np.full(values.shape, -1, dtype=np.int64)
+    position = sorter[position]
+    return np.where(ids[position] == values, position, -1)
+
+
+def __ranges__(offsets: np.ndarray, cells: np.ndarray) -> np.ndarray:
+    """
+    This method concatenates the ranges offsets[cell]:offsets[cell + 1] of the given cells.
+    :return: array of positions
+    """
+
+    counts = offsets[cells + 1] - offsets[cells]
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1] if len(ends) else 0) + np.repeat(
+        offsets[cells] - ends + counts, counts
+    )
+
+
+def __grid__(coordinates: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> tuple:
+    """
+    This method lists the segments in the cells of a grid laid over their extent, with about one cell per segment.
+    Each segment is listed in every cell its bounding box overlaps, and points are indexed as segments from
+    themselves to themselves.
+    :return: tuple with the origin, the size and the (rows, columns) shape of the cells, and the offsets and
+             segments of each cell, in CSR form
+    """
+
+    start, stop = coordinates[sources].astype(np.float64), coordinates[targets].astype(np.float64)
+    if not len(start):
+        return (
+            np.zeros(2),
+            np.ones(2),
+            np.ones(2, dtype=np.int64),
+            np.zeros(2, dtype=np.int64),
+            np.zeros(0, dtype=np.int64),
+        )
+    low, high = np.minimum(start, stop), np.maximum(start, stop)
+    origin, extent = low.min(axis=0), high.max(axis=0) - low.min(axis=0)
+
+    # square-ish cells, as many as segments, over the extent of the network
+    side = max(1, int(np.sqrt(len(start))))
+    size = np.maximum(extent / side, np.finfo(np.float64).eps)
+    shape = np.floor(extent / size).astype(np.int64) + 1
+
+    first = np.minimum(np.floor((low - origin) / size).astype(np.int64), shape - 1)
+    last = np.minimum(np.floor((high - origin) / size).astype(np.int64), shape - 1)
+    spans = last - first + 1
+    counts = spans[:, 0] * spans[:, 1]
+
+    # one entry per (segment, cell) pair, stepping through the cells of each bounding box
+    segments = np.repeat(np.arange(len(start)), counts)
+    step = np.arange(len(segments)) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = first[segments, 0] + step // spans[segments, 1]
+    columns = first[segments, 1] + step % spans[segments, 1]
+    cells = rows * shape[1] + columns
+
+    order = np.argsort(cells, kind="stable")
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(cells, minlength=shape[0] * shape[1]))))
+    return origin, size, shape, offsets.astype(np.int64), segments[order]
+
+
+def __candidates__(grid: tuple, south: float, west: float, north: float, east: float) -> np.ndarray:
+    """
+    This method lists the members of the cells of a grid (see __grid__) that a bounding box overlaps.
+    :return: sorted array of members, without repetitions
+    """
+
+    origin, size, shape, offsets, members = grid
+    if not len(members) or south > north or west > east:
+        return members[:0]
+
+    # cells overlapped by the box, clipped to the grid
+    low = np.floor((np.array([south, west]) - origin) / size).astype(np.int64)
+    high = np.floor((np.array([north, east]) - origin) / size).astype(np.int64)
+    if np.any(high < 0) or np.any(low >= shape):
+        return members[:0]
+    low, high = np.maximum(low, 0), np.minimum(high, shape - 1)
+    rows = np.arange(low[0], high[0] + 1)
+    cells = (rows[:, None] * shape[1] + np.arange(low[1], high[1] + 1)).ravel()
+
+    return np.unique(members[__ranges__(offsets, cells)])
+
+
+def __crosses__(start: np.ndarray, stop: np.ndarray, low, high) -> np.ndarray:
+    """
+    This method tells which segments cross a box, clipping each of them to the box (Liang-Barsky).
+    :return: array of booleans
+    """
+
+    low, high = np.asarray(low, dtype=np.float64), np.asarray(high, dtype=np.float64)
+    direction = stop - start
+    with np.errstate(divide="ignore", invalid="ignore"):
+        enter = (low - start) / direction
+        leave = (high - start) / direction
+    near, far = np.minimum(enter, leave), np.maximum(enter, leave)
+
+    # a segment parallel to an axis crosses the box along it only when it lies between the bounds
+    flat = direction == 0
+    inside = (start >= low) & (start <= high)
+    near = np.where(flat, np.where(inside, -np.inf, np.inf), near)
+    far = np.where(flat, np.where(inside, np.inf, -np.inf), far)
+
+    return np.maximum(near.max(axis=1), 0.0) <= np.minimum(far.min(axis=1), 1.0)
+
+
+def street_index(
+    dual_graph: DualGraph | CompactDualGraph,
+    primal_graph: PrimalGraph | CompactPrimalGraph | None = None,
+) -> StreetIndex:
+    """
+    This method indexes the streets of a dual graph by the segments they hold, read from its dual nodes. The dual
+    nodes only hold the primal nodes of their segments, so the ids of the primal edges and the coordinates of the
+    primal nodes come from the primal graph, when informed; otherwise, the index answers lookups by primal node and
+    by segment endpoints only. Dual graphs mapped by dual_mapper come with their index (see DualGraph.street_index).
+    :param dual_graph: a DualGraph or CompactDualGraph
+    :param primal_graph: the PrimalGraph or CompactPrimalGraph the dual graph was mapped from
+    :return: StreetIndex
+    """
+
+    if isinstance(dual_graph, CompactDualGraph):
+        sizes = np.diff(dual_graph.edge_offsets)
+        streets = np.repeat(np.asarray(dual_graph.dids, dtype=np.int64), sizes)
+        sources, targets = np.asarray(dual_graph.edges, dtype=np.int64).T
+        node_ids = dual_graph.node_table
+    else:
+        dual_nodes = dual_graph.node_dictionary.values()
+        sizes = np.fromiter((len(node.edges) for node in dual_nodes), np.int64, len(dual_nodes))
+        streets = np.repeat(
+            np.fromiter(dual_graph.node_dictionary, np.int64, len(dual_nodes)), sizes
+        )
+        table = {}
+        codes = np.fromiter(
+            (
+                table.setdefault(nid, len(table))
+                for nid in chain.from_iterable(
+                    chain.from_iterable(node.edges for node in dual_nodes)
+                )
+            ),
+            np.int64,
+        )
+        sources, targets = codes.reshape(-1, 2).T
+        node_ids = list(table)
+
+    if primal_graph is None:
+        return StreetIndex(streets, sources, targets, node_ids)
+
+    # the primal graph gives the coordinates of the primal nodes and the ids of the primal edges
+    if isinstance(primal_graph, CompactPrimalGraph):
+        primal_ids, coordinates = primal_graph.node_ids, primal_graph.coordinates
+        edge_sources = np.asarray(primal_graph.sources, dtype=np.int64)
+        edge_targets = np.asarray(primal_graph.targets, dtype=np.int64)
+        edge_ids = primal_graph.edge_ids
+    else:
+        primal_ids = __id_array__(primal_graph.node_dictionary)
+        coordinates = np.array(
+            list(primal_graph.node_dictionary.values()), dtype=np.float64
+        ).reshape(-1, 2)
+        primal_index = {nid: code for code, nid in enumerate(primal_graph.node_dictionary)}
+        edges = primal_graph.edge_dictionary.values()
+        edge_sources = np.fromiter(
+            (primal_index[edge.source] for edge in edges), np.int64, len(edges)
+        )
+        edge_targets = np.fromiter(
+            (primal_index[edge.target] for edge in edges), np.int64, len(edges)
+        )
+        edge_ids = __id_array__(primal_graph.edge_dictionary)
+
+    sorter = np.argsort(primal_ids, kind="stable")
+    codes = __search__(primal_ids, sorter, __id_array__(node_ids))
+    if np.any(codes < 0):
+        raise KeyError("The dual graph holds primal nodes that are not in the primal graph.")
+    sources, targets = codes[sources], codes[targets]
+
+    # segments are matched with primal edges by their endpoints, in either direction and in order of appearance
+    n = len(primal_ids)
+    keys = np.minimum(sources, targets) * n + np.maximum(sources, targets)
+    edge_keys = np.minimum(edge_sources, edge_targets) * n + np.maximum(edge_sources, edge_targets)
+    segment_order = np.lexsort((np.arange(len(keys)), keys))
+    edge_order = np.lexsort((np.arange(len(edge_keys)), edge_keys))
+    if not np.array_equal(keys[segment_order], edge_keys[edge_order]):
+        raise KeyError(
+            "The segments of the dual graph do not match the primal edges of the primal graph."
+        )
+    segment_edges = np.empty(len(keys), dtype=np.int64)
+    segment_edges[segment_order] = edge_order
+
+    return StreetIndex(streets, sources, targets, primal_ids, edge_ids[segment_edges], coordinates)
+
+
+class SpatialIndex:
+    """
+    This class indexes the nodes of a primal graph by their coordinates, in a grid with about one node per cell, along
+    with the edges incident to each node. Nodes and edges are known by their positions in the dictionaries of a
+    PrimalGraph (or by the dense indices of a CompactPrimalGraph). The index is built in bulk, with array operations,
+    so that a query only looks at the nodes in the cells its region overlaps, and at the edges of the nodes it keeps.
+    """
+
+    def __init__(self, coordinates, sources, targets, node_ids, edge_ids):
+        self.node_ids = node_ids  # [sequence] original id of each node position;
+        self.edge_ids = edge_ids  # [sequence] original id of each edge position;
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.coordinates = coordinates  # [array] (lat, lon) of each node;
+        self.sources = np.asarray(sources, dtype=np.int64)  # [array] source position of each edge;
+        self.targets = np.asarray(targets, dtype=np.int64)  # [array] target position of each edge;
+        n = len(coordinates)
+        self.grid = __grid__(coordinates, np.arange(n), np.arange(n))  # [tuple] see __grid__;
+
+        # each edge is listed under both of its nodes, a self-loop twice under its single node
+        owners = np.concatenate([self.sources, self.targets])
+        order = np.argsort(owners, kind="stable")
+        counts = np.bincount(owners, minlength=n)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(
+            np.int64
+        )  # [array] CSR offsets;
+        self.edges = order % max(len(self.sources), 1)  # [array] edges listed by node.
+
+    def nodes_in_bbox(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        """
+        This method finds the nodes inside a bounding box, borders included.
+        :return: sorted array of node positions
+        """
+
+        nodes = __candidates__(self.grid, south, west, north, east)
+        latitude, longitude = self.coordinates[nodes].T
+        inside = (
+            (latitude >= south) & (latitude <= north) & (longitude >= west) & (longitude <= east)
+        )
+        return nodes[inside]
+
+    def nodes_in_circle(self, latitude: float, longitude: float, radius: float) -> np.ndarray:
+        """
+        This method finds the nodes within a great-circle distance of a point.
+        :param radius: distance in meters
+        :return: sorted array of node positions
+        """
+
+        # the box around the circle, widened in longitude as meridians converge
+        reach = np.rad2deg(radius / EARTH_RADIUS)
+        cosine = np.cos(np.deg2rad(latitude))
+        width = 180.0 if cosine * 180.0 <= reach else reach / cosine
+        nodes = __candidates__(
+            self.grid, latitude - reach, longitude - width, latitude + reach, longitude + width
+        )
+        distances = great_circle(latitude, longitude, *self.coordinates[nodes].T)
+        return nodes[distances <= radius]
+
+    def nodes_in_polygon(self, vertices) -> np.ndarray:
+        """
+        This method finds the nodes inside a polygon, by the even-odd rule.
+        :param vertices: sequence of (latitude, longitude) vertices, the last one being linked to the first one
+        :return: sorted array of node positions
+        """
+
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+        if len(vertices) < 3:
+            raise ValueError("A polygon needs at least three vertices.")
+        (south, west), (north, east) = vertices.min(axis=0), vertices.max(axis=0)
+        nodes = __candidates__(self.grid, south, west, north, east)
+        latitude, longitude = self.coordinates[nodes].T
+
+        # counting the sides of the polygon crossed by a ray running east from each node
+        inside = np.zeros(len(nodes), dtype=bool)
+        for (y1, x1), (y2, x2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            if y1 == y2:
+                continue
+            spans = (y1 > latitude) != (y2 > latitude)
+            inside ^= spans & (longitude < x1 + (latitude - y1) * (x2 - x1) / (y2 - y1))
+        return nodes[inside]
+
+    def edges_within(self, nodes: np.ndarray) -> np.ndarray:
+        """
+        This method finds the edges whose nodes are both among the given ones.
+        :param nodes: sorted array of node positions
+        :return: sorted array of edge positions
+        """
+
+        edges = np.unique(self.edges[__ranges__(self.offsets, nodes)])
+        kept = np.isin(self.sources[edges], nodes, assume_unique=False)
+        kept &= np.isin(self.targets[edges], nodes, assume_unique=False)
+        return edges[kept]
+
+
+def spatial_index(primal_graph: PrimalGraph | CompactPrimalGraph) -> SpatialIndex:
+    """
+    This method indexes the nodes of a primal graph by their coordinates (see PrimalGraph.spatial_index).
+    :param primal_graph: a street network mapped to a PrimalGraph or CompactPrimalGraph object
+    :return: SpatialIndex
+    """
+
+    if isinstance(primal_graph, CompactPrimalGraph):
+        return SpatialIndex(
+            primal_graph.coordinates,
+            primal_graph.sources,
+            primal_graph.targets,
+            primal_graph.node_ids,
+            primal_graph.edge_ids,
+        )
+
+    position = {nid: index for index, nid in enumerate(primal_graph.node_dictionary)}
+    edges = primal_graph.edge_dictionary.values()
+    coordinates = np.array(list(primal_graph.node_dictionary.values()), dtype=np.float64)
+    return SpatialIndex(
+        coordinates,
+        np.fromiter((position[edge.source] for edge in edges), np.int64, len(edges)),
+        np.fromiter((position[edge.target] for edge in edges), np.int64, len(edges)),
+        list(primal_graph.node_dictionary),
+        list(primal_graph.edge_dictionary),
+    )
+
+
+@timed("clip")
+def clip(
+    primal_graph: PrimalGraph | CompactPrimalGraph,
+    bbox: tuple | None = None,
+    circle: tuple | None = None,
+    polygon=None,
+):
+    """
+    This method clips a primal graph to a region, keeping the nodes inside it and the edges between them, in their
+    original order, so the clipped graph maps as if it had been read that way. Exactly one region must be given. The
+    spatial index of the primal graph is built on the first clip, and every clip then takes time proportional to the
+    part of the network near the region.
+    :param primal_graph: a street network mapped to a PrimalGraph or CompactPrimalGraph object
+    :param bbox: (south, west, north, east) bounds of a box, in degrees
+    :param circle: (latitude, longitude, radius) of a circle, the radius in meters
+    :param polygon: sequence of (latitude, longitude) vertices of a polygon
+    :return: a new PrimalGraph or CompactPrimalGraph, the same type as the given one
+    """
+
+    if sum(region is not None for region in (bbox, circle, polygon)) != 1:
+        raise ValueError("Exactly one of bbox, circle and polygon must be given.")
+
+    index = primal_graph.spatial_index()
+    if bbox is not None:
+        nodes = index.nodes_in_bbox(*bbox)
+    elif circle is not None:
+        nodes = index.nodes_in_circle(*circle)
+    else:
+        nodes = index.nodes_in_polygon(polygon)
+    edges = index.edges_within(nodes)
+
+    if isinstance(primal_graph, CompactPrimalGraph):
+        clipped = CompactPrimalGraph()
+        clipped.node_ids = primal_graph.node_ids[nodes]
+        clipped.coordinates = primal_graph.coordinates[nodes]
+        clipped.edge_ids = primal_graph.edge_ids[edges]
+        dtype = __index_dtype__(len(nodes))
+        clipped.sources = np.searchsorted(nodes, primal_graph.sources[edges]).astype(dtype)
+        clipped.targets = np.searchsorted(nodes, primal_graph.targets[edges]).astype(dtype)
+        clipped.lengths = primal_graph.lengths[edges]
+        clipped.names = primal_graph.names[edges]
+        clipped.labels = primal_graph.labels[edges]
+        clipped.name_table = primal_graph.name_table
+        clipped.label_table = primal_graph.label_table
+        return clipped.build_graph()
+
+    node_ids = list(map(index.node_ids.__getitem__, nodes.tolist()))
+    edge_ids = list(map(index.edge_ids.__getitem__, edges.tolist()))
+    clipped = PrimalGraph()
+    clipped.set_nodes({nid: primal_graph.node_dictionary[nid] for nid in node_ids})
+    clipped.set_edges(
+        {
+            eid: PrimalGraph.Edge(eid, edge.source, edge.target, edge.length, edge.name, edge.label)
+            for eid, edge in zip(edge_ids, map(primal_graph.edge_dictionary.__getitem__, edge_ids))
+        }
+    )
+    return clipped.build_graph()
@@ -6,246 +6,715 @@
 # Verified on February 4th, 2019.
 
 
+import math
+from itertools import chain
+
 import numpy as np
 
+from street_continuity.compact import (
+    CompactDualGraph,
+    CompactPrimalGraph,
+    __factorize__,
+    __table__,
+)
 from street_continuity.graph import DualGraph, PrimalGraph
-from street_continuity.util import compute_angle
+from street_continuity.index import StreetIndex
+from street_continuity.pool import gather, in_worker, process_pool, shareable, worker_state
+from street_continuity.stats import active, stage, timed
+from street_continuity.table import AngleTable
 
 
 def __merge_criteria__(
-    primal_graph: PrimalGraph,
-    neighbors: list,
-    source: str | int,
-    src_edge: str | int,
+    angle_table: AngleTable,
+    neighborhood: list,
+    source: int,
+    src_edge: int,
     min_angle: float = 120.0,
 ):
     """
-    The method uses the law of cosines to calculate the angle between the georeferenced coordinates
-    of three given nodes. To this end, we approximate the straight-line distance of the sides of the
-    triangle formed by such nodes using the haversine distance. Then, we apply the law of cosines
-    to find the angle between the triplet which has the negotiator as the intermediate node.
-    :param primal_graph: a street network mapped to a PrimalGraph object
-    :param neighbors: list of neighbors of the source node
-    :param source: source node (also known as negotiator), which is in the middle of the triplet
-    :param src_edge: edge from which the source node comes from
+    The method looks up the angle between the georeferenced coordinates of three given nodes, which was computed
+    beforehand with the law of cosines over the haversine distance of the sides of the triangle formed by such nodes.
+    The negotiator is the intermediate node of the triplet, and the angles are read from the AngleTable in O(1).
+    :param angle_table: the AngleTable of the street network being mapped
+    :param neighborhood: list of candidate columns, i.e., adjacency slots of the source node
+    :param source: dense index of the source node (also known as negotiator), which is in the middle of the triplet
+    :param src_edge: dense index of the edge from which the source node comes from
     :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
-    :return: ID of the neighbor that forms that highest convex angle or False whenever it does not exist
-    """
-
-    # retrieving information about the source edge
-    edge = primal_graph.edge_dictionary[src_edge]
-    # the target is a node different than the source that comes from the source edge
-    target = edge.source if source != edge.source else edge.target
-    # the neighbor is always on the opposite side of the target
-    candidates = [
-        compute_angle(
-            primal_graph.node_dictionary[neighbor],  # coordinates of the neighbor node
-            primal_graph.node_dictionary[source],  # coordinates of the source node
-            primal_graph.node_dictionary[target],
-        )  # coordinates of the target node
-        for neighbor in neighbors
-    ]
+    :return: column of the neighbor that forms that highest convex angle or None whenever it does not exist
+    """
 
-    # returns the neighbor that forms the highest convex angle or False whenever it does not exist
-    if len(candidates) == 0:
-        return False
-    return neighbors[np.argmax(candidates)] if np.max(candidates) >= min_angle else False
+    # the angles formed by the source edge with every neighbor of the source node, in adjacency order
+    angles = angle_table.angle_row(source, src_edge)
+
+    stats = active()
+    if stats is not None:
+        stats.angle_evaluations += len(neighborhood)
+        stats.candidates[len(neighborhood)] = stats.candidates.get(len(neighborhood), 0) + 1
+
+    # returns the neighbor that forms the highest convex angle (the first one on ties) or None otherwise
+    best = max(neighborhood, key=angles.__getitem__)
+    return best if angles[best] >= min_angle else None
 
 
 def __explore_neighborhood__(
-    primal_graph: PrimalGraph, dual_node: DualGraph.Node, is_upstream=True
+    angle_table: AngleTable,
+    labels: list,
+    mapped: bytearray,
+    leading_seed: int,
+    reverse_seed: int,
+    label,
+    reads: list | None = None,
 ):
     """
-    This method sweeps the upstream and downstream neighborhood when provided with the source and target of a dual node.
-    As a result, it provides a list of candidate nodes, which can be used to merge primal edges into dual nodes.
-    The direction which the method will follow is given by `is_upstream` attribute, which is True by default.
-    :param primal_graph: a street network mapped to a PrimalGraph object
-    :param dual_node: the dual node being expanded in the current iteration
-    :param is_upstream: if true, follows the upstream direction of the neighbors starting from the source node
-                        otherwise, follows the downstream direction of the neighbors starting from the target node
-    :return: List
-    """
-
-    # defining the direction of the neighborhood search
-    leading_seed = dual_node.source if is_upstream else dual_node.target
-    reverse_seed = dual_node.target if is_upstream else dual_node.source
-
-    neighborhood = []
-    for neighbor in primal_graph.graph[leading_seed]:
-        # checking whether this is a self-loop or the current edge
-        if neighbor != reverse_seed:
-            if is_upstream:
-                # this is the upstream direction (from neighbor to source)
-                eid = primal_graph.graph[neighbor][leading_seed]
-            else:
-                # this is the downstream direction (from target to neighbor)
-                eid = primal_graph.graph[leading_seed][neighbor]
-            # retrieving the resulting edge
-            edge = primal_graph.edge_dictionary[eid]
-            # the streets must be unused and have the same type, both of which are known to be merge conditions
-            # notice that, when using the ICN instead of the HICN all labels should be standardized
-            if not edge.mapped and edge.label == dual_node.label:
-                neighborhood.append(neighbor)
-
-    return neighborhood
+    This method sweeps the neighborhood of one end of a dual node, given by its leading seed (the source node when
+    growing upstream and the target node when growing downstream), while the reverse seed is the opposite end.
+    As a result, it provides a list of candidate slots, which can be used to merge primal edges into dual nodes.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param labels: label of each (dense) primal edge
+    :param mapped: mapping state of each (dense) primal edge
+    :param leading_seed: dense index of the node at the end being explored
+    :param reverse_seed: dense index of the node at the opposite end of the dual node
+    :param label: label of the dual node
+    :param reads: if informed, receives the (edge, mapped) pairs whose mapping state decided the candidates
+    :return: list of candidate columns, i.e., adjacency slots of the leading seed
+    """
+
+    start, stop = angle_table.offsets[leading_seed : leading_seed + 2].tolist()
+    neighbors = angle_table.neighbors[start:stop].tolist()
+    edges = angle_table.edges[start:stop].tolist()
+
+    if reads is not None:
+        reads.extend(
+            (edge, mapped[edge])
+            for neighbor, edge in zip(neighbors, edges)
+            if neighbor != reverse_seed and labels[edge] == label
+        )
+
+    # the streets must be unused and have the same type, both of which are known to be merge conditions
+    # notice that, when using the ICN instead of the HICN all labels should be standardized
+    return [
+        column
+        for column, neighbor in enumerate(neighbors)
+        if neighbor != reverse_seed and not mapped[edges[column]] and labels[edges[column]] == label
+    ]
 
 
 def __extend_neighborhood__(
-    primal_graph: PrimalGraph,
-    neighborhood: list,
     dual_node: DualGraph.Node,
-    min_angle: float,
+    primal_edge: PrimalGraph.Edge,
+    candidate,
     is_upstream=True,
 ):
     """
-    This method analyzes the candidate nodes and merges the dual node with an unused primal edge.
+    This method merges the dual node with an unused primal edge that won the negotiation at one of its ends.
     This process consists of updating the source and target node (from the primal graph edges) that form the dual node.
     Additionally, we save information about distance and the name of the streets for further validation.
     The direction which the method will follow is given by `is_upstream` attribute, which is True by default.
-    :param primal_graph: a street network mapped to a PrimalGraph object
-    :param neighborhood: a list of candidate nodes, which can be used to merge primal edges into dual nodes
-    :param dual_node: the dual node being expanded in the current iteration
-    :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
-    :param is_upstream: if true, follows the upstream direction of the neighbors starting from the source node
-                        otherwise, follows the downstream direction of the neighbors starting from the target node
-    :return: ID of the neighbor that forms that highest convex angle or False whenever it does not exist
-    """
-
-    if len(neighborhood):
-        # the negotiation happens at the seed of the current direction, the source node
-        # when growing upstream and the target node when growing downstream
-        seed = dual_node.source if is_upstream else dual_node.target
-        seed_edge = dual_node.src_edge if is_upstream else dual_node.tgt_edge
-        # retrieving the neighbor that forms the highest convex angle with the existing dual node
-        candidate = __merge_criteria__(primal_graph, neighborhood, seed, seed_edge, min_angle)
-
-        if candidate:  # the candidate might not exist
-            # defining the direction in which we will extend the neighborhood
-            eid = (
-                primal_graph.graph[candidate][dual_node.source]
-                if is_upstream
-                else primal_graph.graph[dual_node.target][candidate]
-            )
-            # the primal edge is now mapped and cannot be used again
-            primal_graph.edge_dictionary[eid].mapped = True
+    :param dual_node: the dual node being expanded
+    :param primal_edge: the primal edge being merged into the dual node
+    :param candidate: the node at the far end of the merged primal edge
+    :param is_upstream: if true, the edge is merged upstream of the source node
+                        otherwise, the edge is merged downstream of the target node
+    :return: None
+    """
 
-            if is_upstream:
-                dual_node.edges.insert(
-                    0, (candidate, dual_node.source)
-                )  # storing the edge tuple for further user
-                dual_node.source = (
-                    candidate  # to upstream neighborhood, we update the source of the dual node
-                )
-            else:
-                dual_node.edges.append(
-                    (dual_node.target, candidate)
-                )  # storing the edge tuple for further user
-                dual_node.target = candidate  # otherwise, we update the dual node target
+    if is_upstream:
+        # storing the edge tuple for further use
+        dual_node.add_edge(candidate, dual_node.source, is_upstream=True)
+        # to upstream neighborhood, we update the source of the dual node
+        dual_node.source = candidate
+        # new source edge id in case of upstream neighborhood
+        dual_node.src_edge = primal_edge.eid
+    else:
+        # storing the edge tuple for further use
+        dual_node.add_edge(dual_node.target, candidate)
+        # otherwise, we update the dual node target
+        dual_node.target = candidate
+        # new target edge id in case of downstream neighborhood
+        dual_node.tgt_edge = primal_edge.eid
 
-            # the length of the street grows by summing the old length with the one from the merged primal edge
-            dual_node.length = dual_node.length + primal_graph.edge_dictionary[eid].length
+    # the length of the street grows by summing the old length with the one from the merged primal edge
+    dual_node.length = dual_node.length + primal_edge.length
 
-            # storing the name of the primal edge in the list of street names of the dual node
-            dual_node.names.append(primal_graph.edge_dictionary[eid].name)
+    # storing the name of the primal edge in the list of street names of the dual node
+    dual_node.add_name(primal_edge.name)
 
-            # storing the nodes (from the primal graph) that are within the dual node
-            if candidate not in dual_node.nodes:
-                dual_node.nodes.append(candidate)
+    # storing the nodes (from the primal graph) that are within the dual node, which are kept only once
+    dual_node.add_node(candidate)
 
-            if is_upstream:
-                dual_node.src_edge = eid  # new source edge id in case of upstream neighborhood
-            else:
-                dual_node.tgt_edge = eid  # new target edge id in case of downstream neighborhood
 
-        return candidate
-    return False
+def __is_adjacent__(angle_table: AngleTable, source: int, target: int):
+    """
+    This method tells whether two nodes, given by their dense indices, share a primal edge.
+    :return: bool
+    """
+
+    start, stop = angle_table.offsets[source : source + 2].tolist()
+    return target in angle_table.neighbors[start:stop].tolist()
 
 
 def __merge_streets__(
-    primal_graph: PrimalGraph, dual_node: DualGraph.Node, min_angle: float = 120.0
+    angle_table: AngleTable,
+    labels: list,
+    mapped: bytearray,
+    seed: int,
+    min_angle: float = 120.0,
+    reads: list | None = None,
 ):
     """
-    This method holds the recursive calls that grow the streets of a city in the form of a dual graph node. First, the
-    technique explores the neighborhood looking for candidates and then, it uses the best candidate to form a street.
-    :param dual_node: the dual node being expanded in the current iteration
-    :param primal_graph: a street network mapped to a PrimalGraph object
+    This method grows a street of a city, in the form of a dual graph node, starting from a seed primal edge. It keeps
+    a frontier for each end of the street (upstream and downstream) and, at every round, explores the open ends looking
+    for candidates and then uses the best candidate of each end to extend the street. An end is closed as soon as no
+    candidate satisfies the merge criteria, and it is only reopened when the opposite end moves away from one of its
+    neighbors, which is the single event that can turn a failed negotiation into a successful one.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param labels: label of each (dense) primal edge
+    :param mapped: mapping state of each (dense) primal edge, updated in place
+    :param seed: dense index of the unmapped primal edge the street starts from
     :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
-    :return: None
+    :param reads: if informed, receives the (edge, mapped) pairs read while exploring the neighborhoods
+    :return: list of merges (edge, candidate, is_upstream), in the order they happened
+    """
+
+    # setting the seed as mapped to dual
+    mapped[seed] = True
+    label = labels[seed]
+    source, target = angle_table.edge_nodes[seed].tolist()
+    src_edge = tgt_edge = seed
+
+    merges = []
+    upstream_open = downstream_open = True
+    while upstream_open or downstream_open:
+        # both ends are explored before growing any of them, so both see the same state of the street
+        upstream = (
+            __explore_neighborhood__(angle_table, labels, mapped, source, target, label, reads)
+            if upstream_open
+            else []
+        )
+        downstream = (
+            __explore_neighborhood__(angle_table, labels, mapped, target, source, label, reads)
+            if downstream_open
+            else []
+        )
+
+        # growing the street on the upstream side
+        previous_source = source
+        if upstream:
+            column = __merge_criteria__(angle_table, upstream, source, src_edge, min_angle)
+            upstream_open = column is not None
+            if upstream_open:
+                slot = angle_table.offsets[source] + column
+                src_edge = int(angle_table.edges[slot])
+                source = int(angle_table.neighbors[slot])
+                # the primal edge is now mapped and cannot be used again
+                mapped[src_edge] = True
+                merges.append((src_edge, source, True))
+        else:
+            upstream_open = False
+
+        # growing the street on the downstream side
+        previous_target = target
+        if downstream:
+            column = __merge_criteria__(angle_table, downstream, target, tgt_edge, min_angle)
+            downstream_open = column is not None
+            if downstream_open:
+                slot = angle_table.offsets[target] + column
+                tgt_edge = int(angle_table.edges[slot])
+                target = int(angle_table.neighbors[slot])
+                # the primal edge is now mapped and cannot be used again
+                mapped[tgt_edge] = True
+                merges.append((tgt_edge, target, False))
+        else:
+            downstream_open = False
+
+        # a closed end was negotiated without its former opposite end, which now becomes a candidate
+        if not upstream_open and target != previous_target:
+            upstream_open = __is_adjacent__(angle_table, source, previous_target)
+        if not downstream_open and source != previous_source:
+            downstream_open = __is_adjacent__(angle_table, target, previous_source)
+
+    return merges
+
+
+def __negotiate_streets__(angle_table: AngleTable, labels: list, min_angle: float, seeds=None):
+    """
+    This method negotiates the continuity of every street of a city, using each unmapped primal edge as a seed,
+    in the order of the dictionary of edges. The mapping state belongs to this call alone, so the primal graph is
+    never modified and can be mapped again, or by several threads at once.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param labels: label of each (dense) primal edge
+    :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
+    :param seeds: ascending dense indices of the primal edges used as seeds, all of them when not informed
+    :return: list of streets, each one given as a pair (seed, merges)
+    """
+
+    # a bitmap over the dense edge indices telling which primal edges were already merged into a street
+    mapped = bytearray(len(labels))
+
+    streets = []
+    for seed in range(len(labels)) if seeds is None else seeds:
+        if not mapped[seed]:
+            # growing the street from the unmapped primal edge, checking the upstream and downstream neighbors
+            streets.append((seed, __merge_streets__(angle_table, labels, mapped, seed, min_angle)))
+
+    return streets
+
+
+def __negotiate_partition__(seeds: list):
+    """
+    This method negotiates the streets grown from a partition of seeds inside a worker process.
+    :param seeds: ascending dense indices of the primal edges used as seeds
+    :return: tuple with the list of streets, each one given as a pair (seed, merges), and the Stats of the worker
+    """
+
+    return in_worker(
+        __negotiate_streets__,
+        worker_state["angle_table"],
+        worker_state["labels"],
+        worker_state["min_angle"],
+        seeds,
+    )
+
+
+def __negotiate_in_parallel__(angle_table: AngleTable, labels: list, min_angle: float, jobs: int):
+    """
+    This method negotiates the streets of each street type in a pool of worker processes. Continuity is only ever
+    negotiated between streets of the same type, so each type is an independent subproblem whose streets are the
+    same as in a sequential run; merging the results by seed keeps the dual node ids deterministic.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param labels: label of each (dense) primal edge
+    :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
+    :param jobs: number of worker processes
+    :return: list of streets, each one given as a pair (seed, merges), ordered by seed
+    """
+
+    partitions = {}
+    for seed, label in enumerate(labels):
+        partitions.setdefault(label, []).append(seed)
+    if len(partitions) < 2 or jobs < 2:
+        return __negotiate_streets__(angle_table, labels, min_angle)
+
+    # the largest street types are dispatched first
+    tasks = sorted(partitions.values(), key=len, reverse=True)
+
+    with process_pool(
+        min(jobs, len(tasks)),
+        angle_table=shareable(angle_table),
+        labels=labels,
+        min_angle=min_angle,
+        profile=active() is not None,
+    ) as pool:
+        results = gather(pool.map(__negotiate_partition__, tasks))
+        streets = [street for result in results for street in result]
+
+    return sorted(streets, key=lambda street: street[0])
+
+
+def __tile_seeds__(angle_table: AngleTable, tiles: int) -> list:
+    """
+    This method splits the primal edges into spatial tiles of balanced size, using the coordinates of their source
+    nodes. The edges are first split into bands of latitude and each band is then split into cells of longitude.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param tiles: approximate number of tiles
+    :return: list with the ascending dense indices of the primal edges of each tile
+    """
+
+    m = len(angle_table.edge_nodes)
+    coordinates = angle_table.coordinates[angle_table.edge_nodes[:, 0]]
+    bands = max(1, round(math.sqrt(tiles)))
+    cells = max(1, -(-tiles // bands))
+
+    # ranking the edges by latitude to form bands, and by longitude within each band to form cells
+    band = np.empty(m, dtype=np.int64)
+    band[np.argsort(coordinates[:, 0], kind="stable")] = np.arange(m) * bands // max(m, 1)
+    order = np.lexsort((coordinates[:, 1], band))
+    band_start = np.searchsorted(band[order], band[order], side="left")
+    band_size = np.searchsorted(band[order], band[order], side="right") - band_start
+    tile = np.empty(m, dtype=np.int64)
+    tile[order] = band[order] * cells + (np.arange(m) - band_start) * cells // band_size
+
+    # grouping the edges by tile, keeping them in ascending order within each tile
+    sizes = np.bincount(tile, minlength=bands * cells)
+    partitions = np.split(np.argsort(tile, kind="stable"), np.cumsum(sizes)[:-1])
+
+    return [seeds.tolist() for seeds in partitions if len(seeds)]
+
+
+def __speculate_streets__(angle_table: AngleTable, labels: list, min_angle: float, seeds: list):
+    """
+    This method grows the streets of a tile as if no other tile existed, recording for each street the mapping state
+    of the primal edges it read. A street holds in the full network whenever those edges have the same state there.
+    Edges merged into the street itself are left out, as their state follows from the street.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param labels: label of each (dense) primal edge
+    :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
+    :param seeds: ascending dense indices of the primal edges of the tile
+    :return: list of streets, each one given as a triple (seed, merges, reads)
+    """
+
+    mapped = bytearray(len(labels))
+
+    streets = []
+    for seed in seeds:
+        if not mapped[seed]:
+            reads = []
+            merges = __merge_streets__(angle_table, labels, mapped, seed, min_angle, reads)
+            own = {seed, *(edge for edge, _, _ in merges)}
+            reads = [(edge, state) for edge, state in reads if not (state and edge in own)]
+            streets.append((seed, merges, reads))
+
+    return streets
+
+
+def __speculate_partition__(seeds: list):
+    """
+    This method speculates the streets of a tile inside a worker process.
+    :param seeds: ascending dense indices of the primal edges of the tile
+    :return: tuple with the list of streets, each one given as a triple (seed, merges, reads), and the Stats of the
+             worker
+    """
+
+    return in_worker(
+        __speculate_streets__,
+        worker_state["angle_table"],
+        worker_state["labels"],
+        worker_state["min_angle"],
+        seeds,
+    )
+
+
+def __negotiate_tiles__(
+    angle_table: AngleTable, labels: list, min_angle: float, tiles: int, jobs: int
+):
+    """
+    This method negotiates the streets of each spatial tile in a pool of worker processes and then stitches them
+    together. The streets are committed in the order of their seeds, as in a sequential run, and a street grown in a
+    tile is kept only when every primal edge it read has the same mapping state in the whole network; otherwise,
+    which happens when it crosses a tile boundary into streets of another tile, its negotiation is carried on from
+    the state of the whole network. Hence, the result is the same as the one of a sequential run.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param labels: label of each (dense) primal edge
+    :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
+    :param tiles: approximate number of tiles
+    :param jobs: number of worker processes
+    :return: list of streets, each one given as a pair (seed, merges), ordered by seed
     """
 
-    # exploring the neighborhood on the upstream side
-    upstream = __explore_neighborhood__(primal_graph, dual_node, is_upstream=True)
-    # exploring the neighborhood on the downstream side
-    downstream = __explore_neighborhood__(primal_graph, dual_node, is_upstream=False)
+    partitions = __tile_seeds__(angle_table, tiles)
+    if jobs > 1 and len(partitions) > 1:
+        with process_pool(
+            min(jobs, len(partitions)),
+            angle_table=shareable(angle_table),
+            labels=labels,
+            min_angle=min_angle,
+            profile=active() is not None,
+        ) as pool:
+            results = gather(pool.map(__speculate_partition__, partitions))
+    else:
+        results = [
+            __speculate_streets__(angle_table, labels, min_angle, seeds) for seeds in partitions
+        ]
+    speculative = {street[0]: street for result in results for street in result}
+
+    mapped = bytearray(len(labels))
+
+    streets = []
+    for seed in range(len(labels)):
+        if mapped[seed]:
+            continue
+        street = speculative.get(seed)
+        if street is not None and all(mapped[edge] == state for edge, state in street[2]):
+            # the street is the same in the whole network, so its primal edges are now mapped
+            merges = street[1]
+            mapped[seed] = True
+            for edge, _, _ in merges:
+                mapped[edge] = True
+        else:
+            # the street met another tile, so its negotiation continues from the state of the whole network
+            merges = __merge_streets__(angle_table, labels, mapped, seed, min_angle)
+        streets.append((seed, merges))
+
+    return streets
+
+
+def __assemble_street__(
+    did: int, seed: int, merges: list, primal_edge, node_ids, use_label: bool = True
+) -> DualGraph.Node:
+    """
+    This method builds the dual node of a negotiated street by replaying its merges.
+    :param did: dual node index
+    :param seed: dense index of the primal edge the street started from
+    :param merges: list of merges (edge, candidate, is_upstream), in the order they happened
+    :param primal_edge: function returning the PrimalGraph.Edge at a dense index
+    :param node_ids: original id of each (dense) node index
+    :param use_label: if false, the label of the dual node is standardized as "unclassified" (ICN)
+    :return: DualGraph.Node
+    """
+
+    # using the seed primal edge to create the new dual node
+    dual_node = DualGraph.Node(did, primal_edge(seed))
+    for eid, candidate, is_upstream in merges:
+        __extend_neighborhood__(dual_node, primal_edge(eid), node_ids[candidate], is_upstream)
+    if not use_label:
+        dual_node.label = "unclassified"
+
+    return dual_node
 
-    # the code stops when there are no candidates to expand the street
-    if not len(upstream) and not len(downstream):
-        return dual_node
 
-    # growing the street on the upstream side
-    upstream_neighbor = __extend_neighborhood__(
-        primal_graph, upstream, dual_node, min_angle, is_upstream=True
+def __index_streets__(streets: list, angle_table: AngleTable) -> StreetIndex:
+    """
+    This method indexes the negotiated streets by the primal edges they hold, which are known by their dense
+    indices at this point, so no segment has to be matched with its primal edge afterwards.
+    :param streets: list of negotiated streets (seed, merges), whose position is the dual node id
+    :param angle_table: the AngleTable of the primal graph
+    :return: StreetIndex
+    """
+
+    sizes = np.fromiter((len(merges) + 1 for _, merges in streets), np.int64, len(streets))
+    edges = np.fromiter(
+        chain.from_iterable(
+            chain((seed,), (eid for eid, _, _ in merges)) for seed, merges in streets
+        ),
+        np.int64,
+        int(sizes.sum()),
     )
-    # growing the street on the downstream side
-    downstream_neighbor = __extend_neighborhood__(
-        primal_graph, downstream, dual_node, min_angle, is_upstream=False
+    owners = np.full(len(angle_table.edge_ids), -1, dtype=np.int64)
+    owners[edges] = np.repeat(np.arange(len(streets)), sizes)
+
+    # primal edges are listed in dense order, leaving out any that no street holds
+    held = np.flatnonzero(owners >= 0)
+    edge_nodes = np.asarray(angle_table.edge_nodes, dtype=np.int64).reshape(-1, 2)[held]
+    edge_ids = angle_table.edge_ids
+    edge_ids = edge_ids[held] if isinstance(edge_ids, np.ndarray) else [edge_ids[i] for i in held]
+
+    return StreetIndex(
+        owners[held],
+        edge_nodes[:, 0],
+        edge_nodes[:, 1],
+        angle_table.node_ids,
+        edge_ids,
+        angle_table.coordinates,
     )
 
-    # the code stops when no candidates satisfy the merge criteria
-    if not upstream_neighbor and not downstream_neighbor:
-        return dual_node
 
-    # if all looks good, we make a recursive call, preserving the continuity threshold
-    __merge_streets__(primal_graph, dual_node, min_angle)
+def dual_edges(dual_graph: DualGraph | CompactDualGraph, shared_nodes: bool = False) -> tuple:
+    """
+    This method finds every pair of dual nodes that share at least one primal node, i.e., every pair of intersecting
+    streets, along with the number of primal nodes they share (the multiplicity of the dual edge). It works on flat
+    arrays of (primal node, dual node) memberships, so no Python object is created per pair, and the cost of a hub
+    grows with the number of pairs it yields rather than with nested loops over its streets.
+    :param dual_graph: a DualGraph or CompactDualGraph, whose dictionary of edges is not read
+    :param shared_nodes: if true, the ids of the primal nodes shared by each pair are returned as well
+    :return: tuple with the (k, 2) array of dual node ids, where pairs are sorted and the first id is the lowest,
+             and the array with the number of primal nodes each pair shares; when shared_nodes is true, these are
+             followed by the offsets and the ids of the shared primal nodes, where pair i shares the primal nodes
+             ids[offsets[i]:offsets[i + 1]]
+    """
 
+    if isinstance(dual_graph, CompactDualGraph):
+        dids = np.asarray(dual_graph.dids, dtype=np.int64)
+        sizes = np.diff(dual_graph.node_offsets)
+        codes = np.asarray(dual_graph.nodes, dtype=np.int64)
+        table = dual_graph.node_table
+    else:
+        dual_nodes = dual_graph.node_dictionary.values()
+        dids = np.fromiter(dual_graph.node_dictionary, np.int64, len(dual_nodes))
+        sizes = np.fromiter((len(node.nodes) for node in dual_nodes), np.int64, len(dual_nodes))
+        codes, table = __factorize__(chain.from_iterable(node.nodes for node in dual_nodes))
+        codes = codes.astype(np.int64)
+
+    # dual nodes are ranked by id, so pairs of ranks sort as pairs of ids
+    n = len(dids)
+    order = np.argsort(dids, kind="stable")
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    streets = np.repeat(rank, sizes)
+
+    # memberships grouped by primal node, with the streets of each group in ascending order and without repetitions
+    members = np.lexsort((streets, codes))
+    codes, streets = codes[members], streets[members]
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = (codes[1:] != codes[:-1]) | (streets[1:] != streets[:-1])
+    codes, streets = codes[first], streets[first]
+
+    # each member of a group is paired with every member after it, i.e., the streets meeting at the same primal node
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    group_sizes = np.diff(np.r_[starts, len(codes)])
+    after = np.repeat(starts + group_sizes, group_sizes) - np.arange(len(codes)) - 1
+    left = np.repeat(np.arange(len(codes)), after)
+    right = left + np.arange(len(left)) - np.repeat(np.cumsum(after) - after, after) + 1
+
+    stats = active()
+    if stats is not None:
+        for streets_at, count in enumerate(np.bincount(group_sizes).tolist()):
+            if count:
+                stats.fan_out[streets_at] = stats.fan_out.get(streets_at, 0) + count
+
+    # a pair of streets meeting at several primal nodes is a single dual edge, weighted by the number of nodes
+    keys = streets[left] * n + streets[right]
+    unique, weights = np.unique(keys, return_counts=True)
+    pairs = dids[order][np.column_stack((unique // max(n, 1), unique % max(n, 1)))]
+    if not shared_nodes:
+        return pairs, weights
+
+    if isinstance(table, list):
+        try:
+            table = __table__(table)
+        except TypeError:
+            # ids other than integers and strings are kept as they are
+            table = np.fromiter(table, dtype=object, count=len(table))
+    offsets = np.concatenate(([0], np.cumsum(weights))).astype(np.int64)
+    shared = table[codes[left[np.argsort(keys, kind="stable")]]]
+    return pairs, weights, offsets, shared
+
+
+def __link_streets__(dual_graph: DualGraph):
+    """
+    This method populates the dictionary of edges of a dual graph, linking every pair of dual nodes that share a
+    primal node, with edge ids following the sorted order of the pairs.
+    :return: None
+    """
 
-def dual_mapper(primal_graph: PrimalGraph, min_angle: float = 120.0):
+    # [INFO] whenever a node of the primal graph appears at the same time in two or
+    # ... more nodes of the dual graph, it means that there is an intersection
+    # ... between the streets and a link between two nodes in the dual graph.
+    pairs, _ = dual_edges(dual_graph)
+    dual_graph.edge_dictionary.update(enumerate(map(tuple, pairs.tolist())))
+
+
+@timed("dual_mapper")
+def dual_mapper(
+    primal_graph: PrimalGraph | CompactPrimalGraph,
+    min_angle: float = 120.0,
+    use_label: bool = True,
+    angle_table: AngleTable | None = None,
+    jobs: int = 1,
+    tiles: int = 1,
+    engine: str = "seed",
+):
     """
     This is a straightforward method, which is capable of mapping a PrimalGraph object into a DualGraph one.
     The method maps the streets of the cities to nodes and the intersections among them to edges.
-    :param primal_graph: a street network mapped to a PrimalGraph object
+    The primal graph is left untouched, so the same object can be mapped many times (and concurrently).
+    :param primal_graph: a street network mapped to a PrimalGraph or CompactPrimalGraph object
     :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
+    :param use_label: if true, continuity is only negotiated between streets of the same type (HICN)
+                      otherwise, streets' type is ignored and standardized as "unclassified" (ICN)
+    :param angle_table: the AngleTable of the primal graph, which is computed when not informed
+    :param jobs: number of worker processes; with HICN, each street type is negotiated in parallel
+    :param tiles: if greater than one, the network is split into about this many spatial tiles, which are
+                  negotiated in parallel and stitched together at their boundaries
+    :param engine: "seed" grows one street at a time from seeds taken in the order of the dictionary of edges;
+                   "matching" pairs the segments at every intersection on its own, as long as each one is the best
+                   continuation of the other, and joins the pairs into streets (see matching.__match_streets__),
+                   with the jobs pairing the intersections in parallel; tiles only apply to the seed engine
     :return: DualGraph
     """
 
+    if engine not in ("seed", "matching"):
+        raise ValueError(f"Unknown engine: {engine!r}; expected 'seed' or 'matching'.")
+    if engine == "matching" and tiles > 1:
+        raise ValueError("Tiles only apply to the seed engine.")
+
     # creating an empty dual graph
     dual_graph = DualGraph()
 
-    nid = 0
+    # computing every continuity angle of the primal graph at once, so no trigonometry runs while merging
+    if angle_table is None:
+        angle_table = AngleTable().build_table(primal_graph)
+
+    # the negotiation works on dense indices, following the order of the dictionary of edges
+    if isinstance(primal_graph, CompactPrimalGraph):
+        primal_edge = primal_graph.edge
+        labels = primal_graph.labels.tolist()
+        node_ids = primal_graph.node_ids.tolist()
+    else:
+        primal_edge = list(primal_graph.edge_dictionary.values()).__getitem__
+        labels = [primal_edge(eid).label for eid in range(len(angle_table.edge_ids))]
+        node_ids = angle_table.node_ids
+
+    # when using the ICN instead of the HICN all labels are standardized
+    if not use_label:
+        labels = [0] * len(labels)
+
+    # negotiating the streets, splitting them by tile or street type across worker processes when requested
+    with stage("negotiation"):
+        if engine == "matching":
+            from street_continuity.matching import __match_streets__
+
+            streets = __match_streets__(angle_table, labels, min_angle, jobs)
+        elif tiles > 1:
+            streets = __negotiate_tiles__(angle_table, labels, min_angle, tiles, jobs)
+        elif jobs > 1:
+            streets = __negotiate_in_parallel__(angle_table, labels, min_angle, jobs)
+        else:
+            streets = __negotiate_streets__(angle_table, labels, min_angle)
+
+    stats = active()
+    if stats is not None:
+        stats.streets += len(streets)
+        longest = max((len(merges) + 1 for _, merges in streets), default=0)
+        stats.max_street_segments = max(stats.max_street_segments, longest)
+
     # populating nodes' dictionary
-    for eid in primal_graph.edge_dictionary:
-        primal_edge = primal_graph.edge_dictionary[eid]
-        if not primal_edge.mapped:
-            # setting the primal edge as mapped to dual
-            primal_edge.mapped = True
-            # using the unmapped primal edge as the seed of the new dual node
-            dual_node = dual_graph.Node(nid, primal_edge)
-            # checking the upstream and downstream neighbors for street continuity
-            __merge_streets__(primal_graph, dual_node, min_angle)
-            # storing the resulting node in the node dictionary
-            dual_graph.node_dictionary[nid] = dual_node
-            # incrementing nodes' index
-            nid += 1
+    with stage("assembly"):
+        for nid, (seed, merges) in enumerate(streets):
+            dual_graph.node_dictionary[nid] = __assemble_street__(
+                nid, seed, merges, primal_edge, node_ids, use_label
+            )
 
     # populating edges' dictionary
-    # [INFO] whenever a node of the primal graph appears at the same time in two or
-    # ... more nodes of the dual graph, it means that there is an intersection
-    # ... between the streets and a link between two nodes in the dual graph.
-    # We invert the mapping (primal node -> dual nodes) so that intersections are
-    # found in roughly linear time instead of comparing every pair of dual nodes.
-    primal_to_dual = {}
-    for did, dual_node in dual_graph.node_dictionary.items():
-        for primal_node in set(dual_node.nodes):
-            primal_to_dual.setdefault(primal_node, []).append(did)
-
-    dual_edges = set()
-    for dual_nodes in primal_to_dual.values():
-        for i in range(len(dual_nodes)):
-            for j in range(i + 1, len(dual_nodes)):
-                sid, tid = dual_nodes[i], dual_nodes[j]
-                dual_edges.add((sid, tid) if sid < tid else (tid, sid))
-
-    for eid, edge in enumerate(sorted(dual_edges)):
-        dual_graph.edge_dictionary[eid] = edge
+    with stage("linking"):
+        __link_streets__(dual_graph)
+
+    # indexing the streets by primal node, primal edge and location, whose lookups are prepared on first query
+    with stage("indexing"):
+        dual_graph.index = __index_streets__(streets, angle_table)
 
     return dual_graph
+
+
+def dual_sweep(
+    primal_graph: PrimalGraph | CompactPrimalGraph,
+    min_angles: list,
+    methods: list = ("hicn",),
+    jobs: int = 1,
+    tiles: int = 1,
+    angle_table: AngleTable | None = None,
+    engine: str = "seed",
+):
+    """
+    This method maps the same primal graph into one DualGraph per combination of continuity threshold and algorithm.
+    The primal graph is loaded and indexed once, and the AngleTable is shared by every run. For the ICN runs, the
+    streets' type is ignored, so the primal graph should be loaded with labels whenever HICN is also requested.
+    :param primal_graph: a street network mapped to a PrimalGraph or CompactPrimalGraph object
+    :param min_angles: list of minimum angles ]0.0, 180.0] that define the continuity of two consecutive streets
+    :param methods: list of algorithms, each one either "icn" or "hicn"
+    :param jobs: number of worker processes used by each run
+    :param tiles: approximate number of spatial tiles of each run, see dual_mapper
+    :param angle_table: the AngleTable of the primal graph, which is computed when not informed
+    :param engine: engine negotiating the streets of each run, see dual_mapper
+    :return: dictionary mapping each (method, min_angle) pair to its DualGraph
+    """
+
+    for method in methods:
+        if method not in ("icn", "hicn"):
+            raise ValueError(f"Unknown method: {method!r}; expected 'icn' or 'hicn'.")
+
+    # the geometry does not depend on the threshold nor on the algorithm
+    if angle_table is None:
+        angle_table = AngleTable().build_table(primal_graph)
+
+    return {
+        (method, min_angle): dual_mapper(
+            primal_graph,
+            min_angle,
+            use_label=method == "hicn",
+            angle_table=angle_table,
+            jobs=jobs,
+            tiles=tiles,
+            engine=engine,
+        )
+        for method in methods
+        for min_angle in min_angles
+    }
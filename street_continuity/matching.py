@@ -0,0 +1,204 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+
+
+from itertools import chain, zip_longest
+
+import numpy as np
+
+from street_continuity.compact import __factorize__
+from street_continuity.pool import gather, in_worker, process_pool, shareable, worker_state
+from street_continuity.stats import active
+from street_continuity.table import AngleTable
+
+
+def __best_slots__(
+    angle_table: AngleTable, labels: np.ndarray, min_angle: float, first: int, last: int
+) -> np.ndarray:
+    """
+    This method finds, for every adjacency slot of a range of nodes, the slot of the same node that continues it
+    best, i.e., whose edge has the same label and forms the widest angle with it, as long as that angle reaches the
+    threshold. Ties go to the first slot in adjacency order, as in the negotiation of the seed engine. The blocks of
+    angles of the nodes are read as they are, so every slot of the range is paired in a few array operations.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param labels: label code of each (dense) primal edge
+    :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
+    :param first: dense index of the first node of the range
+    :param last: dense index past the last node of the range
+    :return: array with the best slot of each slot of the range, or -1 where no slot continues it
+    """
+
+    offsets, edges = angle_table.offsets, angle_table.edges
+    start, stop = angle_table.pair_offsets[[first, last]].tolist()
+    degrees = np.diff(offsets[first : last + 1])
+    best = np.full(int(offsets[last] - offsets[first]), -1, dtype=np.int64)
+
+    # the incoming slot (row) and the outgoing slot (column) of every pair of slots of the range
+    owners = np.repeat(np.arange(first, last, dtype=np.int64), degrees**2)
+    local = np.arange(stop - start, dtype=np.int64) - (angle_table.pair_offsets[owners] - start)
+    width = degrees[owners - first]
+    rows = offsets[owners] + local // width
+    columns = offsets[owners] + local % width
+    angles = angle_table.angles[start:stop]
+
+    stats = active()
+    if stats is not None:
+        stats.angle_evaluations += stop - start
+
+    # a slot below the threshold would never win, so the candidates are filtered before the best one is taken
+    valid = (rows != columns) & (angles >= min_angle)
+    valid &= labels[edges[rows]] == labels[edges[columns]]
+    rows, columns, angles = rows[valid], columns[valid], angles[valid]
+    if not len(rows):
+        return best
+
+    # pairs come sorted by row and then by column, so the first pair reaching the maximum of its row wins
+    starts = np.flatnonzero(np.diff(rows, prepend=-1))
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(rows))))
+    winners = angles == np.maximum.reduceat(angles, starts)[group]
+    _, first_winners = np.unique(group[winners], return_index=True)
+    best[rows[winners][first_winners] - offsets[first]] = columns[winners][first_winners]
+
+    return best
+
+
+def __best_partition__(bounds: tuple):
+    """
+    This method finds the best slots of a range of nodes inside a worker process.
+    :param bounds: dense indices of the first node of the range and past its last node
+    :return: tuple with the result of __best_slots__ and the Stats of the worker
+    """
+
+    return in_worker(
+        __best_slots__,
+        worker_state["angle_table"],
+        worker_state["labels"],
+        worker_state["min_angle"],
+        *bounds,
+    )
+
+
+def __pair_segments__(angle_table: AngleTable, labels: np.ndarray, min_angle: float, jobs: int = 1):
+    """
+    This method pairs the segments that meet at each intersection, two segments being paired when each one is the
+    best continuation of the other (see __best_slots__). As every intersection is paired on its own, the nodes are
+    split into ranges of about the same number of angles, which are paired by worker processes when requested.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param labels: label code of each (dense) primal edge
+    :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
+    :param jobs: number of worker processes
+    :return: tuple with the arrays of paired slots, each pair being listed once, with the lowest slot first
+    """
+
+    n = len(angle_table.offsets) - 1
+    count = jobs * 4 if jobs > 1 else 1
+    cuts = np.searchsorted(
+        angle_table.pair_offsets, np.linspace(0, angle_table.pair_offsets[-1], count + 1)
+    )
+    cuts = np.unique(np.clip(np.concatenate(([0], cuts[1:-1], [n])), 0, n))
+    ranges = list(zip(cuts[:-1].tolist(), cuts[1:].tolist()))
+
+    if jobs > 1 and len(ranges) > 1:
+        with process_pool(
+            min(jobs, len(ranges)),
+            angle_table=shareable(angle_table),
+            labels=labels,
+            min_angle=min_angle,
+            profile=active() is not None,
+        ) as pool:
+            parts = gather(pool.map(__best_partition__, ranges))
+    else:
+        parts = [__best_slots__(angle_table, labels, min_angle, *bounds) for bounds in ranges]
+    best = np.concatenate([np.zeros(0, dtype=np.int64), *parts])
+
+    # a pair holds when each slot is the best continuation of the other
+    slots = np.flatnonzero(best > np.arange(len(best)))
+    mutual = best[best[slots]] == slots
+    return slots[mutual], best[slots[mutual]]
+
+
+def __union_find__(size: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """
+    This method finds the connected components of a graph given by its links, with a union-find over arrays: at
+    every round, the root of each link hooks onto the lowest root of the two, and the parents are then shortcut
+    until each one is a root. Rounds go on until every link joins nodes of the same root, which takes a number of
+    rounds logarithmic in the size of the largest component.
+    :param size: number of nodes
+    :param left: array with the first node of each link
+    :param right: array with the second node of each link
+    :return: array with the root of each node, which is the lowest node of its component
+    """
+
+    parent = np.arange(size, dtype=np.int64)
+    while True:
+        roots = parent[left], parent[right]
+        low, high = np.minimum(*roots), np.maximum(*roots)
+        hooked = low != high
+        if not hooked.any():
+            return parent
+        np.minimum.at(parent, high[hooked], low[hooked])
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+def __match_streets__(angle_table: AngleTable, labels: list, min_angle: float, jobs: int = 1):
+    """
+    This method maps the streets of a city by pairing the segments at every intersection on its own and joining the
+    pairs with a union-find. A segment is paired at most once at each of its ends, so every component is a path (or
+    a ring) of segments, which is then walked from its lowest segment, as the seed engine would have grown it. Unlike
+    the seed engine, the result does not depend on the order of the edges (apart from ties of angles), since a pair
+    needs the consent of both segments, rather than the choice of the street that reached the intersection first.
+    :param angle_table: the AngleTable of the street network being mapped
+    :param labels: label of each (dense) primal edge
+    :param min_angle: the minimum angle ]0.0, 180.0] that defines the continuity of two consecutive streets
+    :param jobs: number of worker processes pairing the segments
+    :return: list of streets, each one given as a pair (seed, merges), ordered by seed
+    """
+
+    m = len(labels)
+    codes, _ = __factorize__(labels)
+    slots, partners = __pair_segments__(angle_table, codes, min_angle, jobs)
+    left, right = (
+        angle_table.edges[slots].astype(np.int64),
+        angle_table.edges[partners].astype(np.int64),
+    )
+    roots = __union_find__(m, left, right)
+
+    # the segment each segment is paired with at its source (0) and at its target (1) end
+    owners = np.searchsorted(angle_table.offsets, slots, side="right") - 1
+    edge_nodes = angle_table.edge_nodes.astype(np.int64)
+    links = np.full((m, 2), -1, dtype=np.int64)
+    links[left, (edge_nodes[left, 1] == owners).astype(np.int64)] = right
+    links[right, (edge_nodes[right, 1] == owners).astype(np.int64)] = left
+
+    links, ends = links.tolist(), edge_nodes.tolist()
+    used = bytearray(m)
+
+    def walk(edge: int, side: int, is_upstream: bool) -> list:
+        # following the pairs from one end of the seed, until the path ends or comes back to the seed
+        merges = []
+        while True:
+            node = ends[edge][side]
+            edge = links[edge][side]
+            if edge < 0 or used[edge]:
+                return merges
+            used[edge] = True
+            side = 1 if ends[edge][0] == node else 0
+            merges.append((edge, ends[edge][side], is_upstream))
+
+    streets = []
+    for seed in np.flatnonzero(roots == np.arange(m)).tolist():
+        used[seed] = True
+        downstream = walk(seed, 1, False)
+        upstream = walk(seed, 0, True)
+        # as in the seed engine, every round merges upstream first and downstream next
+        merges = [merge for merge in chain(*zip_longest(upstream, downstream)) if merge is not None]
+        streets.append((seed, merges))
+
+    return streets
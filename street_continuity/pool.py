@@ -0,0 +1,98 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from street_continuity.stats import active, profile
+from street_continuity.table import AngleTable
+
+# state shared by the tasks that run inside a worker process, read by their entry points
+worker_state = {}
+_pool_lock = threading.Lock()
+
+
+def _init_worker(state: dict):
+    """
+    This method stores, once per worker process, the state shared by all the tasks it runs.
+    :return: None
+    """
+
+    worker_state.update(state)
+
+
+@contextmanager
+def process_pool(jobs: int, **state):
+    """
+    This method opens a pool of worker processes sharing the given state. Where processes can be forked, the workers
+    inherit the state from the parent without copying it; otherwise, it is sent once to each worker.
+    :param jobs: number of worker processes
+    :return: ProcessPoolExecutor
+    """
+
+    with _pool_lock:
+        try:
+            if "fork" in multiprocessing.get_all_start_methods():
+                worker_state.update(state)
+                pool = ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("fork"))
+            else:
+                pool = ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(state,))
+            with pool:
+                yield pool
+        finally:
+            worker_state.clear()
+
+
+def shareable(angle_table: AngleTable) -> AngleTable:
+    """
+    This method returns a view of an AngleTable holding only the arrays the negotiation needs.
+    :return: AngleTable
+    """
+
+    shared = AngleTable()
+    for attribute in (
+        "offsets",
+        "neighbors",
+        "edges",
+        "edge_nodes",
+        "edge_slots",
+        "pair_offsets",
+        "angles",
+    ):
+        setattr(shared, attribute, getattr(angle_table, attribute))
+
+    return shared
+
+
+def in_worker(function, *args):
+    """
+    This method runs a function inside a worker process, profiling it whenever the parent process was profiling.
+    :return: tuple with the result of the function and its Stats, or None when not profiling
+    """
+
+    if not worker_state.get("profile"):
+        return function(*args), None
+    with profile() as stats:
+        return function(*args), stats
+
+
+def gather(results) -> list:
+    """
+    This method collects the results of worker processes, adding their Stats to the ones being collected, if any.
+    :return: list of results
+    """
+
+    stats = active()
+    gathered = []
+    for result, worker_stats in results:
+        if worker_stats is not None and stats is not None:
+            stats.merge(worker_stats)
+        gathered.append(result)
+
+    return gathered
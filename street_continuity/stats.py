@@ -0,0 +1,148 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+
+
+import json
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# statistics being collected, or None when profiling is disabled (see active)
+_active = None
+
+
+class Stats:
+    """
+    This class gathers the measurements of a profiled run: the wall time of each stage of the pipeline and the
+    counters of its hot paths. Stages are timed inclusively, so the time of a stage that runs inside another one
+    (e.g., build_graph inside read_csv) is also part of the time of the outer stage.
+    """
+
+    def __init__(self):
+        self.seconds = {}  # [dict] wall time (in seconds) of each stage, summed over its calls;
+        self.calls = {}  # [dict] number of calls of each stage;
+        self.angle_evaluations = 0  # [integer] continuity angles compared by the merge criteria;
+        self.candidates = {}  # [dict] number of negotiations per size of their candidate set;
+        self.streets = 0  # [integer] number of streets (dual nodes) negotiated;
+        self.max_street_segments = 0  # [integer] primal edges of the longest street; and,
+        self.fan_out = {}  # [dict] number of primal nodes per count of streets meeting at them.
+
+    def add_time(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def merge(self, other: "Stats"):
+        """
+        This method adds the measurements of another Stats object, e.g., one collected inside a worker process.
+        :return: Stats
+        """
+
+        for stage, seconds in other.seconds.items():
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + other.calls[stage]
+        for size, count in other.candidates.items():
+            self.candidates[size] = self.candidates.get(size, 0) + count
+        for streets, count in other.fan_out.items():
+            self.fan_out[streets] = self.fan_out.get(streets, 0) + count
+        self.angle_evaluations += other.angle_evaluations
+        self.streets += other.streets
+        self.max_street_segments = max(self.max_street_segments, other.max_street_segments)
+        return self
+
+    def to_dict(self) -> dict:
+        """
+        This method returns the measurements as plain, JSON-compatible types, with histograms sorted by their keys.
+        :return: dict
+        """
+
+        return {
+            "seconds": self.seconds,
+            "calls": self.calls,
+            "angle_evaluations": self.angle_evaluations,
+            "negotiations": sum(self.candidates.values()),
+            "candidates": {str(size): self.candidates[size] for size in sorted(self.candidates)},
+            "streets": self.streets,
+            "max_street_segments": self.max_street_segments,
+            "max_fan_out": max(self.fan_out, default=0),
+            "fan_out": {str(streets): self.fan_out[streets] for streets in sorted(self.fan_out)},
+        }
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+@contextmanager
+def profile(stats: Stats | None = None):
+    """
+    This method enables the instrumentation of the pipeline while its block runs, collecting into the given Stats
+    object (or into a new one). When no block is active, the instrumented code only checks that profiling is off.
+    :param stats: Stats object receiving the measurements
+    :return: Stats
+    """
+
+    global _active
+
+    stats = Stats() if stats is None else stats
+    previous, _active = _active, stats
+    try:
+        yield stats
+    finally:
+        _active = previous
+
+
+def active() -> Stats | None:
+    """
+    This method returns the Stats being collected by the innermost profile() block, which the instrumented code
+    checks before measuring anything.
+    :return: Stats, or None when profiling is disabled
+    """
+
+    return _active
+
+
+@contextmanager
+def stage(name: str):
+    """
+    This method times its block as a stage of the pipeline whenever profiling is enabled.
+    :param name: name of the stage
+    :return: None
+    """
+
+    stats = _active
+    if stats is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_time(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """
+    This method decorates a function so that each of its calls is timed as a stage of the pipeline whenever profiling
+    is enabled.
+    :param name: name of the stage
+    :return: decorator
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            stats = _active
+            if stats is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.add_time(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,366 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+
+
+import numpy as np
+
+from street_continuity.compact import CompactPrimalGraph
+from street_continuity.graph import PrimalGraph
+from street_continuity.stats import timed
+from street_continuity.util import compute_angles
+
+
+class AngleTable:
+    """
+    This class stores the continuity angle of every pair of primal edges that meet at an intersection.
+    Nodes and edges are remapped to dense indices and the adjacency list is flattened into offset arrays,
+    so that all angles are computed in a single vectorized pass and read back in constant time.
+    """
+
+    def __init__(self):
+        self.node_ids = []  # [list] original id of each (dense) node index;
+        self.node_index = {}  # [dict] dense index of each original node id;
+        self.edge_ids = []  # [list] original id of each (dense) edge index;
+        self.edge_index = {}  # [dict] dense index of each original edge id;
+        self.coordinates = np.zeros((0, 2), dtype=np.float64)  # [array] (lat, lon) of each node;
+        self.offsets = np.zeros(1, dtype=np.int64)  # [array] slots of node i, offsets[i]:[i + 1];
+        self.neighbors = np.zeros(0, dtype=np.int64)  # [array] node reached through each slot;
+        self.edges = np.zeros(0, dtype=np.int64)  # [array] edge stored in each adjacency slot;
+        self.edge_nodes = np.zeros((0, 2), dtype=np.int64)  # [array] (source, target) of each edge;
+        self.edge_slots = np.zeros((0, 2), dtype=np.int64)  # [array] column of the far endpoint;
+        self.pair_offsets = np.zeros(1, dtype=np.int64)  # [array] first angle of each block; and,
+        self.angles = np.zeros(0, dtype=np.float64)  # [array] angles of each pair of slots.
+        self.__buffers = {}  # buffers of doubling capacity the arrays grow into (see update_nodes)
+        self.__retired = []  # dense indices left behind by the nodes moved by update_nodes
+
+    @timed("angle_table")
+    def build_table(self, primal_graph: PrimalGraph | CompactPrimalGraph):
+        """
+        This method computes the angle table of a primal graph whose adjacency list was already built.
+        Slots follow the order of the adjacency list, so the negotiation visits candidates in the same order.
+        Each node of degree d owns a (d x d) block of angles, where row i is the column of the node at the
+        far end of the incoming edge and column j is the candidate neighbor, as in compute_angle(j, node, i).
+        A CompactPrimalGraph already holds its adjacency list in this form, so its arrays are shared as they are.
+        :param primal_graph: a street network mapped to a PrimalGraph or CompactPrimalGraph object
+        :return: AngleTable
+        """
+
+        if isinstance(primal_graph, CompactPrimalGraph):
+            self.__share(primal_graph)
+        else:
+            self.coordinates = self.__flatten(primal_graph)
+        coordinates = self.coordinates
+
+        # locating the column each endpoint of every edge occupies in the adjacency of the other endpoint
+        n = len(self.node_ids)
+        degrees = np.diff(self.offsets)
+        owners = np.repeat(np.arange(n, dtype=np.int64), degrees)
+        keys = owners * n + self.neighbors
+        order = np.argsort(keys, kind="stable")
+        columns = np.arange(len(owners), dtype=np.int64) - self.offsets[owners]
+        sources = self.edge_nodes[:, 0].astype(np.int64)
+        targets = self.edge_nodes[:, 1].astype(np.int64)
+        self.edge_slots = np.stack(
+            (
+                columns[order[np.searchsorted(keys[order], sources * n + targets)]],
+                columns[order[np.searchsorted(keys[order], targets * n + sources)]],
+            ),
+            axis=1,
+        )
+
+        # enumerating every (incoming, outgoing) pair of slots of every node
+        self.pair_offsets = np.concatenate(([0], np.cumsum(degrees**2))).astype(np.int64)
+        pair_owners = np.repeat(np.arange(n, dtype=np.int64), degrees**2)
+        local = np.arange(self.pair_offsets[-1], dtype=np.int64) - self.pair_offsets[pair_owners]
+        rows = self.offsets[pair_owners] + local // degrees[pair_owners]
+        cols = self.offsets[pair_owners] + local % degrees[pair_owners]
+
+        # computing all angles in a single vectorized pass
+        self.angles = compute_angles(
+            coordinates[self.neighbors[cols]],  # coordinates of the candidate neighbor
+            coordinates[pair_owners],  # coordinates of the intersection (negotiator)
+            coordinates[self.neighbors[rows]],  # coordinates of the far end of the incoming edge
+        )
+
+        return self
+
+    def restore_table(
+        self,
+        primal_graph: CompactPrimalGraph,
+        edge_slots: np.ndarray,
+        pair_offsets: np.ndarray,
+        angles: np.ndarray,
+    ):
+        """
+        This method rebuilds the angle table of a CompactPrimalGraph from arrays computed beforehand by build_table,
+        such as the ones kept in a cache, so that no angle is computed again.
+        :param primal_graph: the CompactPrimalGraph the arrays were computed for
+        :param edge_slots: column of the opposite endpoint of each edge, as in the edge_slots attribute
+        :param pair_offsets: first angle of each node's block, as in the pair_offsets attribute
+        :param angles: angles of every pair of slots of a node, as in the angles attribute
+        :return: AngleTable
+        """
+
+        self.__share(primal_graph)
+        self.edge_slots = edge_slots
+        self.pair_offsets = pair_offsets
+        self.angles = angles
+
+        return self
+
+    def __share(self, primal_graph: CompactPrimalGraph):
+        """
+        This method takes the ids, coordinates and CSR adjacency list of a CompactPrimalGraph as they are.
+        :return: None
+        """
+
+        self.node_ids = primal_graph.node_ids
+        self.edge_ids = primal_graph.edge_ids
+        self.node_index, self.edge_index = {}, {}
+        self.offsets = primal_graph.offsets
+        self.neighbors = primal_graph.neighbors
+        self.edges = primal_graph.edges
+        self.edge_nodes = np.stack((primal_graph.sources, primal_graph.targets), axis=1)
+        self.coordinates = primal_graph.coordinates
+
+    def __flatten(self, primal_graph: PrimalGraph) -> np.ndarray:
+        """
+        This method remaps the ids of a dictionary-based PrimalGraph into dense indices and flattens its adjacency
+        list into offsets, neighbors and edges.
+        :return: array with the coordinates of each dense node index
+        """
+
+        graph = primal_graph.graph
+
+        # remapping node and edge ids into dense indices
+        self.node_ids = list(graph)
+        self.node_index = {nid: index for index, nid in enumerate(self.node_ids)}
+        self.edge_ids = list(primal_graph.edge_dictionary)
+        self.edge_index = {eid: index for index, eid in enumerate(self.edge_ids)}
+
+        # flattening the adjacency list into offsets, neighbors and edges
+        n = len(self.node_ids)
+        degrees = np.fromiter((len(adjacency) for adjacency in graph.values()), np.int64, n)
+        self.offsets = np.concatenate(([0], np.cumsum(degrees))).astype(np.int64)
+        size = int(self.offsets[-1])
+        self.neighbors = np.fromiter(
+            (self.node_index[nbr] for adjacency in graph.values() for nbr in adjacency),
+            np.int64,
+            size,
+        )
+        self.edges = np.fromiter(
+            (self.edge_index[eid] for adjacency in graph.values() for eid in adjacency.values()),
+            np.int64,
+            size,
+        )
+        self.edge_nodes = np.fromiter(
+            (
+                self.node_index[node]
+                for edge in primal_graph.edge_dictionary.values()
+                for node in (edge.source, edge.target)
+            ),
+            np.int64,
+            2 * len(self.edge_ids),
+        ).reshape(-1, 2)
+
+        return np.array(
+            [primal_graph.node_dictionary[nid] for nid in self.node_ids], dtype=np.float64
+        ).reshape(-1, 2)
+
+    def update_nodes(self, adjacencies: dict, edge_nodes: dict, coordinates: dict):
+        """
+        This method replaces the adjacency of some nodes of a table built from a dictionary-based PrimalGraph, as
+        needed when primal edges are inserted, removed or modified. The nodes move to fresh dense indices at the end
+        of the table, whose slots and angles are computed for them alone, and the slots of their unchanged neighbors
+        are renamed accordingly. The arrays grow into buffers of doubling capacity, so an update costs as much as
+        the nodes it changes; the old indices are retired, to be reclaimed by compact.
+        New edges must be registered in edge_ids and edge_index beforehand.
+        :param adjacencies: new adjacency of each changed node id, as an ordered dictionary {neighbor id: edge id}
+        :param edge_nodes: (source id, target id) of every edge incident to the changed nodes
+        :param coordinates: (latitude, longitude) of each changed node id
+        :return: AngleTable
+        """
+
+        # moving the changed nodes to fresh dense indices, retiring the old ones (and those of the nodes left alone)
+        previous = {nid: self.node_index.pop(nid, None) for nid in adjacencies}
+        self.__retired.extend(index for index in previous.values() if index is not None)
+        changed = [nid for nid, adjacency in adjacencies.items() if adjacency]
+        for nid in changed:
+            self.node_index[nid] = len(self.node_ids)
+            self.node_ids.append(nid)
+
+        # appending the slots of the changed nodes
+        n = len(self.offsets) - 1
+        degrees = np.fromiter((len(adjacencies[nid]) for nid in changed), np.int64, len(changed))
+        total = int(degrees.sum())
+        self.__append("offsets", self.offsets[-1] + np.cumsum(degrees))
+        self.__append(
+            "neighbors",
+            np.fromiter(
+                (self.node_index[nbr] for nid in changed for nbr in adjacencies[nid]),
+                np.int64,
+                total,
+            ),
+        )
+        self.__append(
+            "edges",
+            np.fromiter(
+                (self.edge_index[eid] for nid in changed for eid in adjacencies[nid].values()),
+                np.int64,
+                total,
+            ),
+        )
+        self.__append(
+            "coordinates",
+            np.array([coordinates[nid] for nid in changed], dtype=np.float64).reshape(-1, 2),
+        )
+
+        # renaming the changed nodes in the slots of their unchanged neighbors
+        for nid in changed:
+            if previous[nid] is None:
+                continue
+            for nbr in adjacencies[nid]:
+                if nbr not in adjacencies:
+                    index = self.node_index[nbr]
+                    start, stop = self.offsets[index : index + 2].tolist()
+                    slots = self.neighbors[start:stop]
+                    slots[slots == previous[nid]] = self.node_index[nid]
+
+        # locating the endpoints of the edges around the changed nodes, and their columns
+        added = len(self.edge_ids) - len(self.edge_nodes)
+        self.__append("edge_nodes", np.zeros((added, 2), dtype=self.edge_nodes.dtype))
+        self.__append("edge_slots", np.zeros((added, 2), dtype=self.edge_slots.dtype))
+        for eid, (source, target) in edge_nodes.items():
+            index = self.edge_index[eid]
+            source, target = self.node_index[source], self.node_index[target]
+            self.edge_nodes[index] = (source, target)
+            self.edge_slots[index] = (self.__column(source, target), self.__column(target, source))
+
+        # computing the angles of every pair of slots of the changed nodes
+        blocks = np.concatenate(([0], np.cumsum(degrees**2))).astype(np.int64)
+        self.__append("pair_offsets", self.pair_offsets[-1] + blocks[1:])
+        pair_owners = np.repeat(np.arange(len(changed), dtype=np.int64), degrees**2)
+        local = np.arange(blocks[-1], dtype=np.int64) - blocks[pair_owners]
+        rows = self.offsets[pair_owners + n] + local // degrees[pair_owners]
+        cols = self.offsets[pair_owners + n] + local % degrees[pair_owners]
+        self.__append(
+            "angles",
+            compute_angles(
+                self.coordinates[self.neighbors[cols]],
+                self.coordinates[pair_owners + n],
+                self.coordinates[self.neighbors[rows]],
+            ),
+        )
+        return self
+
+    def __append(self, name: str, values: np.ndarray):
+        """
+        This method appends values to an array of the table, which is a view of the used part of a larger buffer.
+        Whenever the buffer is full, it is replaced by one of twice its capacity, so appends take amortized time in
+        the number of values appended.
+        :return: None
+        """
+
+        used = getattr(self, name)
+        buffer = self.__buffers.get(name)
+        if buffer is None or used.base is not buffer or len(buffer) < len(used) + len(values):
+            capacity = max(2 * len(used), len(used) + len(values), 16)
+            buffer = np.empty((capacity, *used.shape[1:]), dtype=used.dtype)
+            buffer[: len(used)] = used
+            self.__buffers[name] = buffer
+        array = buffer[: len(used) + len(values)]
+        array[len(used) :] = values
+        setattr(self, name, array)
+
+    def compact(self, threshold: float = 0.5):
+        """
+        This method reclaims the slots and angles of the nodes retired by update_nodes, once they take more than the
+        given share of the table. The remaining nodes keep their order, and so do their slots, so the columns of
+        edge_slots still hold; only the dense node indices change.
+        :param threshold: share of retired nodes, slots or angles ]0.0, 1.0] past which the table is compacted
+        :return: array with the new dense index of each old one (-1 for the retired ones), or None when the table
+                 was left as it is
+        """
+
+        n = len(self.offsets) - 1
+        if not self.__retired:
+            return None
+        retired = np.asarray(self.__retired, dtype=np.int64)
+        degrees = np.diff(self.offsets)
+        shares = (
+            len(retired) / n,
+            degrees[retired].sum() / max(len(self.neighbors), 1),
+            (degrees[retired] ** 2).sum() / max(len(self.angles), 1),
+        )
+        if max(shares) <= threshold:
+            return None
+
+        alive = np.ones(n, dtype=bool)
+        alive[retired] = False
+        remap = np.full(n, -1, dtype=np.int64)
+        remap[alive] = np.arange(int(alive.sum()), dtype=np.int64)
+
+        slots = np.repeat(alive, degrees)
+        self.offsets = np.concatenate(([0], np.cumsum(degrees[alive]))).astype(np.int64)
+        self.neighbors = remap[self.neighbors[slots]]
+        self.edges = self.edges[slots]
+        self.coordinates = self.coordinates[alive]
+        self.pair_offsets = np.concatenate(([0], np.cumsum(degrees[alive] ** 2))).astype(np.int64)
+        self.angles = self.angles[np.repeat(alive, degrees**2)]
+        # the rows of removed edges are no longer read, so their endpoints may map to -1
+        self.edge_nodes = remap[self.edge_nodes]
+        self.edge_slots = self.edge_slots.copy()
+
+        self.node_ids = [nid for nid, kept in zip(self.node_ids, alive.tolist()) if kept]
+        self.node_index = {nid: index for index, nid in enumerate(self.node_ids)}
+        self.__retired, self.__buffers = [], {}
+
+        return remap
+
+    def __column(self, node: int, neighbor: int) -> int:
+        """
+        This method returns the column a neighbor occupies in the adjacency of a node, given their dense indices.
+        :return: int
+        """
+
+        start, stop = self.offsets[node : node + 2].tolist()
+        return self.neighbors[start:stop].tolist().index(neighbor)
+
+    def turn_angles(self, node, edge) -> list:
+        """
+        This method returns the angles formed by an edge arriving at a node with every slot of that node.
+        :param node: id of the intersection node (negotiator)
+        :param edge: id of the edge arriving at the node, whose far end is the target of the triplet
+        :return: list with one angle per adjacency slot of the node, in adjacency order
+        """
+
+        if not self.node_index and len(self.node_ids):
+            self.node_index = {
+                nid: index for index, nid in enumerate(np.asarray(self.node_ids).tolist())
+            }
+            self.edge_index = {
+                eid: index for index, eid in enumerate(np.asarray(self.edge_ids).tolist())
+            }
+
+        return self.angle_row(self.node_index[node], self.edge_index[edge])
+
+    def angle_row(self, index: int, eid: int) -> list:
+        """
+        This method is the dense counterpart of turn_angles, taking the dense indices of the node and edge.
+        :param index: dense index of the intersection node (negotiator)
+        :param eid: dense index of the edge arriving at the node
+        :return: list with one angle per adjacency slot of the node, in adjacency order
+        """
+
+        # the far end is the endpoint of the edge that differs from the node
+        row = (
+            self.edge_slots[eid, 1] if index != self.edge_nodes[eid, 0] else self.edge_slots[eid, 0]
+        )
+        start, stop = self.offsets[index : index + 2].tolist()
+        degree = stop - start
+        start = self.pair_offsets[index] + row * degree
+
+        return self.angles[start : start + degree].tolist()
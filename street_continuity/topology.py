@@ -0,0 +1,242 @@
+#
+#   Copyright 2019, Gabriel Spadon, all rights reserved.
+#   This code is under GNU General Public License v3.0.
+#       gabriel@spadon.com.br
+#
+
+
+from statistics import NormalDist
+
+import numpy as np
+
+from street_continuity.compact import CompactDualGraph, __index_dtype__
+from street_continuity.graph import DualGraph
+from street_continuity.pool import process_pool, worker_state
+from street_continuity.stats import timed
+
+# number of sources explored at once, one per bit of the words that hold the BFS frontiers
+BATCH = 64
+
+
+class TopologicalDistances:
+    """
+    This class reports the topological (turn-count) distances of a dual graph, where the distance between two streets
+    is the number of turns along the shortest path between them. Pairs of streets are ordered, and only pairs linked
+    by some path take part in the distribution and in the mean, as in NetworkX for connected graphs.
+    """
+
+    def __init__(self):
+        self.exact = True  # [boolean] whether every street was used as a source;
+        self.sources = 0  # [integer] number of streets used as sources;
+        self.distribution = {}  # [dict] number of ordered pairs of streets per distance (estimated when sampled);
+        self.mean_path_length = 0.0  # [float] mean distance between connected pairs of streets;
+        self.confidence_interval = (
+            0.0,
+            0.0,
+        )  # [tuple] bounds of the mean (a single point when exact); and,
+        self.closeness = {}  # [dict] closeness centrality of each street (estimated when sampled).
+
+
+def __dual_adjacency__(dual_graph: DualGraph | CompactDualGraph) -> tuple:
+    """
+    This method returns the CSR adjacency of a dual graph over dense indices of its nodes.
+    :return: tuple with the array of dual node ids, the offsets and the neighbors
+    """
+
+    if isinstance(dual_graph, CompactDualGraph):
+        return np.asarray(dual_graph.dids), dual_graph.offsets, dual_graph.neighbors
+
+    n = len(dual_graph.node_dictionary)
+    dids = np.fromiter(dual_graph.node_dictionary, np.int64, n)
+    index = {did: position for position, did in enumerate(dual_graph.node_dictionary)}
+    links = np.fromiter(
+        (index[did] for pair in dual_graph.edge_dictionary.values() for did in pair),
+        np.int64,
+        2 * len(dual_graph.edge_dictionary),
+    ).reshape(-1, 2)
+
+    owners = np.concatenate([links[:, 0], links[:, 1]])
+    order = np.argsort(owners, kind="stable")
+    neighbors = np.concatenate([links[:, 1], links[:, 0]])[order].astype(__index_dtype__(n))
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(owners, minlength=n)))).astype(np.int64)
+
+    return dids, offsets, neighbors
+
+
+def __popcount__(words: np.ndarray) -> np.ndarray:
+    """
+    This method counts the bits set in each word of an array of 64-bit words.
+    :return: array of counts
+    """
+
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).astype(np.int64)
+    return __bits__(words).sum(axis=1, dtype=np.int64)
+
+
+def __bits__(words: np.ndarray) -> np.ndarray:
+    """
+    This method unpacks an array of 64-bit words into a (len(words), 64) array of bits, bit j of a word at column j.
+    :return: array of bits
+    """
+
+    return np.unpackbits(
+        words.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little"
+    )
+
+
+def __explore__(offsets: np.ndarray, neighbors: np.ndarray, sources: np.ndarray) -> tuple:
+    """
+    This method runs a breadth-first search from each of the given sources, BATCH sources at a time. Each node holds
+    a 64-bit word per frontier, bit j telling whether the j-th source of the batch reached it, so a level of the BFS
+    of the whole batch costs a single pass over the adjacency.
+    :param offsets: CSR offsets of the dual graph
+    :param neighbors: CSR neighbors of the dual graph
+    :param sources: dense indices of the source nodes
+    :return: tuple with the number of ordered pairs per distance, the sum of distances and the number of nodes reached
+             from each source, and the sum of distances and the number of sources reaching each node
+    """
+
+    n = len(offsets) - 1
+    linked = np.flatnonzero(np.diff(offsets))
+    starts = offsets[linked]
+
+    histogram = np.zeros(1, dtype=np.int64)
+    source_sums = np.zeros(len(sources), dtype=np.int64)
+    source_reach = np.zeros(len(sources), dtype=np.int64)
+    node_sums = np.zeros(n, dtype=np.int64)
+    node_reach = np.zeros(n, dtype=np.int64)
+
+    for first in range(0, len(sources), BATCH):
+        batch = sources[first : first + BATCH]
+        frontier = np.zeros(n, dtype=np.uint64)
+        frontier[batch] = np.left_shift(np.uint64(1), np.arange(len(batch), dtype=np.uint64))
+        visited = frontier.copy()
+
+        distance = 0
+        while True:
+            distance += 1
+
+            # the nodes next to the frontier of each source, and among them those seen for the first time
+            reached = np.zeros(n, dtype=np.uint64)
+            if len(linked):
+                reached[linked] = np.bitwise_or.reduceat(frontier[neighbors], starts)
+            frontier = reached & ~visited
+            touched = np.flatnonzero(frontier)
+            if not len(touched):
+                break
+            visited[touched] |= frontier[touched]
+
+            words = frontier[touched]
+            per_node = __popcount__(words)
+            per_source = __bits__(words).sum(axis=0, dtype=np.int64)[: len(batch)]
+            node_sums[touched] += distance * per_node
+            node_reach[touched] += per_node
+            source_sums[first : first + len(batch)] += distance * per_source
+            source_reach[first : first + len(batch)] += per_source
+            if len(histogram) <= distance:
+                histogram = np.concatenate([histogram, np.zeros(1, dtype=np.int64)])
+            histogram[distance] += int(per_node.sum())
+
+    return histogram, source_sums, source_reach, node_sums, node_reach
+
+
+def __explore_partition__(sources: np.ndarray) -> tuple:
+    """
+    This method runs the breadth-first searches of a partition of sources inside a worker process.
+    :return: see __explore__
+    """
+
+    return __explore__(worker_state["offsets"], worker_state["neighbors"], sources)
+
+
+@timed("topological_distances")
+def topological_distances(
+    dual_graph: DualGraph | CompactDualGraph,
+    samples: int | None = None,
+    jobs: int = 1,
+    seed: int | None = None,
+    confidence: float = 0.95,
+) -> TopologicalDistances:
+    """
+    This method computes the topological (turn-count) distances of a dual graph with breadth-first searches over its
+    CSR adjacency. Without samples, every street is a source and the results are exact; the mean path length then
+    matches networkx.average_shortest_path_length and the closeness matches networkx.closeness_centrality. With
+    samples, only that many streets, drawn uniformly at random, are sources: the distribution is scaled up to the
+    whole graph, the mean comes with a confidence interval, and the closeness of every street is estimated from its
+    distances to the sampled sources.
+    :param dual_graph: a DualGraph or CompactDualGraph; a DualGraph must have its dictionary of edges populated
+    :param samples: number of source streets, or None to use all of them
+    :param jobs: number of worker processes sharing the sources
+    :param seed: seed of the random sampling of sources
+    :param confidence: confidence level of the interval of the mean path length
+    :return: TopologicalDistances
+    """
+
+    dids, offsets, neighbors = __dual_adjacency__(dual_graph)
+    n = len(dids)
+
+    result = TopologicalDistances()
+    result.exact = samples is None or samples >= n
+    if result.exact:
+        sources = np.arange(n)
+    else:
+        rng = np.random.default_rng(seed)
+        sources = np.sort(rng.choice(n, size=max(int(samples), 2), replace=False))
+    result.sources = len(sources)
+
+    # whole batches of sources are dispatched to the workers, a few partitions per worker
+    batches = -(-len(sources) // BATCH)
+    parts = min(batches, max(jobs, 1) * 4)
+    partitions = [
+        sources[BATCH * (batches * i // parts) : BATCH * (batches * (i + 1) // parts)]
+        for i in range(parts)
+    ]
+    if jobs > 1 and parts > 1:
+        with process_pool(min(jobs, parts), offsets=offsets, neighbors=neighbors) as pool:
+            results = list(pool.map(__explore_partition__, partitions))
+    else:
+        results = [__explore__(offsets, neighbors, partition) for partition in partitions]
+
+    length = max((len(histogram) for histogram, *_ in results), default=1)
+    histogram = np.zeros(length, dtype=np.int64)
+    for partial, *_ in results:
+        histogram[: len(partial)] += partial
+    source_sums = np.concatenate([r[1] for r in results]) if results else np.zeros(0, np.int64)
+    source_reach = np.concatenate([r[2] for r in results]) if results else np.zeros(0, np.int64)
+    node_sums = sum((r[3] for r in results), np.zeros(n, dtype=np.int64))
+    node_reach = sum((r[4] for r in results), np.zeros(n, dtype=np.int64))
+
+    # sampled sources stand for every street, so their counts are scaled up accordingly
+    scale = 1.0 if result.exact else n / len(sources)
+    result.distribution = {
+        distance: (int(count) if result.exact else float(count) * scale)
+        for distance, count in enumerate(histogram.tolist())
+        if distance and count
+    }
+
+    pairs, total = int(source_reach.sum()), int(source_sums.sum())
+    result.mean_path_length = total / pairs if pairs else 0.0
+    result.confidence_interval = (result.mean_path_length, result.mean_path_length)
+    if not result.exact and pairs:
+        # ratio estimator over the sampled sources, with the finite population correction
+        k = len(sources)
+        residuals = source_sums - result.mean_path_length * source_reach
+        variance = (residuals**2).sum() / (k * (k - 1)) * (1 - k / n)
+        error = np.sqrt(variance) / source_reach.mean()
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        result.confidence_interval = (
+            float(result.mean_path_length - z * error),
+            float(result.mean_path_length + z * error),
+        )
+
+    # closeness as in NetworkX (with the Wasserman and Faust correction for disconnected graphs)
+    scale = 1.0 if result.exact else (n - 1) / len(sources)
+    reach = node_reach * scale
+    sums = node_sums * scale
+    closeness = np.zeros(n, dtype=np.float64)
+    if n > 1:
+        np.divide(reach * reach, sums * (n - 1), out=closeness, where=sums > 0)
+    result.closeness = dict(zip(dids.tolist(), closeness.tolist()))
+
+    return result
@@ -7,7 +7,42 @@
 
 
 import numpy as np
-import osmnx.distance as oxd
+
+# mean radius of the Earth (in meters), the same one OSMnx uses
+EARTH_RADIUS = 6_371_009
+
+
+def great_circle(lat1, lon1, lat2, lon2, earth_radius: float = EARTH_RADIUS):
+    """
+    Compute the great-circle distance between points with the haversine formula.
+
+    Built-in equivalent of ``osmnx.distance.great_circle``, evaluated with the same
+    operations so that results match it exactly, which spares the core of the library
+    from importing OSMnx. Arguments may be scalars or arrays of equal shape.
+
+    Args:
+        lat1: Latitude(s) of the first point(s) in decimal degrees
+        lon1: Longitude(s) of the first point(s) in decimal degrees
+        lat2: Latitude(s) of the second point(s) in decimal degrees
+        lon2: Longitude(s) of the second point(s) in decimal degrees
+        earth_radius: Radius of the Earth, in the unit of the returned distance
+
+    Returns:
+        float or np.ndarray: Distance between each pair of points (default in meters)
+    """
+    y1 = np.deg2rad(lat1)
+    y2 = np.deg2rad(lat2)
+    delta_y = y2 - y1
+
+    x1 = np.deg2rad(lon1)
+    x2 = np.deg2rad(lon2)
+    delta_x = x2 - x1
+
+    h = np.sin(delta_y / 2) ** 2 + np.cos(y1) * np.cos(y2) * np.sin(delta_x / 2) ** 2
+    h = np.minimum(1, h)  # protect against floating point errors
+    arc = 2 * np.arcsin(np.sqrt(h))
+
+    return arc * earth_radius
 
 
 def compute_distance(source_coordinates: tuple, target_coordinates: tuple) -> float:
@@ -45,7 +80,7 @@ def compute_distance(source_coordinates: tuple, target_coordinates: tuple) -> fl
 
     # calculating the length of the edge
     return np.round(
-        oxd.great_circle(source_latitude, source_longitude, target_latitude, target_longitude),
+        great_circle(source_latitude, source_longitude, target_latitude, target_longitude),
         2,
     )
 
@@ -103,3 +138,61 @@ def compute_angle(neighbor, source, target) -> float:
 
     # computing the angle in degrees
     return float(np.arccos(cos_law) * (180.0 / np.pi))
+
+
+def compute_distances(source_coordinates: np.ndarray, target_coordinates: np.ndarray) -> np.ndarray:
+    """
+    Compute the great-circle distance between many pairs of geographic coordinates at once.
+
+    Vectorized counterpart of ``compute_distance``; it applies the same haversine formula and
+    rounding to whole arrays, so each entry equals the scalar result for the same pair.
+
+    Args:
+        source_coordinates: Array of shape (k, 2) holding (latitude, longitude) rows
+        target_coordinates: Array of shape (k, 2) holding (latitude, longitude) rows
+
+    Returns:
+        np.ndarray: Distances in meters, rounded to 2 decimal places
+    """
+    source_coordinates = np.asarray(source_coordinates, dtype=np.float64).reshape(-1, 2)
+    target_coordinates = np.asarray(target_coordinates, dtype=np.float64).reshape(-1, 2)
+
+    return np.round(
+        great_circle(
+            source_coordinates[:, 0],
+            source_coordinates[:, 1],
+            target_coordinates[:, 0],
+            target_coordinates[:, 1],
+        ),
+        2,
+    )
+
+
+def compute_angles(neighbors: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Compute the continuity angle of many node triplets at once.
+
+    Vectorized counterpart of ``compute_angle``, evaluated row by row over arrays of
+    coordinates; overlapping nodes yield 0.0 and the cosine is clamped to [-1, 1].
+
+    Args:
+        neighbors: Array of shape (k, 2) with the (lat, lon) of the first node of each triplet
+        sources: Array of shape (k, 2) with the (lat, lon) of each intersection node (negotiator)
+        targets: Array of shape (k, 2) with the (lat, lon) of the third node of each triplet
+
+    Returns:
+        np.ndarray: Angles in degrees (0-180), where 180 indicates a straight line
+    """
+    # estimating the triangles' sides length
+    d_sn = compute_distances(neighbors, sources)
+    d_nt = compute_distances(sources, targets)
+    d_st = compute_distances(neighbors, targets)
+
+    # overlapping nodes are masked out and reported as a zero angle
+    degenerate = d_sn * d_nt == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos_law = ((d_sn**2.0) + (d_nt**2.0) - (d_st**2.0)) / (2.0 * d_sn * d_nt)
+    cos_law = np.minimum(np.maximum(-1.0, np.where(degenerate, 1.0, cos_law)), 1.0)
+
+    # computing the angles in degrees
+    return np.where(degenerate, 0.0, np.arccos(cos_law) * (180.0 / np.pi))
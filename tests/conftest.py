@@ -0,0 +1,18 @@
+"""Fixtures shared by the tests, built from the test network."""
+
+import pytest
+
+from street_continuity.mapper import dual_mapper
+from tests.helpers import read_test_network
+
+
+@pytest.fixture(scope="module")
+def primal():
+    """The primal graph of the test network, shared by the tests of a module, which leave it unchanged."""
+    return read_test_network()
+
+
+@pytest.fixture
+def dual(primal):
+    """The dual graph of the test network, mapped again for each test, which may change it."""
+    return dual_mapper(primal)
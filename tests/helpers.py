@@ -0,0 +1,55 @@
+"""Helpers shared by the tests: the test network, small dual graphs and their NetworkX copies."""
+
+from pathlib import Path
+
+import networkx as nx
+
+from street_continuity.file import read_csv
+from street_continuity.graph import DualGraph, PrimalGraph
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def read_test_network(use_label=True, compact=False):
+    """The primal graph of the test network, read again on every call."""
+    return read_csv("test-nodes.csv", "test-edges.csv", str(DATA_DIR), use_label, compact=compact)
+
+
+def to_networkx(dual_graph):
+    """The dual graph as a NetworkX graph of dual node ids."""
+    graph = nx.Graph()
+    graph.add_nodes_from(dual_graph.node_dictionary)
+    graph.add_edges_from(dual_graph.edge_dictionary.values())
+    return graph
+
+
+def linked_streets(streets, links):
+    """A dual graph of the given number of identical streets, joined by the given pairs of dual node ids."""
+    dual_graph = DualGraph()
+    edge = PrimalGraph.Edge(0, 1, 2, 1.0, "x", "residential")
+    for did in range(streets):
+        dual_graph.node_dictionary[did] = DualGraph.Node(did, edge)
+    dual_graph.edge_dictionary = dict(enumerate(links))
+    return dual_graph
+
+
+def street_keys(dual_graph):
+    """The key of every street, in the order of the dual nodes."""
+    return [dual_node.key() for dual_node in dual_graph.node_dictionary.values()]
+
+
+def street_layout(dual_graph):
+    """The streets and the pairs of streets that meet, independent of the dual node and dual edge ids."""
+    keys = {
+        did: repr(dual_node.key()[:-1]) for did, dual_node in dual_graph.node_dictionary.items()
+    }
+    links = sorted(sorted((keys[a], keys[b])) for a, b in dual_graph.edge_dictionary.values())
+    return sorted(keys.values()), links
+
+
+def street_segments(dual_graph):
+    """The primal edges of every street, regardless of the direction each one was walked in."""
+    return sorted(
+        sorted(tuple(sorted(edge)) for edge in dual_node.edges)
+        for dual_node in dual_graph.node_dictionary.values()
+    )
@@ -1,5 +1,8 @@
 """Tests for the public package surface and the GraphML reader."""
 
+import subprocess
+import sys
+
 import networkx as nx
 import pytest
 
@@ -20,6 +23,17 @@ def test_all_module_reexports_public_api():
         assert hasattr(sc_all, name)
 
 
+def test_core_does_not_import_osmnx_or_networkx():
+    code = (
+        "import sys, street_continuity, street_continuity.__main__; "
+        "print(' '.join(m for m in ('osmnx', 'networkx') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
 def test_missing_edges_file_raises(tmp_path):
     # The nodes file exists but the edges file does not.
     (tmp_path / "nodes.csv").write_text("0,-11.9,-62.0\n1,-11.91,-62.01\n")
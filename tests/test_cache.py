@@ -0,0 +1,117 @@
+"""Tests for the binary cache of primal networks."""
+
+import os
+import shutil
+import threading
+
+import numpy as np
+import pytest
+
+from street_continuity.cache import is_fresh, load_cached, read_cache, write_cache
+from street_continuity.file import read_csv
+from street_continuity.mapper import dual_mapper
+from street_continuity.table import AngleTable
+from tests.helpers import DATA_DIR, read_test_network, street_keys
+
+
+@pytest.fixture
+def sources(tmp_path):
+    for name in ("test-nodes.csv", "test-edges.csv"):
+        shutil.copy(DATA_DIR / name, tmp_path / name)
+    return [tmp_path / "test-nodes.csv", tmp_path / "test-edges.csv"]
+
+
+def _loader(sources, calls):
+    def loader():
+        calls.append(1)
+        return read_csv(sources[0].name, sources[1].name, str(sources[0].parent), True)
+
+    return loader
+
+
+class TestCache:
+    @pytest.mark.parametrize("mmap", [False, True])
+    def test_round_trip_keeps_graph_and_angles(self, tmp_path, mmap):
+        primal = read_test_network(compact=True)
+        table = AngleTable().build_table(primal)
+        write_cache(primal, tmp_path / "entry", table)
+
+        cached, cached_table = read_cache(tmp_path / "entry", mmap=mmap)
+        for name in ("node_ids", "coordinates", "edge_ids", "lengths", "offsets", "neighbors"):
+            assert np.array_equal(getattr(cached, name), getattr(primal, name))
+        assert cached.name_table == primal.name_table
+        assert np.array_equal(cached_table.angles, table.angles)
+        assert isinstance(cached.coordinates, np.memmap) == mmap
+        dual, expected = dual_mapper(cached, angle_table=cached_table), dual_mapper(primal)
+        assert street_keys(dual) == street_keys(expected)
+        assert dual.edge_dictionary == expected.edge_dictionary
+
+    def test_dictionary_primal_graph_is_cached_in_compact_form(self, tmp_path):
+        primal = read_test_network(use_label=False)
+        write_cache(primal, tmp_path / "entry")
+        cached, cached_table = read_cache(tmp_path / "entry")
+        assert cached_table is None
+        dual = dual_mapper(cached.to_primal(), use_label=False)
+        expected = dual_mapper(primal, use_label=False)
+        assert street_keys(dual) == street_keys(expected)
+        assert dual.edge_dictionary == expected.edge_dictionary
+
+    def test_repeated_load_skips_the_loader(self, tmp_path, sources):
+        calls = []
+        first, _ = load_cached(tmp_path / "cache", sources, _loader(sources, calls))
+        second, table = load_cached(tmp_path / "cache", sources, _loader(sources, calls))
+        assert len(calls) == 1
+        assert np.array_equal(first.edges, second.edges)
+        assert table is not None and len(table.angles) > 0
+
+    def test_changed_source_invalidates_the_entry(self, tmp_path, sources):
+        calls = []
+        load_cached(tmp_path / "cache", sources, _loader(sources, calls))
+        (entry,) = (tmp_path / "cache").iterdir()
+        assert is_fresh(entry, sources)
+
+        # dropping the last edge, and moving the modification time forward
+        edges = sources[1].read_text().splitlines(keepends=True)
+        sources[1].write_text("".join(edges[:-1]))
+        stat = sources[1].stat()
+        os.utime(sources[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert not is_fresh(entry, sources)
+
+        primal, _ = load_cached(tmp_path / "cache", sources, _loader(sources, calls))
+        assert len(calls) == 2
+        assert len(primal.edge_ids) == len(edges) - 1
+
+    def test_options_are_cached_apart(self, tmp_path, sources):
+        calls = []
+        load_cached(tmp_path / "cache", sources, _loader(sources, calls), {"use_label": True})
+        load_cached(tmp_path / "cache", sources, _loader(sources, calls), {"use_label": False})
+        assert len(calls) == 2
+        assert len(list((tmp_path / "cache").iterdir())) == 2
+
+    def test_concurrent_writers_leave_one_complete_entry(self, tmp_path):
+        primal = read_test_network(compact=True)
+        table = AngleTable().build_table(primal)
+        write_cache(primal, tmp_path / "entry", table)
+
+        # batch runs sharing a cache may store the same entry at once, over an existing one
+        barrier, errors = threading.Barrier(6), []
+
+        def writer():
+            barrier.wait()
+            try:
+                for _ in range(5):
+                    write_cache(primal, tmp_path / "entry", table)
+            except OSError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=writer) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert [path.name for path in tmp_path.iterdir()] == ["entry"]
+        cached, cached_table = read_cache(tmp_path / "entry")
+        assert np.array_equal(cached.edges, primal.edges)
+        assert np.array_equal(cached_table.angles, table.angles)
@@ -0,0 +1,95 @@
+"""Tests for the betweenness centrality of the streets of a DualGraph."""
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from street_continuity.centrality import betweenness_centrality
+from street_continuity.compact import to_compact_dual
+from street_continuity.file import read_binary, write_binary, write_graphml, write_supplementary
+from street_continuity.graph import DualGraph
+from tests.helpers import linked_streets, to_networkx
+
+
+class TestBetweennessCentrality:
+    @pytest.mark.parametrize("normalized", [True, False])
+    def test_exact_matches_networkx(self, dual, normalized):
+        result = betweenness_centrality(dual, normalized=normalized)
+        expected = nx.betweenness_centrality(to_networkx(dual), normalized=normalized)
+
+        assert result.exact and result.sources == len(dual.node_dictionary)
+        assert result.values == pytest.approx(expected)
+        assert set(result.errors.values()) == {0.0} and result.bound == 0.0
+
+    def test_disconnected_graph_matches_networkx(self):
+        # a path of three streets, a square of four streets and an isolated street
+        dual_graph = linked_streets(8, [(0, 1), (1, 2), (3, 4), (4, 5), (5, 6), (6, 3)])
+        result = betweenness_centrality(dual_graph)
+        assert result.values == pytest.approx(nx.betweenness_centrality(to_networkx(dual_graph)))
+
+    def test_workers_and_compact_graphs_give_the_same_result(self, dual):
+        expected = betweenness_centrality(dual).values
+        assert betweenness_centrality(dual, jobs=2).values == pytest.approx(expected)
+        assert betweenness_centrality(to_compact_dual(dual)).values == pytest.approx(expected)
+
+    def test_sampled_estimates(self, dual):
+        exact = betweenness_centrality(dual).values
+        result = betweenness_centrality(dual, samples=80, seed=5)
+        assert not result.exact and result.sources == 80
+
+        errors = np.array([abs(result.values[did] - value) for did, value in exact.items()])
+        assert errors.max() <= result.bound
+        assert np.mean(errors <= np.array(list(result.errors.values())) + 1e-12) > 0.5
+
+        # sampled runs are reproducible, and sampling every street is exact
+        assert betweenness_centrality(dual, samples=80, seed=5).values == result.values
+        n = len(dual.node_dictionary)
+        assert betweenness_centrality(dual, samples=n).values == pytest.approx(exact)
+
+    def test_empty_graph(self):
+        result = betweenness_centrality(DualGraph())
+        assert result.values == {} and result.errors == {}
+
+
+class TestBetweennessAttribute:
+    def test_values_are_stored_in_the_graph(self, dual):
+        result = betweenness_centrality(dual)
+        assert dual.node_attributes == {"betweenness": result.values}
+
+        compact = to_compact_dual(dual)
+        betweenness_centrality(compact, attribute="rank")
+        assert compact.node_attributes["rank"].tolist() == pytest.approx(
+            list(result.values.values())
+        )
+        assert compact.to_dual().node_attributes["rank"] == pytest.approx(result.values)
+
+        betweenness_centrality(dual, samples=10, attribute=None)
+        assert list(dual.node_attributes) == ["betweenness"]
+
+    def test_graphml_holds_the_attribute(self, dual, tmp_path):
+        result = betweenness_centrality(dual)
+        nxg = write_graphml(dual, "dual.graphml", str(tmp_path), return_networkx=True)
+        nx.write_graphml(nxg, tmp_path / "reference.graphml", infer_numeric_types=False)
+        assert (tmp_path / "dual.graphml").read_bytes() == (
+            tmp_path / "reference.graphml"
+        ).read_bytes()
+
+        reloaded = nx.read_graphml(tmp_path / "dual.graphml")
+        assert {
+            int(nid): data["betweenness"] for nid, data in reloaded.nodes(data=True)
+        } == pytest.approx(result.values)
+
+    def test_binary_and_supplementary_hold_the_attribute(self, dual, tmp_path):
+        result = betweenness_centrality(dual)
+        compact = read_binary(write_binary(dual, "dual.bin", str(tmp_path)))
+        assert compact.node_attributes["betweenness"].tolist() == list(result.values.values())
+        assert compact.to_dual().node_attributes == dual.node_attributes
+
+        write_supplementary(dual, "supp.txt", str(tmp_path))
+        lines = (tmp_path / "supp.txt").read_text().splitlines()
+        assert [float(line.rsplit(", ", 1)[1]) for line in lines] == list(result.values.values())
+
+    def test_attributes_cannot_shadow_street_attributes(self, dual, tmp_path):
+        betweenness_centrality(dual, attribute="length")
+        with pytest.raises(ValueError):
+            write_graphml(dual, "dual.graphml", str(tmp_path))
@@ -1,11 +1,17 @@
 """Tests for the ``python -m street_continuity`` command-line interface."""
 
+import csv
+import json
+import os
+import shutil
+import time
 from pathlib import Path
 
 import networkx as nx
 import pytest
 
-from street_continuity.__main__ import main
+from street_continuity.__main__ import _is_up_to_date, build_parser, main
+from street_continuity.file import read_binary
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 
@@ -56,6 +62,195 @@ def test_writes_supplementary(tmp_path):
     assert supp.exists() and supp.stat().st_size > 0
 
 
+def test_sweep_writes_one_output_per_configuration(tmp_path):
+    out = tmp_path / "dual.graphml"
+    code = main(
+        [
+            "--nodes",
+            "test-nodes.csv",
+            "--edges",
+            "test-edges.csv",
+            "--data-dir",
+            str(DATA_DIR),
+            "--method",
+            "icn",
+            "hicn",
+            "--min-angle",
+            "90",
+            "150",
+            "--output",
+            str(out),
+        ]
+    )
+    assert code == 0
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == [
+        "dual-hicn-150.graphml",
+        "dual-hicn-90.graphml",
+        "dual-icn-150.graphml",
+        "dual-icn-90.graphml",
+    ]
+
+
+def test_cache_dir_reproduces_the_uncached_output(tmp_path):
+    args = [
+        "--nodes",
+        "test-nodes.csv",
+        "--edges",
+        "test-edges.csv",
+        "--data-dir",
+        str(DATA_DIR),
+        "--method",
+        "hicn",
+    ]
+    assert main([*args, "--output", str(tmp_path / "plain.graphml")]) == 0
+    for name in ("cold.graphml", "warm.graphml"):
+        cache = ["--cache-dir", str(tmp_path / "cache")]
+        assert main([*args, *cache, "--output", str(tmp_path / name)]) == 0
+
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+    expected = (tmp_path / "plain.graphml").read_bytes()
+    assert (tmp_path / "cold.graphml").read_bytes() == expected
+    assert (tmp_path / "warm.graphml").read_bytes() == expected
+
+
+def test_writes_binary(tmp_path):
+    out = tmp_path / "dual.graphml"
+    binary = tmp_path / "dual.bin"
+    args = ["--nodes", "test-nodes.csv", "--edges", "test-edges.csv", "--data-dir", str(DATA_DIR)]
+    assert main([*args, "--output", str(out), "--binary", str(binary)]) == 0
+    assert len(read_binary(binary).node_dictionary) == nx.read_graphml(out).number_of_nodes()
+
+
+def test_writes_betweenness(tmp_path):
+    out = tmp_path / "dual.graphml"
+    binary = tmp_path / "dual.bin"
+    args = ["--nodes", "test-nodes.csv", "--edges", "test-edges.csv", "--data-dir", str(DATA_DIR)]
+    assert main([*args, "--output", str(out), "--binary", str(binary), "--betweenness"]) == 0
+
+    graph = nx.read_graphml(out)
+    expected = nx.betweenness_centrality(graph)
+    assert {nid: data["betweenness"] for nid, data in graph.nodes(data=True)} == pytest.approx(
+        expected
+    )
+    assert len(read_binary(binary).node_attributes["betweenness"]) == len(graph)
+
+
+def test_reads_osm_extract(tmp_path):
+    osm = tmp_path / "city.osm"
+    osm.write_text(
+        '<osm version="0.6">'
+        '<node id="1" lat="-11.90" lon="-62.00"/><node id="2" lat="-11.91" lon="-62.00"/>'
+        '<node id="3" lat="-11.92" lon="-62.00"/><node id="4" lat="-11.91" lon="-62.01"/>'
+        '<way id="5"><nd ref="1"/><nd ref="2"/><nd ref="3"/><tag k="highway" v="primary"/></way>'
+        '<way id="6"><nd ref="4"/><nd ref="2"/><tag k="highway" v="residential"/></way>'
+        "</osm>"
+    )
+    out = tmp_path / "dual.graphml"
+    assert main(["--osm", str(osm), "--method", "icn", "--output", str(out)]) == 0
+    assert nx.read_graphml(out).number_of_nodes() == 2
+
+
+@pytest.fixture
+def manifest_dir(tmp_path):
+    for name in ("test-nodes.csv", "test-edges.csv"):
+        shutil.copy(DATA_DIR / name, tmp_path / name)
+    return tmp_path
+
+
+def test_batch_maps_every_entry_and_continues_past_errors(manifest_dir, capsys):
+    manifest = manifest_dir / "cities.csv"
+    manifest.write_text(
+        "name,nodes,edges,method,min_angle,output\n"
+        "one,test-nodes.csv,test-edges.csv,hicn,120,out/one.graphml\n"
+        "broken,missing.csv,test-edges.csv,icn,120,out/broken.graphml\n"
+        "two,test-nodes.csv,test-edges.csv,icn hicn,90,out/two.graphml\n"
+    )
+    summary = manifest_dir / "summary.csv"
+    code = main(["--batch", str(manifest), "--jobs", "2", "--summary", str(summary)])
+    assert code == 1
+
+    out = manifest_dir / "out"
+    assert sorted(p.name for p in out.iterdir()) == [
+        "one.graphml",
+        "two-hicn-90.graphml",
+        "two-icn-90.graphml",
+    ]
+    with open(summary, newline="") as stream:
+        rows = list(csv.DictReader(stream))
+    assert [(r["name"], r["status"], r["method"]) for r in rows] == [
+        ("one", "mapped", "hicn"),
+        ("broken", "failed", ""),
+        ("two", "mapped", "icn"),
+        ("two", "mapped", "hicn"),
+    ]
+    assert rows[0]["dual_nodes"] == str(nx.read_graphml(out / "one.graphml").number_of_nodes())
+    assert float(rows[0]["seconds"]) >= 0
+    assert "missing.csv" in capsys.readouterr().err
+
+
+def test_batch_skips_entries_that_are_up_to_date(manifest_dir, capsys):
+    manifest = manifest_dir / "cities.jsonl"
+    entry = {"nodes": "test-nodes.csv", "edges": "test-edges.csv", "output": "one.graphml"}
+    manifest.write_text(json.dumps(entry) + "\n\n")
+    assert main(["--batch", str(manifest), "--method", "icn"]) == 0
+    written = (manifest_dir / "one.graphml").stat().st_mtime_ns
+
+    capsys.readouterr()
+    assert main(["--batch", str(manifest), "--method", "icn"]) == 0
+    assert "up to date" in capsys.readouterr().out
+    assert (manifest_dir / "one.graphml").stat().st_mtime_ns == written
+
+    assert main(["--batch", str(manifest), "--method", "icn", "--force"]) == 0
+    assert "mapped" in capsys.readouterr().out
+
+
+def test_batch_downloads_again_unless_outputs_are_recent(manifest_dir, capsys):
+    output = manifest_dir / "place.graphml"
+    for source in (["--place", "Ji-Paraná, Brazil"], ["--point=-11.92,-62.00"]):
+        args = build_parser().parse_args([*source, "--output", str(output)])
+        assert not _is_up_to_date(args, max_download_age=1)
+
+        # a download has no input to compare with, so existing outputs are not enough
+        output.write_text("")
+        assert not _is_up_to_date(args)
+        assert _is_up_to_date(args, max_download_age=1)
+
+        stat = output.stat()
+        os.utime(output, ns=(stat.st_atime_ns, time.time_ns() - 2 * 3600 * 10**9))
+        assert not _is_up_to_date(args, max_download_age=1)
+        output.unlink()
+
+    output.write_text("")
+    manifest = manifest_dir / "cities.csv"
+    manifest.write_text('name,place,output\nji-parana,"Ji-Paraná, Brazil",place.graphml\n')
+    assert main(["--batch", str(manifest), "--max-download-age", "24"]) == 0
+    assert "up to date" in capsys.readouterr().out
+
+
+def test_batch_starts_the_largest_inputs_first(manifest_dir, capsys):
+    (manifest_dir / "small.osm").write_text(
+        '<osm version="0.6"><node id="1" lat="0" lon="0"/><node id="2" lat="0" lon="0.01"/>'
+        '<way id="3"><nd ref="1"/><nd ref="2"/><tag k="highway" v="primary"/></way></osm>'
+    )
+    manifest = manifest_dir / "cities.csv"
+    manifest.write_text(
+        "name,osm,nodes,edges,output,unknown\n"
+        "small,small.osm,,,small.graphml,\n"
+        "large,,test-nodes.csv,test-edges.csv,large.graphml,\n"
+        "typo,small.osm,,,typo.graphml,1\n"
+    )
+    assert main(["--batch", str(manifest)]) == 1
+    err = capsys.readouterr().err
+    assert "unknown manifest columns: unknown" in err
+    assert err.index("large: mapped") < err.index("small: mapped")
+
+
+def test_output_is_required_without_batch():
+    with pytest.raises(SystemExit):
+        main(["--nodes", "test-nodes.csv", "--edges", "test-edges.csv"])
+
+
 def test_nodes_without_edges_errors(tmp_path):
     with pytest.raises(SystemExit):
         main(
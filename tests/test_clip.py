@@ -0,0 +1,150 @@
+"""Tests for the spatial index of a PrimalGraph and the clipping of a network to a region."""
+
+import json
+
+import numpy as np
+import pytest
+
+from street_continuity.__main__ import main
+from street_continuity.compact import to_compact
+from street_continuity.graph import PrimalGraph
+from street_continuity.index import clip
+from street_continuity.mapper import dual_mapper
+from street_continuity.util import great_circle
+from tests.helpers import DATA_DIR, read_test_network, street_segments
+
+
+@pytest.fixture(scope="module")
+def regions(primal):
+    """A box, a circle and a triangle, each around a part of the network."""
+    coordinates = np.array(list(primal.node_dictionary.values()))
+    low, high = coordinates.min(axis=0), coordinates.max(axis=0)
+    center = (low + high) / 2
+    quarter = (high - low) / 4
+    radius = great_circle(*center, *(center + quarter))
+    triangle = [tuple(low), (low[0], high[1]), tuple(high)]
+    return {
+        "bbox": (*(center - quarter), *(center + quarter)),
+        "circle": (*center, radius),
+        "polygon": triangle,
+    }
+
+
+def _inside(region, value, latitude, longitude):
+    """Whether a point lies in a region, tested directly on its definition."""
+    if region == "bbox":
+        south, west, north, east = value
+        return south <= latitude <= north and west <= longitude <= east
+    if region == "circle":
+        return great_circle(value[0], value[1], latitude, longitude) <= value[2]
+    inside = False
+    for (y1, x1), (y2, x2) in zip(value, value[1:] + value[:1]):
+        if (y1 > latitude) != (y2 > latitude):
+            inside ^= longitude < x1 + (latitude - y1) * (x2 - x1) / (y2 - y1)
+    return inside
+
+
+def _filtered(primal_graph, region, value):
+    """The nodes inside the region and the edges between them, kept by scanning every element."""
+    nodes = {
+        nid: point
+        for nid, point in primal_graph.node_dictionary.items()
+        if _inside(region, value, *point)
+    }
+    graph = PrimalGraph()
+    graph.set_nodes(nodes)
+    graph.set_edges(
+        {
+            eid: edge
+            for eid, edge in primal_graph.edge_dictionary.items()
+            if edge.source in nodes and edge.target in nodes
+        }
+    )
+    return graph.build_graph()
+
+
+class TestClip:
+    @pytest.mark.parametrize("region", ["bbox", "circle", "polygon"])
+    def test_matches_a_filtered_graph(self, primal, regions, region):
+        expected = _filtered(primal, region, regions[region])
+        assert 0 < len(expected.edge_dictionary) < len(primal.edge_dictionary)
+
+        clipped = clip(primal, **{region: regions[region]})
+        assert isinstance(clipped, PrimalGraph) and clipped is not primal
+        assert clipped.node_dictionary == expected.node_dictionary
+        assert list(clipped.edge_dictionary) == list(expected.edge_dictionary)
+        assert clipped.graph == expected.graph
+
+        compact = clip(to_compact(primal), **{region: regions[region]})
+        assert compact.node_ids.tolist() == list(expected.node_dictionary)
+        assert compact.edge_ids.tolist() == list(expected.edge_dictionary)
+        assert [compact.edge(i).__dict__ for i in range(len(compact.edge_ids))] == [
+            edge.__dict__ for edge in expected.edge_dictionary.values()
+        ]
+
+        # the clipped network maps as the filtered one does
+        assert street_segments(dual_mapper(clipped)) == street_segments(dual_mapper(expected))
+        assert street_segments(dual_mapper(compact)) == street_segments(dual_mapper(expected))
+
+    def test_the_index_is_kept_until_the_graph_changes(self, regions):
+        primal = read_test_network()
+        assert primal.index is None
+        clip(primal, bbox=regions["bbox"])
+        index = primal.index
+        assert index is primal.spatial_index()
+        clip(primal, circle=regions["circle"])
+        assert primal.index is index
+
+        primal.set_edges(dict(primal.edge_dictionary))
+        assert primal.index is None
+
+    def test_regions(self, primal, regions):
+        with pytest.raises(ValueError):
+            clip(primal)
+        with pytest.raises(ValueError):
+            clip(primal, bbox=regions["bbox"], circle=regions["circle"])
+        with pytest.raises(ValueError):
+            clip(primal, polygon=regions["polygon"][:2])
+
+        empty = clip(primal, bbox=(80.0, 170.0, 81.0, 171.0))
+        assert empty.node_dictionary == {} and empty.edge_dictionary == {}
+
+        whole = clip(primal, circle=(*next(iter(primal.node_dictionary.values())), 1e7))
+        assert list(whole.edge_dictionary) == list(primal.edge_dictionary)
+
+
+class TestClipCli:
+    def _run(self, tmp_path, name, region, cache=True):
+        argv = ["--nodes", "test-nodes.csv", "--edges", "test-edges.csv"]
+        argv += ["--data-dir", str(DATA_DIR), "--method", "hicn"]
+        if cache:
+            argv += ["--cache-dir", str(tmp_path / "cache")]
+        argv += [f"--clip={region}", "--supplementary", str(tmp_path / f"{name}.txt")]
+        assert main([*argv, "--output", str(tmp_path / f"{name}.graphml")]) == 0
+        return (tmp_path / f"{name}.txt").read_text()
+
+    def test_clips_cached_inputs(self, primal, regions, tmp_path):
+        bbox = ",".join(map(str, regions["bbox"]))
+        direct = self._run(tmp_path, "direct", bbox, cache=False)
+        assert self._run(tmp_path, "first", bbox) == direct
+        assert self._run(tmp_path, "second", bbox) == direct
+
+        expected = dual_mapper(_filtered(primal, "circle", regions["circle"]), use_label=True)
+        circle = ",".join(map(str, regions["circle"]))
+        assert len(self._run(tmp_path, "circle", circle).splitlines()) == len(
+            expected.node_dictionary
+        )
+
+        # GeoJSON lists (longitude, latitude) positions
+        ring = [[lon, lat] for lat, lon in regions["polygon"]]
+        feature = {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}}
+        (tmp_path / "area.geojson").write_text(json.dumps(feature))
+        expected = dual_mapper(_filtered(primal, "polygon", regions["polygon"]), use_label=True)
+        lines = self._run(tmp_path, "polygon", str(tmp_path / "area.geojson")).splitlines()
+        assert len(lines) == len(expected.node_dictionary)
+
+    def test_rejects_bad_regions(self, tmp_path):
+        with pytest.raises(SystemExit):
+            self._run(tmp_path, "bad", "1,2")
+        with pytest.raises(SystemExit):
+            self._run(tmp_path, "missing", str(tmp_path / "missing.geojson"))
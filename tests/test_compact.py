@@ -0,0 +1,122 @@
+"""Tests for the array-backed CompactPrimalGraph."""
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from street_continuity.compact import CompactPrimalGraph, to_compact, to_compact_dual
+from street_continuity.file import from_osmnx
+from street_continuity.graph import DualGraph, PrimalGraph
+from street_continuity.mapper import dual_mapper
+from tests.helpers import read_test_network, street_keys
+
+
+class TestCompactPrimalGraph:
+    def test_csr_matches_adjacency_list(self):
+        primal, compact = read_test_network(), read_test_network(compact=True)
+        for nid, adjacency in primal.graph.items():
+            index = compact.node_index(nid)
+            start, stop = compact.offsets[index], compact.offsets[index + 1]
+            assert compact.node_ids[compact.neighbors[start:stop]].tolist() == list(adjacency)
+            assert compact.edge_ids[compact.edges[start:stop]].tolist() == list(adjacency.values())
+
+    def test_parallel_edges_keep_first_slot_and_last_edge(self):
+        pg = PrimalGraph()
+        pg.node_dictionary = {"a": (0.0, 0.0), "b": (0.0, 0.001), "c": (0.001, 0.0)}
+        pg.edge_dictionary = {
+            0: PrimalGraph.Edge(0, "a", "b", 1.0, "x", "r"),
+            1: PrimalGraph.Edge(1, "a", "c", 1.0, "x", "r"),
+            2: PrimalGraph.Edge(2, "b", "a", 1.0, "x", "r"),
+        }
+        compact = to_compact(pg.build_graph())
+        assert compact.to_primal().graph == pg.graph
+
+    def test_dual_mapping_is_identical(self):
+        for use_label in (True, False):
+            expected = dual_mapper(read_test_network(use_label), min_angle=120)
+            actual = dual_mapper(read_test_network(use_label, compact=True), min_angle=120)
+            assert street_keys(actual) == street_keys(expected)
+            assert actual.edge_dictionary == expected.edge_dictionary
+
+    def test_views_and_round_trip(self):
+        primal, compact = read_test_network(), read_test_network(compact=True)
+        assert len(compact.node_dictionary) == len(primal.node_dictionary)
+        assert len(compact.edge_dictionary) == len(primal.edge_dictionary)
+        assert compact.node_dictionary["0"] == tuple(primal.node_dictionary["0"])
+        edge = compact.edge_dictionary["5"]
+        assert (edge.source, edge.target, edge.length, edge.name, edge.label) == (
+            primal.edge_dictionary["5"].source,
+            primal.edge_dictionary["5"].target,
+            primal.edge_dictionary["5"].length,
+            primal.edge_dictionary["5"].name,
+            primal.edge_dictionary["5"].label,
+        )
+        assert compact.to_primal().graph == primal.graph
+        with pytest.raises(KeyError):
+            compact.node_index("no-such-node")
+
+    def test_attributes_are_parallel_arrays(self):
+        compact = read_test_network(compact=True)
+        m = len(compact.edge_ids)
+        for array in (compact.sources, compact.targets, compact.lengths, compact.names):
+            assert len(array) == m
+        assert compact.sources.dtype == np.int32
+        assert compact.label_table[compact.labels[0]] == "residential"
+
+    def test_float32_coordinates(self):
+        primal = read_test_network()
+        compact = to_compact(primal, dtype=np.float32)
+        assert compact.coordinates.dtype == np.float32
+        assert len(dual_mapper(compact, min_angle=120).node_dictionary) > 0
+
+    def test_empty_graph(self):
+        compact = CompactPrimalGraph().build_graph()
+        assert len(dual_mapper(compact).node_dictionary) == 0
+
+    def test_from_osmnx_compact(self):
+        g = nx.MultiDiGraph()
+        g.add_node(1, y=-11.90, x=-62.00)
+        g.add_node(2, y=-11.91, x=-62.00)
+        g.add_node(3, y=-11.92, x=-62.00)
+        g.add_edge(1, 2, name="Rua A", highway="residential")
+        g.add_edge(2, 3, name="Rua A", highway="residential")
+        compact = from_osmnx(g, use_label=True, compact=True)
+        assert isinstance(compact, CompactPrimalGraph)
+        assert compact.node_ids.tolist() == [1, 2, 3]
+        assert len(dual_mapper(compact, min_angle=120).node_dictionary) == 1
+
+
+class TestCompactDualGraph:
+    @pytest.mark.parametrize("use_label", [True, False])
+    def test_views_match_dual_graph(self, use_label):
+        dual = dual_mapper(read_test_network(use_label), min_angle=120).build_graph()
+        compact = to_compact_dual(dual)
+        assert list(compact.node_dictionary) == list(dual.node_dictionary)
+        for did in list(dual.node_dictionary)[::25]:
+            assert compact.node_dictionary[did].key() == dual.node_dictionary[did].key()
+            assert compact.graph[did] == dual.graph[did]
+        assert dict(compact.edge_dictionary) == dual.edge_dictionary
+        assert dict(compact.graph) == dual.graph
+
+    def test_unsorted_ids_and_isolated_nodes(self):
+        pg = PrimalGraph()
+        pg.node_dictionary = {"a": (0.0, 0.0), "b": (0.0, 0.001), "c": (0.001, 0.0)}
+        dual = DualGraph()
+        dual.set_nodes(
+            {
+                7: DualGraph.Node(7, PrimalGraph.Edge(10, "a", "b", 5.0, "x", "r")),
+                3: DualGraph.Node(3, PrimalGraph.Edge(11, "b", "c", 2.5, "y", "r")),
+                5: DualGraph.Node(5, PrimalGraph.Edge(12, "c", "a", 1.0, "z", "s")),
+            }
+        )
+        dual.set_edges({4: (7, 3)})
+        compact = to_compact_dual(dual.build_graph())
+
+        assert compact.node_dictionary[3].names == ["y"]
+        assert compact.edge_dictionary[4] == (7, 3)
+        assert dict(compact.graph) == dual.graph
+        with pytest.raises(KeyError):
+            compact.graph[5]
+        with pytest.raises(KeyError):
+            compact.node_dictionary[4]
+        assert compact.to_dual().node_dictionary[5].nodes == ["c", "a"]
@@ -1,5 +1,7 @@
 """Unit tests for the PrimalGraph and DualGraph containers."""
 
+import pytest
+
 from street_continuity.graph import DualGraph, PrimalGraph
 
 
@@ -108,6 +110,91 @@ class TestDualNode:
         assert dual_node.nodes == ["n1", "n2"]
         assert dual_node.edges == [("n1", "n2")]
 
+    def test_growth_at_both_ends(self):
+        """Test that edges merged upstream and downstream keep the street in path order."""
+        dual_node = DualGraph.Node(0, PrimalGraph.Edge(0, "b", "c", 1.0, "Main St", "primary"))
+        dual_node.add_edge("c", "d")
+        dual_node.add_edge("a", "b", is_upstream=True)
+        for name, node in (("Main St", "d"), ("Main St", "a"), ("Oak St", "b")):
+            dual_node.add_name(name)
+            dual_node.add_node(node)
+
+        assert dual_node.edges == [("a", "b"), ("b", "c"), ("c", "d")]
+        assert dual_node.names == ["Main St", "Main St", "Main St", "Oak St"]
+        assert dual_node.nodes == ["b", "c", "d", "a"]
+        assert dual_node.has_node("a") and not dual_node.has_node("e")
+        assert str(dual_node.names) == str(["Main St", "Main St", "Main St", "Oak St"])
+
+    def test_assigned_attributes(self):
+        """Test that assigned lists replace the stored ones, even when edges do not form a path."""
+        dual_node = DualGraph.Node(0, PrimalGraph.Edge(0, "a", "b", 1.0, "x", "road"))
+        dual_node.names = ["y", "y", "z"]
+        dual_node.nodes = ["a", "b", "c", "d"]
+        dual_node.edges = [("a", "b"), ("c", "d")]
+        dual_node.add_edge("d", "e")
+        dual_node.add_edge("z", "a", is_upstream=True)
+
+        assert dual_node.names == ["y", "y", "z"]
+        assert dual_node.nodes == ["a", "b", "c", "d"]
+        assert dual_node.edges == [("z", "a"), ("a", "b"), ("c", "d"), ("d", "e")]
+
+        dual_node.edges = []
+        dual_node.add_edge("a", "b", is_upstream=True)
+        assert dual_node.edges == [("a", "b")]
+
+    def test_identity(self):
+        """Test that dual nodes are compared and hashed by identity, and their keys by value."""
+        edge = PrimalGraph.Edge(0, "a", "b", 1.0, "x", "road")
+        first, second = DualGraph.Node(0, edge), DualGraph.Node(0, edge)
+        assert first != second and first.key() == second.key()
+        nodes = {first, second}
+        first.add_edge("b", "c")
+        assert len(nodes) == 2 and first in nodes and second in nodes
+
+        assert first.key() != second.key()
+        second.edges = [("a", "b"), ("b", "c")]
+        assert first.key() == second.key()
+        assert DualGraph.Node(1, edge).key() != DualGraph.Node(0, edge).key()
+
+    def test_views(self):
+        """Test that the views follow the dual node, and that changing them in place fails."""
+        dual_node = DualGraph.Node(0, PrimalGraph.Edge(0, "a", "b", 1.0, "x", "road"))
+        names, nodes, edges = dual_node.names, dual_node.nodes, dual_node.edges
+        dual_node.add_edge("b", "c")
+        dual_node.add_name("y")
+        dual_node.add_node("c")
+
+        assert (len(names), len(nodes), len(edges)) == (2, 3, 2)
+        assert names == ["x", "y"] and names[-1] == "y"
+        assert edges == [("a", "b"), ("b", "c")] and edges[1:] == [("b", "c")]
+        assert repr(nodes) == repr(["a", "b", "c"])
+        assert nodes != ("a", "b", "c") and nodes == dual_node.nodes
+        for view in (names, nodes, edges):
+            with pytest.raises(AttributeError):
+                view.append("z")
+            with pytest.raises(TypeError):
+                view[0] = "z"
+
+    def test_view_items(self):
+        """Test that items are read at every index, whether the edges follow a path or are stored as pairs."""
+        dual_node = DualGraph.Node(0, PrimalGraph.Edge(0, "b", "c", 1.0, "x", "road"))
+        dual_node.add_edge("c", "d")
+        dual_node.add_edge("a", "b", is_upstream=True)
+        dual_node.add_edge("z", "a", is_upstream=True)
+        for name, node in (("x", "d"), ("y", "a"), ("y", "z"), ("x", "e")):
+            dual_node.add_name(name)
+            dual_node.add_node(node)
+        for pairs in (False, True):
+            if pairs:
+                dual_node.add_edge("e", "f")
+                dual_node.add_edge("q", "y", is_upstream=True)
+            for view in (dual_node.names, dual_node.nodes, dual_node.edges):
+                items = list(view)
+                assert [view[i] for i in range(-len(items), len(items))] == items + items
+                for i in (len(items), -len(items) - 1):
+                    with pytest.raises(IndexError):
+                        view[i]
+
 
 class TestDualGraph:
     """Test suite for DualGraph class."""
@@ -0,0 +1,151 @@
+"""Tests for the incremental maintenance of a DualGraph."""
+
+import random
+
+import pytest
+
+from street_continuity.graph import PrimalGraph
+from street_continuity.incremental import IncrementalMapper
+from street_continuity.mapper import dual_mapper
+from street_continuity.table import AngleTable
+from tests.helpers import read_test_network, street_layout
+
+
+def _remap(primal, min_angle=120, use_label=True):
+    fresh = PrimalGraph()
+    fresh.set_nodes(dict(primal.node_dictionary))
+    fresh.set_edges(dict(primal.edge_dictionary))
+    return dual_mapper(fresh.build_graph(), min_angle=min_angle, use_label=use_label)
+
+
+class TestIncrementalMapper:
+    def test_initial_mapping_matches_dual_mapper(self):
+        primal = read_test_network()
+        expected = dual_mapper(primal, min_angle=120)
+        dual = IncrementalMapper(primal, min_angle=120).dual_graph
+        assert street_layout(dual) == street_layout(expected)
+        assert dual.edge_dictionary == expected.edge_dictionary
+
+    def test_removal_matches_full_remap(self):
+        primal = read_test_network()
+        mapper = IncrementalMapper(primal)
+        removed = list(primal.edge_dictionary)[::50]
+        mapper.update(removed=removed)
+        assert all(eid not in primal.edge_dictionary for eid in removed)
+        assert street_layout(mapper.dual_graph) == street_layout(_remap(primal))
+
+    def test_insertion_with_new_node_matches_full_remap(self):
+        primal = read_test_network()
+        mapper = IncrementalMapper(primal)
+        edge = next(iter(primal.edge_dictionary.values()))
+        latitude, longitude = primal.node_dictionary[edge.target]
+        changes = mapper.update(
+            added=[PrimalGraph.Edge(-1, edge.target, "new", 25.0, edge.name, edge.label)],
+            nodes={"new": (latitude + 2e-4, longitude + 2e-4)},
+        )
+        assert "new" in primal.graph[edge.target]
+        assert street_layout(mapper.dual_graph) == street_layout(_remap(primal))
+        assert changes.created or changes.changed
+
+    def test_modification_updates_dual_node_attributes(self):
+        primal = read_test_network()
+        mapper = IncrementalMapper(primal, use_label=False)
+        old = primal.edge_dictionary[next(iter(primal.edge_dictionary))]
+        edge = PrimalGraph.Edge(
+            old.eid, old.source, old.target, old.length + 100, "Renamed", old.label
+        )
+        changes = mapper.update(modified=[edge])
+        did = next(
+            did for did, n in mapper.dual_graph.node_dictionary.items() if "Renamed" in n.names
+        )
+        assert changes.changed == [did]
+        assert not changes.created and not changes.deleted
+        assert street_layout(mapper.dual_graph) == street_layout(_remap(primal, use_label=False))
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_random_changes_match_full_remap(self, seed):
+        rng = random.Random(seed)
+        use_label, min_angle = seed % 2 == 0, (90, 120, 150, 120)[seed]
+        primal = read_test_network(use_label)
+        mapper = IncrementalMapper(primal, min_angle=min_angle, use_label=use_label)
+        nodes = list(primal.node_dictionary)
+        for step in range(5):
+            eids = list(primal.edge_dictionary)
+            removed = rng.sample(eids, 3)
+            kept = [primal.edge_dictionary[eid] for eid in eids if eid not in removed]
+            modified = [
+                PrimalGraph.Edge(e.eid, rng.choice(nodes), e.target, e.length, e.name, e.label)
+                for e in rng.sample(kept, 2)
+            ]
+            modified = [e for e in modified if e.source != e.target]
+            added = [
+                PrimalGraph.Edge(10**6 + 10 * step + k, a, b, 10.0, "new", "primary")
+                for k, (a, b) in enumerate(rng.sample(nodes, 2) for _ in range(3))
+            ]
+            mapper.update(added=added, removed=removed, modified=modified)
+            assert street_layout(mapper.dual_graph) == street_layout(
+                _remap(primal, min_angle=min_angle, use_label=use_label)
+            )
+
+    def test_moved_nodes_match_full_remap(self):
+        primal = read_test_network()
+        mapper = IncrementalMapper(primal)
+        rng = random.Random(5)
+        moved = rng.sample(list(primal.graph), 4)
+        mapper.update(
+            nodes={
+                node: (latitude + rng.uniform(-3e-4, 3e-4), longitude + rng.uniform(-3e-4, 3e-4))
+                for node, (latitude, longitude) in ((n, primal.node_dictionary[n]) for n in moved)
+            }
+        )
+        assert street_layout(mapper.dual_graph) == street_layout(_remap(primal))
+
+        # the angles at the moved nodes and at their neighbors were computed again
+        expected = AngleTable().build_table(primal)
+        for node in moved:
+            for neighbor, eid in primal.graph[node].items():
+                for at, edge in ((node, eid), (neighbor, eid)):
+                    assert mapper.angle_table.turn_angles(at, edge) == pytest.approx(
+                        expected.turn_angles(at, edge)
+                    )
+
+    def test_retired_nodes_are_reclaimed(self):
+        primal = read_test_network()
+        mapper = IncrementalMapper(primal)
+        table = mapper.angle_table
+        nodes, angles = len(table.node_ids), len(table.angles)
+        rng = random.Random(9)
+        for _ in range(30):
+            # replacing edges by identical ones moves their endpoints to fresh dense indices
+            modified = [
+                PrimalGraph.Edge(e.eid, e.source, e.target, e.length, e.name, e.label)
+                for e in rng.sample(list(primal.edge_dictionary.values()), 10)
+            ]
+            mapper.update(modified=modified)
+            assert len(table.node_ids) <= 2 * nodes and len(table.angles) <= 2 * angles
+        assert street_layout(mapper.dual_graph) == street_layout(_remap(primal))
+
+    def test_changes_report_node_and_edge_ids(self):
+        primal = read_test_network()
+        mapper = IncrementalMapper(primal)
+        dual = mapper.dual_graph
+        before_nodes = dict(dual.node_dictionary)
+        before_edges = dict(dual.edge_dictionary)
+        changes = mapper.update(removed=list(primal.edge_dictionary)[:5])
+
+        assert set(changes.deleted) == set(before_nodes) - set(dual.node_dictionary)
+        assert set(changes.created) == set(dual.node_dictionary) - set(before_nodes)
+        assert set(changes.deleted_edges) == set(before_edges) - set(dual.edge_dictionary)
+        assert set(changes.created_edges) == set(dual.edge_dictionary) - set(before_edges)
+        untouched = set(before_nodes) - set(changes.deleted) - set(changes.changed)
+        assert all(dual.node_dictionary[did] is before_nodes[did] for did in untouched)
+        assert min(changes.created, default=len(before_nodes)) >= len(before_nodes)
+
+    def test_existing_edge_cannot_be_added(self):
+        primal = read_test_network()
+        mapper = IncrementalMapper(primal)
+        edge = next(iter(primal.edge_dictionary.values()))
+        with pytest.raises(ValueError):
+            mapper.update(added=[edge])
+        with pytest.raises(KeyError):
+            mapper.update(removed=["missing"])
@@ -0,0 +1,134 @@
+"""Tests for the index of the streets of a DualGraph by primal node, primal edge and location."""
+
+import numpy as np
+import pytest
+
+from street_continuity.compact import to_compact_dual
+from street_continuity.incremental import IncrementalMapper
+from street_continuity.index import street_index
+from tests.helpers import read_test_network
+
+
+def _edge_streets(dual_graph, primal_graph):
+    """The street of each primal edge, found by scanning the dual nodes for its endpoints."""
+    pairs = {}
+    for did, dual_node in dual_graph.node_dictionary.items():
+        for source, target in dual_node.edges:
+            pairs.setdefault(frozenset((source, target)), set()).add(did)
+    return {
+        eid: pairs[frozenset((edge.source, edge.target))]
+        for eid, edge in primal_graph.edge_dictionary.items()
+    }
+
+
+def _intersects(a, b, c, d):
+    """Whether the segments ab and cd share a point, by the orientation of their endpoints."""
+
+    def orientation(p, q, r):
+        value = (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+        return int(value > 0) - int(value < 0)
+
+    def within(p, q, r):
+        return min(p[0], q[0]) <= r[0] <= max(p[0], q[0]) and min(p[1], q[1]) <= r[1] <= max(
+            p[1], q[1]
+        )
+
+    o1, o2, o3, o4 = (
+        orientation(a, b, c),
+        orientation(a, b, d),
+        orientation(c, d, a),
+        orientation(c, d, b),
+    )
+    if o1 != o2 and o3 != o4:
+        return True
+    return any(
+        o == 0 and within(p, q, r)
+        for o, p, q, r in ((o1, a, b, c), (o2, a, b, d), (o3, c, d, a), (o4, c, d, b))
+    )
+
+
+def _crossing(primal_graph, street_of, south, west, north, east):
+    """The streets with a segment crossing the box, testing every primal edge against its sides."""
+    corners = [(south, west), (south, east), (north, east), (north, west)]
+    streets = set()
+    for eid, edge in primal_graph.edge_dictionary.items():
+        start = primal_graph.node_dictionary[edge.source]
+        stop = primal_graph.node_dictionary[edge.target]
+        inside = south <= start[0] <= north and west <= start[1] <= east
+        if inside or any(_intersects(start, stop, corners[i - 1], corners[i]) for i in range(4)):
+            streets.add(street_of[eid])
+    return sorted(streets)
+
+
+class TestStreetIndex:
+    def test_dual_mapper_indexes_the_streets(self, dual, primal):
+        index = dual.street_index()
+        assert index is dual.index
+
+        expected = _edge_streets(dual, primal)
+        for eid, edge in primal.edge_dictionary.items():
+            assert index.edge_street(eid) in expected[eid]
+            assert index.segment_streets(edge.source, edge.target) == sorted(expected[eid])
+        assert index.edge_streets(list(primal.edge_dictionary)) == [
+            index.edge_street(eid) for eid in primal.edge_dictionary
+        ]
+
+        for nid in primal.node_dictionary:
+            assert index.node_streets(nid) == sorted(
+                did for did, dual_node in dual.node_dictionary.items() if nid in dual_node.nodes
+            )
+
+    def test_missing_elements(self, dual):
+        index = dual.street_index()
+        assert index.node_streets("missing") == [] and index.node_streets(-1) == []
+        assert index.edge_street(-1) is None
+        assert index.segment_streets(-1, -2) == []
+        assert index.bbox_streets(80.0, 170.0, 81.0, 171.0) == []
+
+    def test_bbox_queries(self, dual, primal):
+        index = dual.street_index()
+        street_of = {eid: index.edge_street(eid) for eid in primal.edge_dictionary}
+        coordinates = np.array(list(primal.node_dictionary.values()))
+        low, high = coordinates.min(axis=0), coordinates.max(axis=0)
+
+        rng = np.random.default_rng(7)
+        for _ in range(20):
+            corner = low + (high - low) * rng.random(2)
+            size = (high - low) * rng.random(2) * 0.2
+            box = (*corner, *(corner + size))
+            assert index.bbox_streets(*box) == _crossing(primal, street_of, *box)
+
+        # a box around the whole network holds every street
+        assert index.bbox_streets(*low, *high) == sorted(dual.node_dictionary)
+
+    def test_lazy_index_of_other_dual_graphs(self, dual, primal):
+        expected = dual.street_index()
+        for graph in (to_compact_dual(dual), to_compact_dual(dual).to_dual()):
+            assert graph.index is None
+            index = graph.street_index()
+            nid = next(iter(primal.node_dictionary))
+            assert index.node_streets(nid) == expected.node_streets(nid)
+            with pytest.raises(ValueError):
+                index.edge_street(0)
+
+            index = graph.street_index(primal)
+            for eid in primal.edge_dictionary:
+                assert index.edge_street(eid) == expected.edge_street(eid)
+            box = (*primal.node_dictionary[nid], *primal.node_dictionary[nid])
+            assert index.bbox_streets(*box) == expected.bbox_streets(*box)
+
+    def test_index_of_another_primal_graph_is_rejected(self, dual):
+        other = read_test_network()
+        del other.edge_dictionary[next(iter(other.edge_dictionary))]
+        with pytest.raises(KeyError):
+            street_index(dual, other)
+
+    def test_incremental_updates_reset_the_index(self):
+        primal = read_test_network()
+        mapper = IncrementalMapper(primal)
+        first = mapper.dual_graph.street_index()
+        eid, edge = next(iter(primal.edge_dictionary.items()))
+        mapper.update(removed=[eid])
+        assert mapper.dual_graph.index is None
+        assert mapper.dual_graph.street_index().segment_streets(edge.source, edge.target) == []
+        assert first is not mapper.dual_graph.street_index()
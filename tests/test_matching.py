@@ -0,0 +1,165 @@
+"""Tests for the matching engine, which pairs the segments at every intersection on its own."""
+
+import random
+import sys
+from itertools import pairwise
+
+import numpy as np
+import pytest
+
+from street_continuity.__main__ import main
+from street_continuity.compact import to_compact
+from street_continuity.graph import PrimalGraph
+from street_continuity.mapper import dual_mapper
+from street_continuity.matching import __match_streets__, __union_find__
+from street_continuity.table import AngleTable
+from tests.helpers import DATA_DIR, street_segments
+
+
+def _expected_streets(table, labels, min_angle):
+    """The streets given by the mutual-best pairs, found by scanning every pair of slots."""
+    best = {}
+    for node in range(len(table.offsets) - 1):
+        first, last = int(table.offsets[node]), int(table.offsets[node + 1])
+        degree = last - first
+        for row in range(degree):
+            winner, widest = None, None
+            for column in range(degree):
+                angle = table.angles[table.pair_offsets[node] + row * degree + column]
+                same = labels[table.edges[first + row]] == labels[table.edges[first + column]]
+                valid = row != column and same and angle >= min_angle
+                if valid and (widest is None or angle > widest):
+                    winner, widest = first + column, angle
+            best[first + row] = winner
+
+    neighbors = {eid: set() for eid in range(len(labels))}
+    for slot, partner in best.items():
+        if partner is not None and best[partner] == slot:
+            neighbors[int(table.edges[slot])].add(int(table.edges[partner]))
+
+    streets, seen = set(), set()
+    for eid in neighbors:
+        if eid not in seen:
+            component, stack = set(), [eid]
+            while stack:
+                current = stack.pop()
+                if current not in component:
+                    component.add(current)
+                    stack.extend(neighbors[current])
+            seen |= component
+            streets.add(frozenset(component))
+    return streets
+
+
+def _segments(streets):
+    return {frozenset((seed, *(merge[0] for merge in merges))) for seed, merges in streets}
+
+
+class TestMatchStreets:
+    @pytest.mark.parametrize("use_label", [True, False])
+    @pytest.mark.parametrize("min_angle", [90.0, 120.0, 150.0])
+    def test_streets_join_the_mutual_best_pairs(self, primal, use_label, min_angle):
+        table = AngleTable().build_table(primal)
+        labels = [edge.label if use_label else 0 for edge in primal.edge_dictionary.values()]
+        streets = __match_streets__(table, labels, min_angle)
+        assert _segments(streets) == _expected_streets(table, labels, min_angle)
+
+        # every segment lies on exactly one street, and the streets are ordered by their lowest segment
+        segments = [eid for street in _segments(streets) for eid in street]
+        assert sorted(segments) == list(range(len(labels)))
+        assert [seed for seed, _ in streets] == sorted(min(street) for street in _segments(streets))
+
+    def test_worker_processes_pair_as_a_single_process(self, primal):
+        table = AngleTable().build_table(primal)
+        labels = [edge.label for edge in primal.edge_dictionary.values()]
+        assert __match_streets__(table, labels, 120.0, jobs=2) == __match_streets__(
+            table, labels, 120.0
+        )
+
+    def test_streets_do_not_depend_on_the_order_of_the_edges(self, primal):
+        edges = list(primal.edge_dictionary.items())
+        random.Random(3).shuffle(edges)
+        shuffled = PrimalGraph()
+        shuffled.node_dictionary = dict(primal.node_dictionary)
+        shuffled.edge_dictionary = dict(edges)
+        shuffled.build_graph()
+
+        expected = dual_mapper(primal, engine="matching")
+        assert street_segments(dual_mapper(shuffled, engine="matching")) == street_segments(
+            expected
+        )
+
+    def test_union_find(self):
+        # a path given from its far end, a ring and an isolated node
+        left = np.array([5, 4, 3, 7, 8, 9])
+        right = np.array([4, 3, 2, 8, 9, 7])
+        roots = __union_find__(11, left, right)
+        assert roots.tolist() == [0, 1, 2, 2, 2, 2, 6, 7, 7, 7, 10]
+
+
+class TestMatchingEngine:
+    @staticmethod
+    def _fork():
+        # three arms leaving the origin: a and b form an angle of 150 degrees, b and c one of 170
+        pg = PrimalGraph()
+        pg.node_dictionary = {"o": (0.0, 0.0)}
+        for name, bearing in (("a", 0.0), ("b", 150.0), ("c", 320.0)):
+            radians = np.radians(bearing)
+            pg.node_dictionary[name] = (0.001 * np.sin(radians), 0.001 * np.cos(radians))
+        pg.edge_dictionary = {
+            eid: PrimalGraph.Edge(eid, "o", target, 111.0, "S", "unclassified")
+            for eid, target in enumerate("abc")
+        }
+        return pg.build_graph()
+
+    def test_each_segment_continues_its_best_partner(self):
+        # growing from a, the seed engine takes b, although c continues b better
+        seed = dual_mapper(self._fork(), min_angle=120.0)
+        assert street_segments(seed) == [[("a", "o"), ("b", "o")], [("c", "o")]]
+
+        # whereas a pair needs the consent of both segments
+        dual = dual_mapper(self._fork(), min_angle=120.0, engine="matching")
+        assert street_segments(dual) == [[("a", "o")], [("b", "o"), ("c", "o")]]
+        assert len(dual.edge_dictionary) == 1
+
+    def test_a_street_is_walked_in_order(self):
+        segments = sys.getrecursionlimit() * 3
+        pg = PrimalGraph()
+        pg.node_dictionary = {i: (0.0, 0.0005 * i) for i in range(segments + 1)}
+        pg.edge_dictionary = {
+            eid: PrimalGraph.Edge(eid, eid, eid + 1, 55.0, "M", "motorway")
+            for eid in reversed(range(segments))
+        }
+        dual = dual_mapper(pg.build_graph(), min_angle=150, engine="matching")
+        assert len(dual.node_dictionary) == 1
+        street = dual.node_dictionary[0]
+        assert (street.source, street.target) == (0, segments)
+        assert street.edges == [(i, i + 1) for i in range(segments)]
+
+    def test_compact_graphs_map_as_primal_graphs(self, primal):
+        expected = dual_mapper(primal, engine="matching")
+        dual = dual_mapper(to_compact(primal), engine="matching")
+        assert street_segments(dual) == street_segments(expected)
+        assert len(dual.edge_dictionary) == len(expected.edge_dictionary)
+
+    def test_streets_are_paths_of_segments(self, primal):
+        dual = dual_mapper(primal, min_angle=90.0, engine="matching")
+        assert sum(len(street) for street in street_segments(dual)) == len(primal.edge_dictionary)
+        for dual_node in dual.node_dictionary.values():
+            # consecutive segments of a street meet at an intersection
+            edges = dual_node.edges
+            assert all(set(first) & set(second) for first, second in pairwise(edges))
+
+    def test_bad_engines(self, primal):
+        with pytest.raises(ValueError):
+            dual_mapper(primal, engine="greedy")
+        with pytest.raises(ValueError):
+            dual_mapper(primal, engine="matching", tiles=4)
+
+    def test_cli(self, primal, tmp_path):
+        argv = ["--nodes", "test-nodes.csv", "--edges", "test-edges.csv"]
+        argv += ["--data-dir", str(DATA_DIR), "--method", "hicn", "--engine", "matching"]
+        argv += ["--supplementary", str(tmp_path / "supp.txt")]
+        assert main([*argv, "--output", str(tmp_path / "dual.graphml")]) == 0
+        lines = (tmp_path / "supp.txt").read_text().splitlines()
+        assert len(lines) == len(dual_mapper(primal, engine="matching").node_dictionary)
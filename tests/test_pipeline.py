@@ -1,18 +1,30 @@
 """End-to-end tests exercising the full primal-to-dual pipeline."""
 
+import bz2
+import gzip
+import random
+import sys
+from itertools import pairwise
 from pathlib import Path
 
 import networkx as nx
+import numpy as np
 import pytest
 
+from street_continuity.compact import to_compact_dual
 from street_continuity.file import (
     from_osmnx,
+    read_binary,
     read_csv,
+    read_osm,
+    write_binary,
     write_graphml,
     write_supplementary,
 )
 from street_continuity.graph import DualGraph, PrimalGraph
-from street_continuity.mapper import dual_mapper
+from street_continuity.mapper import dual_edges, dual_mapper, dual_sweep
+from street_continuity.table import AngleTable
+from street_continuity.util import great_circle
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 
@@ -49,6 +61,55 @@ class TestReadCsv:
         with pytest.raises(FileNotFoundError):
             read_csv("nope-nodes.csv", "nope-edges.csv", str(tmp_path), use_label=False)
 
+    @staticmethod
+    def _snapshot(primal):
+        return (
+            list(primal.node_dictionary.items()),
+            [(eid, vars(edge)) for eid, edge in primal.edge_dictionary.items()],
+            [(nid, list(adjacency.items())) for nid, adjacency in primal.graph.items()],
+        )
+
+    @pytest.mark.parametrize("opener", ["gzip", "bz2", "lzma"])
+    def test_reads_compressed_files(self, sample_primal, tmp_path, opener):
+        module = __import__(opener)
+        suffix = {"gzip": ".gz", "bz2": ".bz2", "lzma": ".xz"}[opener]
+        for name in ("test-nodes.csv", "test-edges.csv"):
+            with module.open(tmp_path / (name + suffix), "wb") as compressed:
+                compressed.write((DATA_DIR / name).read_bytes())
+        primal = read_csv(
+            "test-nodes.csv" + suffix, "test-edges.csv" + suffix, str(tmp_path), use_label=True
+        )
+        assert self._snapshot(primal) == self._snapshot(sample_primal)
+
+    def test_chunk_boundaries_do_not_change_the_graph(self, sample_primal, monkeypatch):
+        import street_continuity.file as file_module
+
+        read_columns = file_module.__read_columns__
+        monkeypatch.setattr(
+            file_module,
+            "__read_columns__",
+            lambda path, width, has_header: read_columns(path, width, has_header, chunk_size=7),
+        )
+        primal = read_csv("test-nodes.csv", "test-edges.csv", str(DATA_DIR), use_label=True)
+        assert self._snapshot(primal) == self._snapshot(sample_primal)
+
+    def test_self_loops_and_repeated_ids(self, tmp_path):
+        (tmp_path / "nodes.csv").write_text("a,0.0,0.0\nb,0.0,0.001\nc,0.0,0.0\n")
+        (tmp_path / "edges.csv").write_text(
+            "0,a,b,10,Main,primary\n1,a,c,5,Loop,primary\n0,b,a,12,Main,secondary\n"
+        )
+        primal = read_csv("nodes.csv", "edges.csv", str(tmp_path), use_label=True)
+        # "c" sits on top of "a", so edge 1 is a self-loop; edge 0 keeps its last row
+        assert list(primal.edge_dictionary) == ["0"]
+        assert vars(primal.edge_dictionary["0"])["label"] == "secondary"
+        assert primal.graph == {"b": {"a": "0"}, "a": {"b": "0"}}
+
+    def test_malformed_row_raises(self, tmp_path):
+        (tmp_path / "nodes.csv").write_text("a,0.0,0.0\nb,0.0\n")
+        (tmp_path / "edges.csv").write_text("")
+        with pytest.raises(ValueError):
+            read_csv("nodes.csv", "edges.csv", str(tmp_path), use_label=True)
+
 
 class TestFromOsmnx:
     @staticmethod
@@ -75,6 +136,103 @@ class TestFromOsmnx:
         assert all(e.label == "unclassified" for e in primal.edge_dictionary.values())
 
 
+_OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <bounds minlat="-11.93" minlon="-62.01" maxlat="-11.89" maxlon="-61.99"/>
+  <node id="1" lat="-11.900" lon="-62.000"/>
+  <node id="2" lat="-11.910" lon="-62.000"/>
+  <node id="3" lat="-11.920" lon="-62.000"><tag k="highway" v="traffic_signals"/></node>
+  <node id="4" lat="-11.910" lon="-62.010"/>
+  <node id="5" lat="-11.910" lon="-61.990"/>
+  <node id="6" lat="-11.911" lon="-61.995"/>
+  <node id="8" lat="-11.930" lon="-62.000"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="primary"/><tag k="name" v="Rua A"/>
+  </way>
+  <way id="11">
+    <nd ref="4"/><nd ref="2"/><nd ref="6"/><nd ref="5"/>
+    <tag k="highway" v="residential"/>
+  </way>
+  <way id="12">
+    <nd ref="3"/><nd ref="7"/><nd ref="8"/>
+    <tag k="highway" v="primary"/><tag k="name" v="Rua B"/>
+  </way>
+  <way id="13">
+    <nd ref="4"/><nd ref="5"/><nd ref="6"/><nd ref="4"/>
+    <tag k="highway" v="pedestrian"/><tag k="area" v="yes"/>
+  </way>
+  <way id="14">
+    <nd ref="1"/><nd ref="4"/>
+    <tag k="building" v="yes"/>
+  </way>
+  <relation id="20"><member type="way" ref="10" role=""/><tag k="type" v="route"/></relation>
+</osm>
+"""
+
+
+class TestReadOsm:
+    @pytest.fixture
+    def osm_file(self, tmp_path):
+        path = tmp_path / "toy.osm"
+        path.write_text(_OSM)
+        return path
+
+    @staticmethod
+    def _edges(primal):
+        return sorted(
+            (e.source, e.target, e.length, e.name, e.label) for e in primal.edge_dictionary.values()
+        )
+
+    def test_splits_ways_at_shared_nodes(self, osm_file):
+        primal = read_osm(osm_file, use_label=True)
+        assert sorted(primal.node_dictionary) == [1, 2, 3, 4, 5]
+        assert primal.node_dictionary[2] == (-11.91, -62.0)
+
+        # way 11 splits at node 2, keeping node 6 inside its second segment
+        lengths = {(e.source, e.target): e.length for e in primal.edge_dictionary.values()}
+        inner = great_circle(-11.91, -62.0, -11.911, -61.995) + great_circle(
+            -11.911, -61.995, -11.91, -61.99
+        )
+        assert lengths[(2, 5)] == round(inner, 2)
+        assert lengths[(1, 2)] == round(great_circle(-11.9, -62.0, -11.91, -62.0), 2)
+
+        # way 12 goes through node 7, missing from the file, and way 13 is an area
+        assert [(e.source, e.target, e.name, e.label) for e in primal.edge_dictionary.values()] == [
+            (1, 2, "Rua A", "primary"),
+            (2, 3, "Rua A", "primary"),
+            (4, 2, "unknown", "residential"),
+            (2, 5, "unknown", "residential"),
+        ]
+
+    def test_icn_standardizes_labels(self, osm_file):
+        primal = read_osm(osm_file, use_label=False)
+        assert {e.label for e in primal.edge_dictionary.values()} == {"unclassified"}
+
+    def test_highways_filter(self, osm_file):
+        primal = read_osm(osm_file, use_label=True, highways={"residential"})
+        assert sorted(primal.node_dictionary) == [4, 5]
+        assert [(e.source, e.target) for e in primal.edge_dictionary.values()] == [(4, 5)]
+
+    @pytest.mark.parametrize("suffix", [".gz", ".bz2"])
+    def test_compressed_files_match(self, osm_file, suffix):
+        opener = gzip.open if suffix == ".gz" else bz2.open
+        compressed = osm_file.with_name(osm_file.name + suffix)
+        with opener(compressed, "wt") as stream:
+            stream.write(_OSM)
+        assert self._edges(read_osm(compressed, True)) == self._edges(read_osm(osm_file, True))
+
+    def test_compact_matches_dictionary(self, osm_file):
+        primal = read_osm(osm_file, use_label=True)
+        compact = read_osm(osm_file, use_label=True, compact=True)
+        assert self._edges(compact.to_primal()) == self._edges(primal)
+        assert _brute_force_edges(dual_mapper(compact)) == _brute_force_edges(dual_mapper(primal))
+
+    def test_missing_file_errors(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            read_osm(tmp_path / "missing.osm", use_label=True)
+
+
 class TestDualMapper:
     def test_hicn_produces_dual_graph(self, sample_primal):
         dual = dual_mapper(sample_primal, min_angle=120)
@@ -98,6 +256,145 @@ class TestDualMapper:
         assert counts[-1] > counts[0]  # the threshold genuinely changes the outcome
 
 
+class TestDualEdges:
+    @staticmethod
+    def _shared(dual):
+        shared = {}
+        items = sorted(dual.node_dictionary.items())
+        for i, (sid, s) in enumerate(items):
+            for tid, t in items[i + 1 :]:
+                common = set(s.nodes) & set(t.nodes)
+                if common:
+                    shared[(sid, tid)] = common
+        return shared
+
+    def test_weights_and_shared_nodes_match_brute_force(self, sample_primal):
+        dual = dual_mapper(sample_primal, min_angle=150)
+        expected = self._shared(dual)
+        pairs, weights, offsets, nodes = dual_edges(dual, shared_nodes=True)
+
+        assert [tuple(pair) for pair in pairs.tolist()] == sorted(expected)
+        assert weights.tolist() == [len(expected[pair]) for pair in sorted(expected)]
+        assert [set(nodes[a:b].tolist()) for a, b in pairwise(offsets)] == [
+            expected[pair] for pair in sorted(expected)
+        ]
+
+    def test_compact_dual_graph_gives_the_same_edges(self, sample_primal):
+        dual = dual_mapper(sample_primal)
+        compact = to_compact_dual(dual)
+        for expected, result in zip(dual_edges(dual, True), dual_edges(compact, True)):
+            assert np.array_equal(expected, result)
+
+    def test_hub_and_unsorted_ids(self):
+        dual = DualGraph()
+        edge = PrimalGraph.Edge(0, "hub", "a", 1.0, "x", "residential")
+        for did, far in ((9, "a"), (4, "b"), (7, "c"), (2, "d")):
+            dual.node_dictionary[did] = DualGraph.Node(did, edge)
+            dual.node_dictionary[did].nodes = ["hub", far, "end"] if did != 2 else ["hub", far]
+        pairs, weights = dual_edges(dual)
+        assert pairs.tolist() == [[2, 4], [2, 7], [2, 9], [4, 7], [4, 9], [7, 9]]
+        assert weights.tolist() == [1, 1, 1, 2, 2, 2]
+
+    def test_empty_graph(self):
+        pairs, weights, offsets, nodes = dual_edges(DualGraph(), shared_nodes=True)
+        assert pairs.shape == (0, 2) and len(weights) == len(nodes) == 0
+        assert offsets.tolist() == [0]
+
+
+class TestNonDestructiveMapping:
+    """The mapper keeps its own mapping state, so a primal graph can be mapped many times."""
+
+    @staticmethod
+    def _snapshot(dual):
+        return [(n.names, n.nodes, n.edges, n.length) for n in dual.node_dictionary.values()]
+
+    def test_primal_graph_is_left_untouched(self, sample_primal):
+        dual_mapper(sample_primal, min_angle=120)
+        assert not any(edge.mapped for edge in sample_primal.edge_dictionary.values())
+
+    def test_repeated_mapping_is_identical(self, sample_primal):
+        first = dual_mapper(sample_primal, min_angle=120)
+        second = dual_mapper(sample_primal, min_angle=120)
+        assert self._snapshot(first) == self._snapshot(second)
+        assert first.edge_dictionary == second.edge_dictionary
+
+    def test_concurrent_mapping_of_a_shared_graph(self, sample_primal):
+        from concurrent.futures import ThreadPoolExecutor
+
+        angles = [90, 120, 150, 90, 120, 150]
+        expected = [self._snapshot(dual_mapper(sample_primal, min_angle=a)) for a in angles]
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(lambda a: dual_mapper(sample_primal, min_angle=a), angles))
+        assert [self._snapshot(dual) for dual in results] == expected
+
+
+class TestParallelHicn:
+    def test_matches_sequential_run(self, sample_primal):
+        expected = dual_mapper(sample_primal, min_angle=120)
+        actual = dual_mapper(sample_primal, min_angle=120, jobs=2)
+        snapshot = TestNonDestructiveMapping._snapshot
+        assert snapshot(actual) == snapshot(expected)
+        assert [n.src_edge for n in actual.node_dictionary.values()] == [
+            n.src_edge for n in expected.node_dictionary.values()
+        ]
+        assert actual.edge_dictionary == expected.edge_dictionary
+
+    def test_icn_ignores_jobs(self, sample_primal):
+        expected = dual_mapper(sample_primal, min_angle=120, use_label=False)
+        actual = dual_mapper(sample_primal, min_angle=120, use_label=False, jobs=2)
+        snapshot = TestNonDestructiveMapping._snapshot
+        assert snapshot(actual) == snapshot(expected)
+
+
+class TestTiledMapping:
+    @pytest.mark.parametrize("tiles", [2, 4, 25])
+    @pytest.mark.parametrize("use_label", [True, False])
+    def test_matches_single_pass(self, sample_primal, tiles, use_label):
+        expected = dual_mapper(sample_primal, min_angle=120, use_label=use_label)
+        actual = dual_mapper(sample_primal, min_angle=120, use_label=use_label, tiles=tiles)
+        snapshot = TestNonDestructiveMapping._snapshot
+        assert snapshot(actual) == snapshot(expected)
+        assert actual.edge_dictionary == expected.edge_dictionary
+
+    def test_matches_single_pass_in_parallel(self, sample_primal):
+        expected = dual_mapper(sample_primal, min_angle=150)
+        actual = dual_mapper(sample_primal, min_angle=150, tiles=4, jobs=2)
+        snapshot = TestNonDestructiveMapping._snapshot
+        assert snapshot(actual) == snapshot(expected)
+        assert actual.edge_dictionary == expected.edge_dictionary
+
+    def test_tiles_are_balanced(self, sample_primal):
+        from street_continuity.mapper import __tile_seeds__
+
+        table = AngleTable().build_table(sample_primal)
+        partitions = __tile_seeds__(table, 4)
+        assert sorted(seed for seeds in partitions for seed in seeds) == list(
+            range(len(table.edge_ids))
+        )
+        assert max(map(len, partitions)) - min(map(len, partitions)) <= 1
+
+
+class TestDualSweep:
+    def test_matches_independent_runs(self, sample_primal):
+        angles = (90, 150)
+        duals = dual_sweep(sample_primal, angles, methods=("icn", "hicn"))
+        assert sorted(duals) == [("hicn", 90), ("hicn", 150), ("icn", 90), ("icn", 150)]
+        for (method, angle), dual in duals.items():
+            primal = read_csv("test-nodes.csv", "test-edges.csv", str(DATA_DIR), method == "hicn")
+            expected = dual_mapper(primal, min_angle=angle)
+            assert TestNonDestructiveMapping._snapshot(dual) == TestNonDestructiveMapping._snapshot(
+                expected
+            )
+            assert [n.label for n in dual.node_dictionary.values()] == [
+                n.label for n in expected.node_dictionary.values()
+            ]
+            assert dual.edge_dictionary == expected.edge_dictionary
+
+    def test_rejects_unknown_method(self, sample_primal):
+        with pytest.raises(ValueError):
+            dual_sweep(sample_primal, [120], methods=("xicn",))
+
+
 class TestWriters:
     def test_write_graphml_and_supplementary(self, sample_primal, tmp_path):
         dual = dual_mapper(sample_primal, min_angle=120)
@@ -121,6 +418,57 @@ class TestWriters:
         assert (nested / "dual.graphml").exists()
         assert (nested / "supp.txt").exists()
 
+    @pytest.mark.parametrize("use_label", [True, False])
+    def test_graphml_matches_networkx_output(self, tmp_path, use_label):
+        dual = dual_mapper(read_csv("test-nodes.csv", "test-edges.csv", str(DATA_DIR), use_label))
+        nxg = write_graphml(dual, "dual.graphml", str(tmp_path), return_networkx=True)
+        nx.write_graphml(nxg, tmp_path / "reference.graphml", infer_numeric_types=False)
+        assert (tmp_path / "dual.graphml").read_bytes() == (
+            tmp_path / "reference.graphml"
+        ).read_bytes()
+
+    def test_graphml_escapes_text_and_keeps_attribute_types(self, tmp_path):
+        dual = DualGraph()
+        dual.set_nodes(
+            {
+                0: DualGraph.Node(0, PrimalGraph.Edge(1, "a", "b", 1.5, 'R <&> "x"', "r")),
+                1: DualGraph.Node(1, PrimalGraph.Edge(2, 5, 6, 2.0, "y", "r")),
+            }
+        )
+        dual.set_edges({7: (0, 1)})
+        path = write_graphml(dual, "dual.graphml.gz", str(tmp_path))
+        assert path == tmp_path / "dual.graphml.gz"
+
+        reloaded = nx.read_graphml(path)
+        assert reloaded.nodes["0"]["names"] == str(['R <&> "x"'])
+        assert reloaded.nodes["0"]["source"] == "a"
+        assert reloaded.nodes["1"]["source"] == 5
+        assert reloaded.nodes["1"]["length"] == 2.0
+        assert reloaded.edges["0", "1"]["eid"] == 7
+
+    def test_graphml_of_an_empty_graph(self, tmp_path):
+        path = write_graphml(DualGraph(), "dual.graphml", str(tmp_path))
+        assert nx.read_graphml(path).number_of_nodes() == 0
+
+    @pytest.mark.parametrize("mmap", [True, False])
+    def test_binary_round_trip(self, sample_primal, tmp_path, mmap):
+        dual = dual_mapper(sample_primal, min_angle=120)
+        path = write_binary(dual, filename="dual.bin", directory=str(tmp_path / "out"))
+        assert path == tmp_path / "out" / "dual.bin"
+
+        compact = read_binary(path, mmap=mmap)
+        assert isinstance(compact.nodes, np.memmap) == mmap
+        reloaded = compact.to_dual()
+        assert [node.key() for node in reloaded.node_dictionary.values()] == [
+            node.key() for node in dual.node_dictionary.values()
+        ]
+        assert reloaded.edge_dictionary == dual.edge_dictionary
+
+    def test_binary_reader_rejects_other_files(self, tmp_path):
+        (tmp_path / "dual.bin").write_bytes(b"not a dual graph")
+        with pytest.raises(ValueError):
+            read_binary(tmp_path / "dual.bin")
+
 
 class TestContinuityRegressions:
     """Regressions for the direction-aware continuity negotiation."""
@@ -145,6 +493,29 @@ class TestContinuityRegressions:
         assert len(dual.node_dictionary) == 1
         assert len(dual.edge_dictionary) == 0
 
+    def test_street_longer_than_recursion_limit(self):
+        # The street-growing engine is iterative, so a single street may hold far more
+        # segments than Python's recursion limit allows frames.
+        segments = sys.getrecursionlimit() * 3
+        pg = PrimalGraph()
+        pg.node_dictionary = {i: (0.0, 0.0005 * i) for i in range(segments + 1)}
+        pg.edge_dictionary = {
+            eid: PrimalGraph.Edge(eid, eid, eid + 1, 55.0, "M", "motorway")
+            for eid in range(segments // 2, segments)
+        }
+        pg.edge_dictionary.update(
+            {
+                eid: PrimalGraph.Edge(eid, eid, eid + 1, 55.0, "M", "motorway")
+                for eid in range(segments // 2)
+            }
+        )
+        dual = dual_mapper(pg.build_graph(), min_angle=150)
+        assert len(dual.node_dictionary) == 1
+        street = dual.node_dictionary[0]
+        assert (street.source, street.target) == (0, segments)
+        assert len(street.edges) == segments
+        assert street.edges == [(i, i + 1) for i in range(segments)]
+
 
 class TestOsmnxAttributes:
     @staticmethod
@@ -166,3 +537,37 @@ class TestOsmnxAttributes:
         edge = primal.edge_dictionary[0]
         assert edge.name == "Rua A"
         assert edge.label == "primary"
+
+    @staticmethod
+    def _expected_edges(g):
+        """Edges as the former from_osmnx kept them, through a simple nx.Graph copy."""
+        simple = nx.Graph(g)
+        simple.remove_edges_from(nx.selfloop_edges(simple))
+        return [
+            (u, v, data.get("name", "unknown"), data.get("highway"), data.get("length"))
+            for u, v, data in simple.edges(data=True)
+        ]
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_matches_simple_graph_conversion(self, seed):
+        rng = random.Random(seed)
+        g = nx.MultiDiGraph()
+        nodes = rng.sample(range(50), 12)
+        for nid in nodes:
+            g.add_node(nid, y=-11.9 + rng.random() / 100, x=-62.0 + rng.random() / 100)
+        for _ in range(40):
+            # parallel edges, both directions and self-loops, each with its own attributes
+            g.add_edge(
+                rng.choice(nodes),
+                rng.choice(nodes),
+                name=rng.choice(["Rua A", "Rua B", "Rua C"]),
+                highway=rng.choice(["primary", "residential"]),
+                length=float(rng.randint(1, 100)),
+            )
+
+        primal = from_osmnx(g, use_label=True)
+        actual = [
+            (e.source, e.target, e.name, e.label, e.length) for e in primal.edge_dictionary.values()
+        ]
+        assert actual == self._expected_edges(g)
+        assert list(primal.edge_dictionary) == list(range(len(actual)))
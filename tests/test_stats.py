@@ -0,0 +1,91 @@
+"""Tests for the profiling statistics of the pipeline."""
+
+import json
+
+import pytest
+
+from street_continuity.__main__ import main
+from street_continuity.file import write_graphml
+from street_continuity.mapper import dual_mapper
+from street_continuity.stats import Stats, active, profile
+from tests.helpers import DATA_DIR, read_test_network
+
+
+def _counters(stats):
+    counters = stats.to_dict()
+    del counters["seconds"], counters["calls"]
+    return counters
+
+
+class TestProfile:
+    def test_collects_stages_and_counters(self, tmp_path):
+        with profile() as stats:
+            primal = read_test_network()
+            dual = dual_mapper(primal)
+            write_graphml(dual, "dual.graphml", str(tmp_path))
+
+        for name in (
+            "read_csv",
+            "build_graph",
+            "angle_table",
+            "negotiation",
+            "assembly",
+            "linking",
+        ):
+            assert stats.calls[name] == 1 and stats.seconds[name] >= 0
+        assert stats.calls["dual_mapper"] == stats.calls["write_graphml"] == 1
+
+        assert stats.angle_evaluations == sum(size * n for size, n in stats.candidates.items())
+        assert stats.streets == len(dual.node_dictionary)
+        assert stats.max_street_segments == max(len(n.edges) for n in dual.node_dictionary.values())
+        streets_at = {}
+        for node in dual.node_dictionary.values():
+            for primal_node in set(node.nodes):
+                streets_at[primal_node] = streets_at.get(primal_node, 0) + 1
+        assert sum(stats.fan_out.values()) == len(streets_at)
+        assert max(stats.fan_out) == max(streets_at.values())
+
+    def test_disabled_by_default_and_restored_after_nesting(self):
+        assert active() is None
+        with profile() as outer:
+            with profile() as inner:
+                dual_mapper(read_test_network())
+            assert active() is outer
+        assert active() is None
+        assert inner.streets > 0 and outer.streets == 0 and not outer.seconds
+
+    @pytest.mark.parametrize("options", [{"jobs": 2}, {"tiles": 4, "jobs": 2}, {"tiles": 4}])
+    def test_counts_the_work_of_worker_processes(self, options):
+        primal = read_test_network()
+        with profile() as sequential:
+            expected = dual_mapper(primal)
+        with profile() as parallel:
+            dual = dual_mapper(primal, **options)
+
+        assert dual.edge_dictionary == expected.edge_dictionary
+        assert parallel.streets == sequential.streets
+        assert parallel.max_street_segments == sequential.max_street_segments
+        if "tiles" not in options:
+            # tiles renegotiate the streets crossing their boundaries, so they evaluate more angles
+            assert _counters(parallel) == _counters(sequential)
+        else:
+            assert parallel.angle_evaluations >= sequential.angle_evaluations
+
+    def test_merge_adds_measurements(self):
+        first, second = Stats(), Stats()
+        first.add_time("negotiation", 1.0)
+        second.add_time("negotiation", 2.0)
+        first.candidates, second.candidates = {1: 2}, {1: 1, 3: 1}
+        second.max_street_segments = 7
+        first.merge(second)
+        assert first.seconds == {"negotiation": 3.0} and first.calls == {"negotiation": 2}
+        assert first.candidates == {1: 3, 3: 1} and first.max_street_segments == 7
+        assert json.loads(first.to_json())["candidates"] == {"1": 3, "3": 1}
+
+
+def test_cli_writes_profile(tmp_path):
+    args = ["--nodes", "test-nodes.csv", "--edges", "test-edges.csv", "--data-dir", str(DATA_DIR)]
+    report = tmp_path / "profile.json"
+    assert main([*args, "--output", str(tmp_path / "dual.graphml"), "--profile", str(report)]) == 0
+    counters = json.loads(report.read_text())
+    assert counters["calls"]["dual_mapper"] == 1 and counters["angle_evaluations"] > 0
@@ -0,0 +1,52 @@
+"""Tests for the precomputed continuity-angle table."""
+
+import numpy as np
+import pytest
+
+from street_continuity.graph import PrimalGraph
+from street_continuity.table import AngleTable
+from street_continuity.util import compute_angle
+
+
+class TestAngleTable:
+    def test_offsets_follow_adjacency_list(self, primal):
+        table = AngleTable().build_table(primal)
+        for index, nid in enumerate(table.node_ids):
+            start, stop = table.offsets[index], table.offsets[index + 1]
+            neighbors = [table.node_ids[n] for n in table.neighbors[start:stop]]
+            edges = [table.edge_ids[e] for e in table.edges[start:stop]]
+            assert neighbors == list(primal.graph[nid])
+            assert edges == list(primal.graph[nid].values())
+
+    def test_angles_match_scalar_law_of_cosines(self, primal):
+        table = AngleTable().build_table(primal)
+        coordinates = primal.node_dictionary
+        for eid, edge in list(primal.edge_dictionary.items())[:200]:
+            for node, far_end in ((edge.source, edge.target), (edge.target, edge.source)):
+                angles = table.turn_angles(node, eid)
+                expected = [
+                    compute_angle(coordinates[nbr], coordinates[node], coordinates[far_end])
+                    for nbr in primal.graph[node]
+                ]
+                assert angles == pytest.approx(expected)
+
+    def test_block_size_is_squared_degree(self, primal):
+        table = AngleTable().build_table(primal)
+        degrees = np.diff(table.offsets)
+        assert np.array_equal(np.diff(table.pair_offsets), degrees**2)
+        assert len(table.angles) == int((degrees**2).sum())
+
+    def test_straight_chain_is_one_eighty_degrees(self):
+        pg = PrimalGraph()
+        pg.node_dictionary = {f"n{i}": (0.001 * i, 0.0) for i in range(3)}
+        pg.edge_dictionary = {
+            0: PrimalGraph.Edge(0, "n0", "n1", 111.0, "S", "unclassified"),
+            1: PrimalGraph.Edge(1, "n1", "n2", 111.0, "S", "unclassified"),
+        }
+        table = AngleTable().build_table(pg.build_graph())
+        # at n1, arriving through edge 0 (from n0), continuing to n2 is straight ahead
+        assert table.turn_angles("n1", 0) == pytest.approx([0.0, 180.0], abs=2.0)
+
+    def test_empty_graph(self):
+        table = AngleTable().build_table(PrimalGraph().build_graph())
+        assert table.node_ids == [] and len(table.angles) == 0
@@ -0,0 +1,68 @@
+"""Tests for the topological (turn-count) distances of a DualGraph."""
+
+from collections import Counter
+
+import networkx as nx
+import pytest
+
+from street_continuity.compact import to_compact_dual
+from street_continuity.graph import DualGraph
+from street_continuity.topology import topological_distances
+from tests.helpers import linked_streets, to_networkx
+
+
+class TestTopologicalDistances:
+    def test_exact_matches_networkx(self, dual):
+        graph = to_networkx(dual)
+        result = topological_distances(dual)
+
+        assert result.exact and result.sources == len(dual.node_dictionary)
+        assert result.mean_path_length == pytest.approx(nx.average_shortest_path_length(graph))
+        assert result.confidence_interval == (result.mean_path_length, result.mean_path_length)
+        expected = Counter(
+            d
+            for _, lengths in nx.all_pairs_shortest_path_length(graph)
+            for d in lengths.values()
+            if d
+        )
+        assert result.distribution == dict(expected)
+        closeness = nx.closeness_centrality(graph)
+        assert result.closeness == pytest.approx(closeness)
+
+    def test_disconnected_closeness_matches_networkx(self):
+        # a path of three streets, a pair of streets and an isolated street
+        dual_graph = linked_streets(6, [(0, 1), (1, 2), (3, 4)])
+        result = topological_distances(dual_graph)
+        assert result.closeness == pytest.approx(nx.closeness_centrality(to_networkx(dual_graph)))
+        assert result.distribution == {1: 6, 2: 2}
+        assert result.mean_path_length == pytest.approx(10 / 8)
+
+    def test_workers_and_compact_graphs_give_the_same_result(self, dual):
+        expected = topological_distances(dual)
+        for result in (
+            topological_distances(dual, jobs=2),
+            topological_distances(to_compact_dual(dual)),
+        ):
+            assert result.distribution == expected.distribution
+            assert result.closeness == expected.closeness
+
+    def test_sampled_estimates(self, dual):
+        exact = topological_distances(dual)
+        result = topological_distances(dual, samples=60, seed=3)
+        assert not result.exact and result.sources == 60
+
+        low, high = result.confidence_interval
+        assert low < result.mean_path_length < high
+        assert low < exact.mean_path_length < high
+        n = len(dual.node_dictionary)
+        assert sum(result.distribution.values()) == pytest.approx(n * (n - 1), rel=0.05)
+        assert result.closeness.keys() == exact.closeness.keys()
+
+        # sampled runs are reproducible, and sampling every street is exact
+        assert topological_distances(dual, samples=60, seed=3).closeness == result.closeness
+        assert topological_distances(dual, samples=n).distribution == exact.distribution
+
+    def test_empty_graph(self):
+        result = topological_distances(DualGraph())
+        assert result.distribution == {} and result.closeness == {}
+        assert result.mean_path_length == 0.0
@@ -3,7 +3,13 @@
 import numpy as np
 import pytest
 
-from street_continuity.util import compute_angle, compute_distance
+from street_continuity.util import (
+    compute_angle,
+    compute_angles,
+    compute_distance,
+    compute_distances,
+    great_circle,
+)
 
 
 class TestComputeDistance:
@@ -16,7 +22,7 @@ class TestComputeDistance:
             captured["args"] = (lat1, lon1, lat2, lon2)
             return 100.456
 
-        monkeypatch.setattr("street_continuity.util.oxd.great_circle", fake_great_circle)
+        monkeypatch.setattr("street_continuity.util.great_circle", fake_great_circle)
 
         source = (10.0, 20.0)  # (latitude, longitude)
         target = (10.5, 20.5)
@@ -26,12 +32,12 @@ class TestComputeDistance:
         assert result == 100.46  # rounded to two decimals
 
     def test_zero_distance_for_identical_points(self, monkeypatch):
-        monkeypatch.setattr("street_continuity.util.oxd.great_circle", lambda *_: 0.0)
+        monkeypatch.setattr("street_continuity.util.great_circle", lambda *_: 0.0)
         coords = (45.0, 90.0)
         assert compute_distance(coords, coords) == 0.0
 
     def test_rounds_to_two_decimals(self, monkeypatch):
-        monkeypatch.setattr("street_continuity.util.oxd.great_circle", lambda *_: 123.456789)
+        monkeypatch.setattr("street_continuity.util.great_circle", lambda *_: 123.456789)
         assert compute_distance((0, 0), (1, 1)) == 123.46
 
     def test_real_great_circle_matches_reference(self):
@@ -41,6 +47,16 @@ class TestComputeDistance:
         # The edge list ships the precomputed length for this pair.
         assert compute_distance(n0, n2) == pytest.approx(87.13, abs=1.0)
 
+    def test_built_in_great_circle_matches_osmnx(self):
+        oxd = pytest.importorskip("osmnx.distance")
+        rng = np.random.default_rng(0)
+        lat1, lat2 = rng.uniform(-89, 89, (2, 500))
+        lon1, lon2 = rng.uniform(-179, 179, (2, 500))
+        assert np.array_equal(
+            great_circle(lat1, lon1, lat2, lon2), oxd.great_circle(lat1, lon1, lat2, lon2)
+        )
+        assert great_circle(10.0, 20.0, 10.5, 20.5) == oxd.great_circle(10.0, 20.0, 10.5, 20.5)
+
 
 class TestComputeAngle:
     """The angle helper applies the law of cosines to three node coordinates."""
@@ -82,3 +98,26 @@ class TestComputeAngle:
         angle = compute_angle((0, 0), (3, 0), (3, 4))
         assert isinstance(angle, (int, float, np.number))
         assert 0.0 <= angle <= 180.0
+
+
+class TestVectorizedGeometry:
+    """The array helpers agree element-wise with their scalar counterparts."""
+
+    @staticmethod
+    def _points(k, seed=7):
+        rng = np.random.default_rng(seed)
+        return rng.uniform([-11.95, -62.03], [-11.90, -61.98], size=(k, 2))
+
+    def test_distances_match_scalar(self):
+        a, b = self._points(50), self._points(50, seed=8)
+        expected = [compute_distance(tuple(p), tuple(q)) for p, q in zip(a, b)]
+        assert compute_distances(a, b).tolist() == expected
+
+    def test_angles_match_scalar(self):
+        n, s, t = self._points(50), self._points(50, seed=8), self._points(50, seed=9)
+        expected = [compute_angle(tuple(x), tuple(y), tuple(z)) for x, y, z in zip(n, s, t)]
+        assert compute_angles(n, s, t) == pytest.approx(expected)
+
+    def test_overlapping_nodes_yield_zero(self):
+        p = self._points(3)
+        assert compute_angles(p, p, self._points(3, seed=8)).tolist() == [0.0, 0.0, 0.0]